@@ -1,32 +1,74 @@
 from typing_extensions import Annotated
+from typing import List, Optional
 from pathlib import Path
+from enum import Enum
+from time import perf_counter
 import logging
 
 logging.getLogger('matplotlib').setLevel(logging.ERROR)
 logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
 
-import matplotlib as mpl
 import typer
 
-from src.cryptographer.application import Application
-from src.test import (
-    visualize_audio,
-    generate_random_sequence,
-    encryption_test
-)
-
-mpl.set_loglevel('warning')
+# Every command imports what it needs when it runs, so encrypt and decrypt only load the crypto
+# path and not the plotting and statistics libraries of the other commands.
 
 app = typer.Typer()
 
+
+# Logging is configured here for every command, importing the library leaves it to its caller.
+@app.callback()
+def configure_logging() -> None:
+    from src.util import get_log_config
+
+    get_log_config()
+
+# The file name of standard input and output.
+PIPE = "-"
+
+
+class ShuffleMode(str, Enum):
+    legacy = "legacy"
+    v1 = "v1"
+    block = "block"
+    frame = "frame"
+    sample = "sample"
+
+
+class BitSource(str, Enum):
+    wav = "wav"
+    logistic = "logistic"
+    collatz = "collatz"
+
+
+class KdfAlgorithm(str, Enum):
+    pbkdf2 = "pbkdf2"
+    scrypt = "scrypt"
+
+
+def _raw_format(file: Path, rate: Optional[int], channels: Optional[int], width: Optional[int]) -> Optional[tuple[int, int, int]]:
+    """
+    Returns the frame rate, channels and sample width of headerless PCM on standard input, or None for WAV input.
+    """
+    given = (rate, channels, width)
+    if all(value is None for value in given):
+        return None
+    if any(value is None for value in given):
+        raise typer.BadParameter("headerless PCM needs all of --rate, --channels and --width", param_hint="--rate")
+    if str(file) != PIPE:
+        raise typer.BadParameter("--rate, --channels and --width describe headerless PCM read from standard input, use --in -", param_hint="--rate")
+    return given
+
+
 @app.command(help="Encrypt .wav audio file, input file and output file are required, generates encrypted file + key")
 def encrypt(
     file: Annotated[
         Path,
         typer.Option(
             "--in", "-i",
-            help="The file to encrypt",
+            help="The file to encrypt, - reads it from standard input",
             exists=True,
+            allow_dash=True,
             file_okay=True,
             dir_okay=False,
             writable=False,
@@ -38,15 +80,30 @@ def encrypt(
         Path,
         typer.Option(
             "--out", "-o",
-            help="The name of the encrypted file that will be generated",
+            help="The name of the encrypted file that will be generated, - writes it to standard output",
             exists=False,
+            allow_dash=True,
             dir_okay=True,
             writable=True,
             resolve_path=True
         )
     ],
     fast: Annotated[bool, typer.Option("--fast", "-f",
-        help="Perform Encryption faster without shuffling, suited for large files")] = False
+        help="Perform Encryption faster without shuffling, suited for large files")] = False,
+    shuffle: Annotated[ShuffleMode, typer.Option("--shuffle", "-s",
+        help="Shuffle variant, legacy is compatible with files encrypted by older versions, v1 is faster, block is fastest and can be streamed, frame and sample move whole frames or samples")] = ShuffleMode.legacy,
+    chunk_size: Annotated[Optional[int], typer.Option("--chunk-size", "-c", min=1,
+        help="Stream the file in chunks of this many frames with bounded memory, requires --fast or --shuffle block")] = None,
+    workers: Annotated[Optional[int], typer.Option("--workers", "-w", min=1,
+        help="Encrypt the 1 MiB chunks, each under its own nonce and tag, on this many threads")] = None,
+    profile: Annotated[Optional[Path], typer.Option("--profile", dir_okay=False, resolve_path=True,
+        help="Append the wall time, CPU time, bytes and throughput of every stage to this JSON lines file")] = None,
+    rate: Annotated[Optional[int], typer.Option("--rate", min=1,
+        help="Frame rate of headerless PCM read from standard input, requires --channels and --width")] = None,
+    channels: Annotated[Optional[int], typer.Option("--channels", min=1,
+        help="Channels of headerless PCM read from standard input")] = None,
+    width: Annotated[Optional[int], typer.Option("--width", min=1, max=4,
+        help="Sample width in bytes of headerless little-endian PCM read from standard input")] = None,
 ) -> None:
     """
     Encrypts an audio file and saves the encrypted file to the specified output path.
@@ -59,12 +116,38 @@ def encrypt(
         The path to save the encrypted audio file. Must not exist but the directory should be writable.
     fast : bool, optional
         Perform encryption faster with less security, by default False.
+    shuffle : ShuffleMode, optional
+        The shuffle variant, by default legacy.
+    chunk_size : Optional[int], optional
+        Number of frames to stream at a time, by default None which processes the whole file at once.
+    workers : Optional[int], optional
+        Number of threads of the chunked cipher, by default None which uses one.
+    profile : Optional[Path], optional
+        The JSON lines file the stage timings are appended to, by default None which does not profile.
+    rate : Optional[int], optional
+        Frame rate of headerless PCM read from standard input, by default None which reads a WAV file.
+    channels : Optional[int], optional
+        Channels of headerless PCM read from standard input.
+    width : Optional[int], optional
+        Sample width in bytes of headerless PCM read from standard input.
 
     Returns
     -------
     None
     """
-    application = Application(file, out, fast)
+    if chunk_size and not fast and shuffle is not ShuffleMode.block:
+        raise typer.BadParameter("streaming with --chunk-size requires --fast or --shuffle block", param_hint="--chunk-size")
+    if PIPE in (str(file), str(out)) and not fast and shuffle is not ShuffleMode.block:
+        raise typer.BadParameter("reading or writing a pipe requires --fast or --shuffle block", param_hint="--shuffle")
+    raw = _raw_format(file, rate, channels, width)
+    from src.cryptographer.application import Application
+    from src.cryptographer.model.audio_model import StreamFormatError
+
+    try:
+        application = Application(file, out, fast, shuffle_mode=shuffle.value, chunk_size=chunk_size, workers=workers, profile=profile, raw=raw)
+    except StreamFormatError as error:
+        # Standard input is only checked once it is read.
+        raise typer.BadParameter(str(error), param_hint="--in")
 
 @app.command(help="Decrypt .wav audio file, input file, output file and key are required")
 def decrypt(
@@ -72,8 +155,9 @@ def decrypt(
         Path,
         typer.Option(
             "--in", "-i",
-            help="Name of the encrypted file that needs to decrypted",
+            help="Name of the encrypted file that needs to decrypted, - reads it from standard input",
             exists=True,
+            allow_dash=True,
             file_okay=True,
             dir_okay=False,
             writable=False,
@@ -85,8 +169,9 @@ def decrypt(
         Path,
         typer.Option(
             "--out", "-o",
-            help="Name of the decrypted file, that will be generated",
+            help="Name of the decrypted file, that will be generated, - writes it to standard output",
             exists=False,
+            allow_dash=True,
             dir_okay=True,
             writable=True,
             resolve_path=True
@@ -95,7 +180,25 @@ def decrypt(
     key: Annotated[str, typer.Option("--key", "-k")],
     fast: Annotated[bool, typer.Option(
         "--fast", "-f",
-        help="Perform decryption faster without unshuffling, only works if encryption was also done with the --fast switch")] = False
+        help="Perform decryption faster without unshuffling, only needed for files encrypted with --fast by older versions")] = False,
+    shuffle: Annotated[ShuffleMode, typer.Option("--shuffle", "-s",
+        help="Shuffle variant the file was encrypted with, only needed for files encrypted by older versions")] = ShuffleMode.legacy,
+    chunk_size: Annotated[Optional[int], typer.Option("--chunk-size", "-c", min=1,
+        help="Stream the file in chunks of this many frames with bounded memory, requires a file encrypted with --fast or --shuffle block")] = None,
+    workers: Annotated[Optional[int], typer.Option("--workers", "-w", min=1,
+        help="Decrypt and verify the 1 MiB chunks on this many threads, required for files encrypted with --workers by older versions")] = None,
+    start: Annotated[Optional[float], typer.Option("--start", min=0,
+        help="Decrypt only the audio from this second on, requires a file encrypted with --fast or --shuffle block")] = None,
+    end: Annotated[Optional[float], typer.Option("--end", min=0,
+        help="Decrypt only the audio up to this second, requires a file encrypted with --fast or --shuffle block")] = None,
+    profile: Annotated[Optional[Path], typer.Option("--profile", dir_okay=False, resolve_path=True,
+        help="Append the wall time, CPU time, bytes and throughput of every stage to this JSON lines file")] = None,
+    rate: Annotated[Optional[int], typer.Option("--rate", min=1,
+        help="Frame rate of headerless PCM read from standard input, requires --channels and --width")] = None,
+    channels: Annotated[Optional[int], typer.Option("--channels", min=1,
+        help="Channels of headerless PCM read from standard input")] = None,
+    width: Annotated[Optional[int], typer.Option("--width", min=1, max=4,
+        help="Sample width in bytes of headerless little-endian PCM read from standard input")] = None,
 ) -> None:
     """
     Decrypts an audio file using the provided key and saves the decrypted file to the specified output path.
@@ -109,22 +212,273 @@ def decrypt(
     key : str
         The key to use for decrypting the audio file.
     fast : bool, optional
-        Perform decryption faster with less security, only works if encryption was also done with the --fast switch. By default False.
+        Decrypt a file encrypted with --fast by an older version, newer files record their mode. By default False.
+    shuffle : ShuffleMode, optional
+        The shuffle variant of a file encrypted by an older version, by default legacy.
+    chunk_size : Optional[int], optional
+        Number of frames to stream at a time, by default None which processes the whole file at once.
+    workers : Optional[int], optional
+        Number of threads decrypting and verifying chunks, required for files encrypted with --workers by older versions.
+    start : Optional[float], optional
+        Start of the time range to decrypt in seconds, by default None which starts at the beginning.
+    end : Optional[float], optional
+        End of the time range to decrypt in seconds, by default None which ends at the end of the file.
+    profile : Optional[Path], optional
+        The JSON lines file the stage timings are appended to, by default None which does not profile.
+    rate : Optional[int], optional
+        Frame rate of headerless PCM read from standard input, by default None which reads a WAV file.
+    channels : Optional[int], optional
+        Channels of headerless PCM read from standard input.
+    width : Optional[int], optional
+        Sample width in bytes of headerless PCM read from standard input.
 
     Returns
     -------
     None
     """
-    application = Application(file, out, fast, key=key)
+    if start is not None and end is not None and end <= start:
+        raise typer.BadParameter("--end has to be after --start", param_hint="--end")
+    if (start is not None or end is not None) and PIPE in (str(file), str(out)):
+        raise typer.BadParameter("time ranges cannot be read from or written to a pipe", param_hint="--start")
+    raw = _raw_format(file, rate, channels, width)
+    from src.cryptographer.application import Application
+    from src.cryptographer.helper import UnsupportedModeError
+    from src.cryptographer.model.audio_model import StreamFormatError
+
+    try:
+        application = Application(file, out, fast, key=key, shuffle_mode=shuffle.value, chunk_size=chunk_size, workers=workers, start=start, end=end, profile=profile, raw=raw)
+    except StreamFormatError as error:
+        raise typer.BadParameter(str(error), param_hint="--in")
+    except UnsupportedModeError as error:
+        # Streaming and time ranges need fast or block mode, which files with a container header record themselves.
+        raise typer.BadParameter(str(error))
+
+
+@app.command(name="batch-encrypt", help="Encrypt every .wav file below a directory on a process pool, writes a manifest of the keys")
+def batch_encrypt_command(
+    source: Annotated[
+        Path,
+        typer.Option(
+            "--in", "-i",
+            help="The directory searched recursively for files to encrypt",
+            exists=True,
+            file_okay=False,
+            dir_okay=True,
+            readable=True,
+            resolve_path=True,
+        )
+    ],
+    destination: Annotated[
+        Path,
+        typer.Option(
+            "--out", "-o",
+            help="The directory the encrypted files are written to, keeping the layout of the input directory",
+            file_okay=False,
+            dir_okay=True,
+            writable=True,
+            resolve_path=True
+        )
+    ],
+    fast: Annotated[bool, typer.Option("--fast", "-f",
+        help="Perform Encryption faster without shuffling, suited for large files")] = False,
+    shuffle: Annotated[ShuffleMode, typer.Option("--shuffle", "-s",
+        help="Shuffle variant, legacy is compatible with files encrypted by older versions, v1 is faster, block is fastest and can be streamed, frame and sample move whole frames or samples")] = ShuffleMode.legacy,
+    chunk_size: Annotated[Optional[int], typer.Option("--chunk-size", "-c", min=1,
+        help="Stream every file in chunks of this many frames with bounded memory, requires --fast or --shuffle block")] = None,
+    workers: Annotated[Optional[int], typer.Option("--workers", "-w", min=1,
+        help="Encrypt 1 MiB chunks of every file under their own nonces on this many threads")] = None,
+    processes: Annotated[Optional[int], typer.Option("--processes", "-p", min=1,
+        help="Number of files encrypted concurrently, by default the number of CPUs")] = None,
+    manifest: Annotated[Optional[Path], typer.Option("--manifest", "-m", dir_okay=False, resolve_path=True,
+        help="Where to write the manifest of the keys, by default manifest.json in the output directory")] = None,
+) -> None:
+    """
+    Encrypts every audio file below a directory and writes a manifest mapping each file to its key.
+
+    Parameters
+    ----------
+    source : Path
+        The directory searched recursively for audio files.
+    destination : Path
+        The directory the encrypted files are written to.
+    fast : bool, optional
+        Perform encryption faster with less security, by default False.
+    shuffle : ShuffleMode, optional
+        The shuffle variant, by default legacy.
+    chunk_size : Optional[int], optional
+        Number of frames to stream at a time, by default None which processes every file at once.
+    workers : Optional[int], optional
+        Number of threads of the chunked cipher, by default None which uses one.
+    processes : Optional[int], optional
+        Number of files encrypted concurrently, by default None which uses the number of CPUs.
+    manifest : Optional[Path], optional
+        The path of the manifest, by default None which writes manifest.json in the destination.
+
+    Returns
+    -------
+    None
+    """
+    if chunk_size and not fast and shuffle is not ShuffleMode.block:
+        raise typer.BadParameter("streaming with --chunk-size requires --fast or --shuffle block", param_hint="--chunk-size")
+    from src.cryptographer.batch import batch_encrypt
+
+    report = batch_encrypt(source, destination, fast, shuffle.value, chunk_size, workers, processes, manifest)
+    _print_batch_report(report)
+
+
+@app.command(name="batch-decrypt", help="Decrypt every file listed in a manifest written by batch-encrypt on a process pool")
+def batch_decrypt_command(
+    source: Annotated[
+        Path,
+        typer.Option(
+            "--in", "-i",
+            help="The directory holding the encrypted files",
+            exists=True,
+            file_okay=False,
+            dir_okay=True,
+            readable=True,
+            resolve_path=True,
+        )
+    ],
+    destination: Annotated[
+        Path,
+        typer.Option(
+            "--out", "-o",
+            help="The directory the decrypted files are written to",
+            file_okay=False,
+            dir_okay=True,
+            writable=True,
+            resolve_path=True
+        )
+    ],
+    manifest: Annotated[Optional[Path], typer.Option("--manifest", "-m", exists=True, dir_okay=False, resolve_path=True,
+        help="The manifest written by batch-encrypt, by default manifest.json in the input directory")] = None,
+    processes: Annotated[Optional[int], typer.Option("--processes", "-p", min=1,
+        help="Number of files decrypted concurrently, by default the number of CPUs")] = None,
+) -> None:
+    """
+    Decrypts every file listed in a manifest, with the keys and options it records.
+
+    Parameters
+    ----------
+    source : Path
+        The directory holding the encrypted files.
+    destination : Path
+        The directory the decrypted files are written to.
+    manifest : Optional[Path], optional
+        The path of the manifest, by default None which reads manifest.json in the source.
+    processes : Optional[int], optional
+        Number of files decrypted concurrently, by default None which uses the number of CPUs.
+
+    Returns
+    -------
+    None
+    """
+    from src.cryptographer.batch import batch_decrypt
+
+    report = batch_decrypt(source, destination, manifest, processes)
+    _print_batch_report(report)
+
+
+def _print_batch_report(report: dict) -> None:
+    print(
+        f"{report['files']} files, {report['bytes'] / 1e6:.1f} MB in {report['seconds']:.2f}s "
+        f"({report['throughput_mb_s']:.1f} MB/s)"
+    )
+    if report["failed"]:
+        print(f"{len(report['failed'])} files failed, see the log: {', '.join(report['failed'])}")
+        raise typer.Exit(code=1)
+
+
+@app.command(help="Run a local server that encrypts and decrypts files on a pool of processes kept alive between jobs")
+def serve(
+    socket_path: Annotated[Optional[Path], typer.Option("--socket", "-u", dir_okay=False, resolve_path=True,
+        help="Unix socket to listen on")] = None,
+    port: Annotated[Optional[int], typer.Option("--port", min=0, max=65535,
+        help="Localhost TCP port to listen on instead of a Unix socket")] = None,
+    processes: Annotated[Optional[int], typer.Option("--processes", "-p", min=1,
+        help="Number of jobs run concurrently, by default the number of CPUs")] = None,
+    queue_size: Annotated[int, typer.Option("--queue-size", "-q", min=1,
+        help="Number of jobs accepted at a time, further requests wait until a job finishes")] = 16,
+    root: Annotated[Optional[Path], typer.Option("--root", "-r", exists=True, file_okay=False, resolve_path=True,
+        help="Directory holding every file named by a job, required for jobs naming files on a --port")] = None,
+    max_size: Annotated[int, typer.Option("--max-size", min=0,
+        help="Largest WAV file a job may send, in MiB")] = 1024,
+    read_timeout: Annotated[float, typer.Option("--read-timeout", min=0.1,
+        help="Seconds a connection may stay idle and a job may take to send its file")] = 60.0,
+) -> None:
+    """
+    Runs the encryption server until it is interrupted, see src/cryptographer/server.py for the protocol.
+
+    Parameters
+    ----------
+    socket_path : Optional[Path], optional
+        The Unix socket to listen on, by default None.
+    port : Optional[int], optional
+        The localhost TCP port to listen on, by default None.
+    processes : Optional[int], optional
+        Number of jobs run concurrently, by default None which uses the number of CPUs.
+    queue_size : int, optional
+        Number of jobs accepted at a time, by default 16.
+    root : Optional[Path], optional
+        The directory holding every file named by a job, by default None which allows any file on a
+        Unix socket and no file on a port.
+    max_size : int, optional
+        The largest file a job may send in MiB, by default 1024.
+    read_timeout : float, optional
+        Seconds a connection may stay idle and a job may take to send its file, by default 60.
+
+    Returns
+    -------
+    None
+    """
+    if (socket_path is None) == (port is None):
+        raise typer.BadParameter("give either --socket or --port", param_hint="--socket")
+    from src.cryptographer.server import serve as serve_jobs
+
+    serve_jobs(socket_path, port, processes, queue_size, root, max_size << 20, read_timeout)
+
+
+@app.command(name="calibrate-kdf", help="Benchmark the key derivation on this host and print the settings that hit a target latency")
+def calibrate_kdf_command(
+    target_ms: Annotated[float, typer.Option("--target-ms", "-t", min=1,
+        help="Target latency of one key derivation in milliseconds")] = 100,
+    algorithm: Annotated[KdfAlgorithm, typer.Option("--algorithm", "-a",
+        help="Key derivation function to calibrate")] = KdfAlgorithm.pbkdf2,
+) -> None:
+    """
+    Calibrates the key derivation cost and prints the settings section to use it for new files.
+
+    Parameters
+    ----------
+    target_ms : float, optional
+        Target latency of one key derivation in milliseconds, by default 100.
+    algorithm : KdfAlgorithm, optional
+        The key derivation function to calibrate, by default pbkdf2.
+
+    Returns
+    -------
+    None
+    """
+    from src.cryptographer.helper import calibrate_kdf, derive_key
+
+    kdf = calibrate_kdf(target_ms, algorithm.value)
+    start = perf_counter()
+    derive_key("0" * 32, b"0" * 16, kdf)
+    print(f"One derivation with {kdf} takes {(perf_counter() - start) * 1000:.1f} ms on this host.")
+    print("Set it for new files in src/configs/settings.toml, files encrypted before keep their own cost:\n")
+    print("[settings.kdf]")
+    for name, value in kdf.items():
+        print(f"{name.upper()} = {value!r}".replace("'", '"'))
 
 
 @app.command(help="Make a plot of an audio file, audio signal / time")
 def plot(
-    file: Annotated[
-        Path,
+    files: Annotated[
+        List[Path],
         typer.Option(
             "--file", "-f",
-            help="Audio file name that is being ploted",
+            help="Audio file name that is being ploted, can be repeated",
             exists=True,
             file_okay=True,
             dir_okay=False,
@@ -133,8 +487,95 @@ def plot(
             resolve_path=True,
         )
     ],
+    out: Annotated[Optional[Path], typer.Option("--out", "-o", resolve_path=True,
+        help="Render PNG files without a display instead of showing the plots, a directory for several files")] = None,
+) -> None:
+    """
+    Plots audio files, or renders the plots to PNG files.
+
+    Parameters
+    ----------
+    files : List[Path]
+        The audio files to plot.
+    out : Optional[Path], optional
+        The PNG file, or the directory the PNG files named after the audio files are written to,
+        by default None which shows the plots.
+
+    Returns
+    -------
+    None
+    """
+    if out and len(files) > 1 and not out.is_dir():
+        raise typer.BadParameter("--out has to be an existing directory for several files", param_hint="--out")
+    import matplotlib as mpl
+    from src.test import visualize_audio
+
+    mpl.set_loglevel('warning')
+    for file in files:
+        output = out / f"{file.stem}.png" if out and out.is_dir() else out
+        visualize_audio(file, output)
+        if output:
+            print(f"{output} was generated")
+
+
+@app.command(help="Time every stage of the pipeline over a range of buffer sizes and compare with a baseline")
+def bench(
+    out: Annotated[Optional[Path], typer.Option("--out", "-o", dir_okay=False, resolve_path=True,
+        help="Write the results as JSON to this file")] = None,
+    baseline: Annotated[Optional[Path], typer.Option("--baseline", "-b", exists=True, dir_okay=False, resolve_path=True,
+        help="Results of an earlier run to compare with, slower stages fail the run")] = None,
+    threshold: Annotated[float, typer.Option("--threshold", "-t", min=0,
+        help="Tolerated slowdown against the baseline as a fraction, 0.2 is 20 percent")] = 0.2,
+    sizes: Annotated[Optional[List[int]], typer.Option("--size", min=1,
+        help="Buffer size in KiB, can be repeated, by default 64, 1024 and 16384")] = None,
+    stages: Annotated[Optional[List[str]], typer.Option("--stage",
+        help="Only time the stages starting with this name, can be repeated, e.g. shuffle or aes")] = None,
+    rounds: Annotated[int, typer.Option("--rounds", "-r", min=1,
+        help="Runs of every case, the fastest one is kept")] = 3,
 ) -> None:
-     visualize_audio(file)
+    """
+    Runs the stage benchmarks, prints them and optionally stores and compares them.
+
+    Parameters
+    ----------
+    out : Optional[Path], optional
+        The JSON file to write the results to, by default None.
+    baseline : Optional[Path], optional
+        The JSON file of an earlier run, by default None.
+    threshold : float, optional
+        The tolerated slowdown against the baseline, by default 0.2.
+    sizes : Optional[List[int]], optional
+        The buffer sizes in KiB, by default None which uses 64 KiB, 1 MiB and 16 MiB.
+    stages : Optional[List[str]], optional
+        Prefixes of the stages to time, by default None which times all of them.
+    rounds : int, optional
+        Number of runs of every case, by default 3.
+
+    Returns
+    -------
+    None
+    """
+    from src.test.bench_stages import (
+        SIZES,
+        benchmark_stages,
+        compare_with_baseline,
+        print_stage_benchmark,
+        read_results,
+        write_results,
+    )
+
+    reference = read_results(baseline) if baseline else None
+    rows = benchmark_stages(tuple(size * 1024 for size in sizes) if sizes else SIZES, rounds, tuple(stages or ()))
+    print_stage_benchmark(rows, reference)
+    if out:
+        write_results(rows, out)
+        print(f"Results were written to {out}")
+    if reference is not None:
+        regressions = compare_with_baseline(rows, reference, threshold)
+        for row in regressions:
+            print(f"{row['stage']} ({row['size'] or '-'} bytes) is {row['change'] * 100:.0f}% slower than the baseline")
+        if regressions:
+            raise typer.Exit(code=1)
 
 
 @app.command(help="Test Correlation, Signal to noise ratio and entropy of encryption/decryption proccess")
@@ -143,10 +584,10 @@ def test(
         Path,
         typer.Option(
             "--original", "-o",
-            help="The original file",
+            help="The original file, or a directory of them with --csv",
             exists=True,
             file_okay=True,
-            dir_okay=False,
+            dir_okay=True,
             writable=False,
             readable=True,
             resolve_path=True,
@@ -156,10 +597,10 @@ def test(
         Path,
         typer.Option(
             "--encrypted", "-e",
-            help="The encrypted file",
+            help="The encrypted file, or a directory of them with --csv",
             exists=True,
             file_okay=True,
-            dir_okay=False,
+            dir_okay=True,
             writable=False,
             readable=True,
             resolve_path=True,
@@ -169,23 +610,125 @@ def test(
         Path,
         typer.Option(
             "--decrypted", "-d",
-            help="The decrypted file",
+            help="The decrypted file, or a directory of them with --csv",
             exists=True,
             file_okay=True,
-            dir_okay=False,
+            dir_okay=True,
             writable=False,
             readable=True,
             resolve_path=True,
         )
     ],
+    csv_path: Annotated[Optional[Path], typer.Option(
+        "--csv",
+        help="Measure every .wav file below the directories and write one row per file to this CSV file",
+        dir_okay=False,
+        resolve_path=True,
+    )] = None,
+    processes: Annotated[Optional[int], typer.Option(
+        "--processes", "-p",
+        help="Number of files measured concurrently with --csv, by default the number of CPUs",
+        min=1,
+    )] = None,
+) -> None:
+    if csv_path is None:
+        if any(path.is_dir() for path in (original, encrypted, decrypted)):
+            raise typer.BadParameter("Measuring directories requires --csv")
+        from src.test import encryption_test
+
+        encryption_test(original, encrypted, decrypted)
+        return
+
+    if not all(path.is_dir() for path in (original, encrypted, decrypted)):
+        raise typer.BadParameter("--csv measures directories of files")
+    from src.test import encryption_test_batch
 
+    count = encryption_test_batch(original, encrypted, decrypted, csv_path, processes)
+    print(f"Measured {count} files, the summary is in {csv_path}")
+
+
+@app.command(help="Run the NIST SP 800-22 frequency, block frequency, runs, longest run, serial and approximate entropy tests")
+def analyze(
+    source: Annotated[BitSource, typer.Option("--source", "-s",
+        help="Test the audio data of a WAV file, a logistic map orbit or Collatz digits")] = BitSource.wav,
+    file: Annotated[Optional[Path], typer.Option(
+        "--file", "-f",
+        help="The WAV file, for --source wav",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+        resolve_path=True,
+    )] = None,
+    bits: Annotated[Optional[int], typer.Option("--bits", "-n", min=1,
+        help="Number of bits tested, by default the whole file or 1,000,000 generated bits")] = None,
+    r: Annotated[float, typer.Option("--r", help="Control parameter of the logistic map")] = 3.987654321,
+    x: Annotated[float, typer.Option("--x", help="Initial value of the logistic map")] = 0.123456789,
+    seed: Annotated[Optional[int], typer.Option("--seed", help="Seed of the Collatz starting numbers, random by default")] = None,
 ) -> None:
-    encryption_test(original, encrypted, decrypted)
+    """
+    Runs the statistical tests over a stream of bits and prints their p-values.
 
+    Parameters
+    ----------
+    source : BitSource, optional
+        Where the bits come from, by default the audio data of a WAV file.
+    file : Optional[Path], optional
+        The WAV file, by default None.
+    bits : Optional[int], optional
+        Number of bits tested, by default None.
+    r : float, optional
+        The control parameter of the logistic map.
+    x : float, optional
+        The initial value of the logistic map.
+    seed : Optional[int], optional
+        The seed of the Collatz starting numbers, by default None.
+
+    Returns
+    -------
+    None
+    """
+    from src.test.randomness import collatz_stream_bits, logistic_bits, print_battery, run_battery, wav_bits
+
+    if source is BitSource.wav:
+        if file is None:
+            raise typer.BadParameter("--source wav requires a file", param_hint="--file")
+        chunks, available = wav_bits(file)
+        if bits is not None and bits > available:
+            raise typer.BadParameter(f"the file holds {available} bits", param_hint="--bits")
+        bits = bits or available
+    else:
+        bits = bits or 1_000_000
+        chunks = logistic_bits(r, x, bits) if source is BitSource.logistic else collatz_stream_bits(bits, seed)
+    try:
+        print_battery(run_battery(chunks, bits))
+    except ValueError as error:
+        raise typer.BadParameter(str(error))
+
+
+@app.command(help="generates binary data files suitable for NIST test based on collatz conjecture sequence")
+def nist(
+    count: Annotated[int, typer.Option("--count", "-n", min=1, help="Number of files")] = 10,
+    length: Annotated[int, typer.Option("--length", "-l", min=1, help="Number of bits of every file")] = 1_000_000,
+    out: Annotated[Optional[Path], typer.Option(
+        "--out", "-o",
+        help="The directory of the files, by default the parent of the program directory",
+        file_okay=False,
+        resolve_path=True,
+    )] = None,
+    formats: Annotated[List[str], typer.Option(
+        "--format", "-f",
+        help="txt writes ASCII zeros and ones, bin packs eight bits per byte, both by default",
+    )] = ["txt", "bin"],
+    processes: Annotated[Optional[int], typer.Option(
+        "--processes", "-p", min=1, help="Number of files generated concurrently, by default the number of CPUs")] = None,
+) -> None:
+    from src.test import generate_random_sequence
 
-@app.command(help="generates 10 binary data files suitable for NIST test based on collatz conjecture sequence")
-def nist() -> None:
-    generate_random_sequence()
+    try:
+        generate_random_sequence(count, length, out, tuple(formats), processes)
+    except ValueError as error:
+        raise typer.BadParameter(str(error))
 
 
 if __name__ == "__main__":
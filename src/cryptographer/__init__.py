@@ -1 +1,13 @@
 from .application import Application
+from .api import (
+    EncryptedAudio,
+    encrypt_array,
+    decrypt_array,
+    encrypt_bytes,
+    decrypt_bytes,
+    encrypt_wav,
+    decrypt_wav,
+    encrypt_chunks,
+    decrypt_chunks,
+    decrypt_range,
+)
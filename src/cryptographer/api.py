@@ -0,0 +1,359 @@
+"""
+This module is the library interface of the cryptographer: it encrypts and decrypts audio held in
+memory, without touching the file system.
+
+The functions take the audio frames and their WAV parameters and return the ciphertext together
+with the encrypted key and the container header. The header records the mode, the key derivation
+parameters and the tag of every chunk, it has to be given back to decrypt the ciphertext. The WAV
+variants take and return whole WAV files as bytes, with the header stored in the file like the
+command line does. ``Application`` is a thin layer over these functions that reads and writes files.
+
+Classes
+-------
+EncryptedAudio
+    A ciphertext with its encrypted key and container header.
+
+Functions
+---------
+encrypt_array(frames, params, fast=False, shuffle_mode="legacy", workers=None, out=None, header=None, schedule=None)
+    Encrypts frames given as an array or any buffer, such as a memoryview.
+decrypt_array(data, params, key, header=None, fast=False, shuffle_mode="legacy", workers=None, out=None)
+    Decrypts a ciphertext given as an array or any buffer.
+encrypt_bytes(data, params, fast=False, shuffle_mode="legacy", workers=None)
+    Encrypts frames given as bytes and returns the ciphertext as bytes.
+decrypt_bytes(data, params, key, header=None, fast=False, shuffle_mode="legacy", workers=None)
+    Decrypts a ciphertext given as bytes and returns the frames as bytes.
+encrypt_wav(wav, fast=False, shuffle_mode="legacy", workers=None)
+    Encrypts a WAV file held in memory.
+decrypt_wav(wav, key, fast=False, shuffle_mode="legacy", workers=None)
+    Decrypts a WAV file held in memory.
+encrypt_chunks(chunks, fast=False, shuffle_mode="block", workers=None, header=None, schedule=None)
+    Encrypts frames chunk by chunk.
+decrypt_chunks(chunks, key, header=None, fast=False, shuffle_mode="block", workers=None)
+    Decrypts a ciphertext chunk by chunk.
+decrypt_range(data, key, start, stop, header=None, fast=False, shuffle_mode="legacy", workers=None)
+    Decrypts a range of bytes of a ciphertext.
+container_header(fast, shuffle_mode)
+    Returns the header describing a new ciphertext.
+container_mode(header, fast, shuffle_mode, workers)
+    Returns how a ciphertext has to be decrypted according to its header.
+"""
+
+import wave
+from logging import getLogger
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from .controller.audio_controller import AudioController
+from .helper import SHUFFLE_BLOCK, SHUFFLE_LEGACY, CHUNK_SIZE, KeySchedule, UnsupportedModeError, configured_kdf, shuffle_unit
+from .model.audio_model import HEADER_VERSION, AudioFileHandler
+
+core_logger = getLogger("core")
+
+Buffer = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+class EncryptedAudio(NamedTuple):
+    """
+    A ciphertext, the encrypted key given to the user and the container header needed to decrypt it.
+    """
+
+    data: Union[bytes, np.ndarray, Iterator[bytes]]
+    key: str
+    header: dict
+
+
+def encrypt_array(
+        frames: Buffer,
+        params: wave._wave_params,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+        out: Optional[Buffer] = None,
+        header: Optional[dict] = None,
+        schedule: Optional[KeySchedule] = None,
+) -> EncryptedAudio:
+    """
+    Encrypts audio frames under a new key.
+
+    Parameters
+    ----------
+    frames : bytes, bytearray, memoryview or np.ndarray
+        The audio data, any contiguous buffer. It is only read.
+    params : wave._wave_params
+        The parameters of the audio, the frame and sample modes permute whole frames or samples.
+    fast : bool, optional
+        Encrypt without shuffling (default is False).
+    shuffle_mode : str, optional
+        The permutation variant used for shuffling (default is "legacy").
+    workers : Optional[int], optional
+        Number of threads of the chunked cipher (default is None, one).
+    out : Optional[Buffer], optional
+        A writable buffer of the same size the ciphertext is written into, such as a mapped file
+        (default is None, a new array).
+    header : Optional[dict], optional
+        A header made by ``container_header`` for the same mode, its tag list is filled in
+        (default is None, a new header).
+    schedule : Optional[KeySchedule], optional
+        The schedule of a new key made by ``KeySchedule.generate`` (default is None, a new key is generated).
+
+    Returns
+    -------
+    EncryptedAudio
+        The ciphertext as a uint8 array, the encrypted key and the container header.
+    """
+    frames = _as_array(frames)
+    out = _output(out, len(frames))
+    header = container_header(fast, shuffle_mode) if header is None else header
+    unit = shuffle_unit(shuffle_mode, params.nchannels, params.sampwidth)
+    _, key = AudioController(frames).encrypt(fast, shuffle_mode, workers, header["kdf"], out, header["tags"], unit, schedule)
+    return EncryptedAudio(out, key, header)
+
+
+def decrypt_array(
+        data: Buffer,
+        params: wave._wave_params,
+        key: Union[str, KeySchedule],
+        header: Optional[dict] = None,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+        out: Optional[Buffer] = None,
+) -> np.ndarray:
+    """
+    Decrypts a ciphertext, every chunk is verified against the tags of the header and a
+    CorruptChunkError is raised at the first bad one.
+
+    Parameters
+    ----------
+    data : bytes, bytearray, memoryview or np.ndarray
+        The ciphertext, any contiguous buffer. It is only read.
+    params : wave._wave_params
+        The parameters of the audio.
+    key : Union[str, KeySchedule]
+        The encrypted key or its schedule.
+    header : Optional[dict], optional
+        The container header of the ciphertext (default is None, a ciphertext written before the
+        header was introduced, decrypted with the mode given).
+    fast, shuffle_mode, workers : optional
+        The mode of a ciphertext without header, a header overrides them.
+    out : Optional[Buffer], optional
+        A writable buffer of the same size the audio is written into (default is None, a new array).
+
+    Returns
+    -------
+    np.ndarray
+        The audio data as a uint8 array.
+    """
+    data = _as_array(data)
+    out = _output(out, len(data))
+    fast, shuffle_mode, kdf, tags, workers = container_mode(header, fast, shuffle_mode, workers)
+    unit = shuffle_unit(shuffle_mode, params.nchannels, params.sampwidth)
+    AudioController(data).decrypt(key, fast, shuffle_mode, workers, kdf, out, tags, unit)
+    return out
+
+
+def encrypt_bytes(
+        data: Union[bytes, bytearray, memoryview],
+        params: wave._wave_params,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+) -> EncryptedAudio:
+    """
+    Encrypts audio frames given as bytes, see ``encrypt_array``.
+
+    Returns
+    -------
+    EncryptedAudio
+        The ciphertext as bytes, the encrypted key and the container header.
+    """
+    encrypted = encrypt_array(data, params, fast, shuffle_mode, workers)
+    return encrypted._replace(data=encrypted.data.tobytes())
+
+
+def decrypt_bytes(
+        data: Union[bytes, bytearray, memoryview],
+        params: wave._wave_params,
+        key: Union[str, KeySchedule],
+        header: Optional[dict] = None,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+) -> bytes:
+    """
+    Decrypts a ciphertext given as bytes, see ``decrypt_array``.
+
+    Returns
+    -------
+    bytes
+        The audio data.
+    """
+    return decrypt_array(data, params, key, header, fast, shuffle_mode, workers).tobytes()
+
+
+def encrypt_wav(
+        wav: Union[bytes, bytearray, memoryview],
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+) -> EncryptedAudio:
+    """
+    Encrypts a WAV file held in memory, see ``encrypt_array``.
+
+    Returns
+    -------
+    EncryptedAudio
+        The bytes of the encrypted WAV file with its container header, the encrypted key and the header.
+    """
+    frames, params, _ = AudioFileHandler.parse_wav(wav)
+    encrypted = encrypt_array(frames, params, fast, shuffle_mode, workers)
+    return encrypted._replace(data=AudioFileHandler.build_wav(encrypted.data, params, encrypted.header))
+
+
+def decrypt_wav(
+        wav: Union[bytes, bytearray, memoryview],
+        key: Union[str, KeySchedule],
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+) -> bytes:
+    """
+    Decrypts a WAV file held in memory with the container header it stores, see ``decrypt_array``.
+
+    Returns
+    -------
+    bytes
+        The bytes of the decrypted WAV file.
+    """
+    data, params, header = AudioFileHandler.parse_wav(wav)
+    return AudioFileHandler.build_wav(decrypt_array(data, params, key, header, fast, shuffle_mode, workers), params)
+
+
+def encrypt_chunks(
+        chunks: Iterable[bytes],
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_BLOCK,
+        workers: Optional[int] = None,
+        header: Optional[dict] = None,
+        schedule: Optional[KeySchedule] = None,
+) -> EncryptedAudio:
+    """
+    Encrypts audio frames chunk by chunk, holding one chunk in memory at a time. Requires fast or
+    block mode.
+
+    Parameters
+    ----------
+    header : Optional[dict], optional
+        A header made by ``container_header``, without ``tags`` the chunks are not authenticated
+        (default is None, a new header).
+
+    Returns
+    -------
+    EncryptedAudio
+        The lazily encrypted chunks, the encrypted key and the container header, its tags are
+        complete once every chunk is consumed.
+    """
+    header = container_header(fast, shuffle_mode) if header is None else header
+    data, key = AudioController().encrypt_stream(chunks, fast, shuffle_mode, workers, header["kdf"], header.get("tags"), schedule)
+    return EncryptedAudio(data, key, header)
+
+
+def decrypt_chunks(
+        chunks: Iterable[bytes],
+        key: Union[str, KeySchedule],
+        header: Optional[dict] = None,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_BLOCK,
+        workers: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Decrypts a ciphertext chunk by chunk, see ``decrypt_array``. Requires fast or block mode.
+
+    Returns
+    -------
+    Iterator[bytes]
+        The lazily decrypted chunks.
+    """
+    fast, shuffle_mode, kdf, tags, workers = container_mode(header, fast, shuffle_mode, workers)
+    return AudioController().decrypt_stream(chunks, key, fast, shuffle_mode, workers, kdf, tags)
+
+
+def decrypt_range(
+        data: Buffer,
+        key: Union[str, KeySchedule],
+        start: int,
+        stop: int,
+        header: Optional[dict] = None,
+        fast: bool = False,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Decrypts the bytes from ``start`` to ``stop`` of a ciphertext, see ``decrypt_array``.
+    Requires fast or block mode.
+
+    Returns
+    -------
+    np.ndarray
+        The audio data of the range.
+    """
+    fast, shuffle_mode, kdf, tags, workers = container_mode(header, fast, shuffle_mode, workers)
+    return AudioController(_as_array(data)).decrypt_range(key, fast, start, stop, shuffle_mode, workers, kdf, tags)
+
+
+def container_header(fast: bool, shuffle_mode: str) -> dict:
+    """
+    Returns the header describing a new ciphertext, its tag list is filled while encrypting.
+    """
+    return {
+        "version": HEADER_VERSION,
+        "fast": fast,
+        "shuffle": None if fast else shuffle_mode,
+        "kdf": configured_kdf(),
+        "chunk_size": CHUNK_SIZE,
+        "tags": [],
+    }
+
+
+def container_mode(
+        header: Optional[dict],
+        fast: bool,
+        shuffle_mode: str,
+        workers: Optional[int],
+) -> Tuple[bool, str, Optional[dict], Optional[list], Optional[int]]:
+    """
+    Returns the mode, shuffle variant, key derivation parameters, chunk tags and workers recorded
+    by a ciphertext header. Ciphertexts without a readable header, such as those written before the
+    container header, keep the mode given by the user and are decrypted without verification.
+    Ciphertexts written to a pipe carry no tags either, their chunks are decrypted without
+    verification on at least one worker.
+    """
+    if not header or header.get("version", 1) < 2:
+        core_logger.warning("The ciphertext has no readable header, it is decrypted unverified with fast=%s and shuffle=%s", fast, shuffle_mode)
+        return fast, shuffle_mode, header.get("kdf") if header else None, None, workers
+    if header["chunk_size"] != CHUNK_SIZE:
+        raise UnsupportedModeError(f"Unsupported chunk size {header['chunk_size']} of the ciphertext")
+    if header["fast"] != fast or (not fast and header["shuffle"] != shuffle_mode):
+        core_logger.info("The ciphertext records its mode, it is decrypted with fast=%s and shuffle=%s", header['fast'], header['shuffle'])
+    tags = header.get("tags")
+    if tags is None:
+        core_logger.warning("The ciphertext was encrypted to a pipe, its chunks cannot be verified")
+        workers = workers or 1
+    return header["fast"], header["shuffle"] or shuffle_mode, header["kdf"], tags, workers
+
+
+def _as_array(data: Buffer) -> np.ndarray:
+    if isinstance(data, np.ndarray):
+        return data.reshape(-1).view(np.uint8)
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def _output(out: Optional[Buffer], size: int) -> np.ndarray:
+    if out is None:
+        return np.empty(size, dtype=np.uint8)
+    out = _as_array(out)
+    if len(out) != size:
+        raise ValueError(f"The output buffer holds {len(out)} bytes, {size} are written")
+    return out
@@ -1,5 +1,6 @@
 """
-This module contains the Application class for handling audio file encryption and decryption.
+This module contains the Application class for handling audio file encryption and decryption, it reads
+and writes the files and leaves the processing to the in-memory functions of ``api``.
 
 Classes
 -------
@@ -7,16 +8,25 @@ Application
     A class used to handle audio file encryption and decryption processes.
 """
 
+import os
+import sys
+from contextlib import contextmanager
 from logging import getLogger
-from pathlib import PosixPath, WindowsPath
-from typing import Union, Optional
+from pathlib import Path, PosixPath, WindowsPath
+from typing import Iterator, Tuple, Union, Optional
 
-from src.util import log_config
-from .controller.audio_controller import AudioController
+from src.util.profiling import profile_run, stage_iter
+from . import api
+from .helper import SHUFFLE_LEGACY, CorruptChunkError
 from .model.audio_model import AudioFileHandler
 
 core_logger = getLogger("core")
 
+# The file name of standard input and output.
+PIPE = "-"
+# Frames read from a pipe at a time unless a chunk size is given.
+PIPE_CHUNK_SIZE = 65536
+
 
 class Application:
     """
@@ -30,12 +40,27 @@ class Application:
         The path to save the processed audio file.
     fast : bool
         Perform the operation faster with less security.
-    key : Optional[str]
-        The encryption/decryption key (default is None).
+    shuffle_mode : str
+        The permutation variant used for shuffling (default is "legacy").
+    chunk_size : Optional[int]
+        Number of frames processed at a time in streaming mode (default is None, the whole file at once).
+    workers : Optional[int]
+        Number of threads of the chunk-parallel cipher (default is None, a single GCM stream).
+    start : Optional[float]
+        Start of the time range to decrypt in seconds (default is None, the beginning of the file).
+    end : Optional[float]
+        End of the time range to decrypt in seconds (default is None, the end of the file).
+    profile : Optional[Path]
+        A JSON lines file the time of every stage is appended to (default is None, no profiling).
+    raw : Optional[Tuple[int, int, int]]
+        The frame rate, channels and sample width of headerless PCM read from standard input
+        (default is None, the input is a WAV file).
+    key : str
+        The encrypted key the file was encrypted or decrypted with, set once the file is processed.
 
     Methods
     -------
-    __init__(self, file_path, out, fast, key=None)
+    __init__(self, file_path, out, fast, key=None, shuffle_mode="legacy", chunk_size=None, workers=None, start=None, end=None, profile=None, raw=None)
         Constructs the necessary attributes for the Application object and processes the audio file.
     """
 
@@ -45,6 +70,13 @@ class Application:
         out: Union[WindowsPath, PosixPath],
         fast: bool,
         key: Optional[str] = None,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        profile: Optional[Path] = None,
+        raw: Optional[Tuple[int, int, int]] = None,
     ) -> None:
         """
         Constructs the necessary attributes for the Application object and processes the audio file.
@@ -52,27 +84,206 @@ class Application:
         Parameters
         ----------
         file_path : Union[WindowsPath, PosixPath]
-            The path to the input audio file.
+            The path to the input audio file, "-" reads it from standard input.
         out : Union[WindowsPath, PosixPath]
-            The path to save the processed audio file.
+            The path to save the processed audio file, "-" writes it to standard output.
         fast : bool
             Perform the operation faster with less security.
         key : Optional[str], optional
             The encryption/decryption key (default is None).
+        shuffle_mode : str, optional
+            The permutation variant used for shuffling (default is "legacy").
+        chunk_size : Optional[int], optional
+            Number of frames processed at a time, streams the file with bounded memory
+            when given (default is None).
+        workers : Optional[int], optional
+            Number of threads of the chunk-parallel cipher, a file encrypted with workers has to be
+            decrypted with workers too, any number of them (default is None).
+        start : Optional[float], optional
+            Decrypt only the time range from this second on, requires fast or block mode (default is None).
+        end : Optional[float], optional
+            Decrypt only the time range up to this second, requires fast or block mode (default is None).
+        profile : Optional[Path], optional
+            Append the wall time, CPU time and bytes of every stage to this JSON lines file (default is None).
+        raw : Optional[Tuple[int, int, int]], optional
+            The frame rate, channels and sample width in bytes of headerless PCM read from standard
+            input (default is None, the input is a WAV file).
 
         Returns
         -------
         None
         """
-        audio_bytes, params = AudioFileHandler.read_file(file_path)
-        audio_controller = AudioController(audio_bytes)
+        run = {
+            "operation": "decrypt" if key else "encrypt",
+            "file": str(file_path),
+            "size": None if str(file_path) == PIPE else Path(file_path).stat().st_size,
+            "fast": fast,
+            "shuffle_mode": shuffle_mode,
+            "chunk_size": chunk_size,
+            "workers": workers,
+        } if profile else {}
+        try:
+            with profile_run(profile, **run):
+                if key and (start is not None or end is not None):
+                    self.key = self._decrypt_range(file_path, out, fast, key, shuffle_mode, workers, start, end)
+                elif PIPE in (str(file_path), str(out)):
+                    self.key = self._pipe(file_path, out, fast, key, shuffle_mode, chunk_size or PIPE_CHUNK_SIZE, workers, raw)
+                elif chunk_size:
+                    self.key = self._stream(file_path, out, fast, key, shuffle_mode, chunk_size, workers)
+                else:
+                    self.key = self._map(file_path, out, fast, key, shuffle_mode, workers)
+        except CorruptChunkError as error:
+            if str(out) == PIPE:
+                core_logger.error("%s is corrupted, %s. Decryption stopped", file_path, error)
+            else:
+                # The output is only replaced once every chunk is verified, a partial output is already removed.
+                core_logger.error("%s is corrupted, %s. Decryption stopped without writing %s", file_path, error, out)
+            sys.exit(1)
+
+    @staticmethod
+    def _map(
+        file_path: Union[WindowsPath, PosixPath],
+        out: Union[WindowsPath, PosixPath],
+        fast: bool,
+        key: Optional[str],
+        shuffle_mode: str,
+        workers: Optional[int],
+    ) -> str:
+        """
+        Processes the whole audio file at once and returns the key, the input and output files are mapped
+        into memory and every stage works on the mapped output.
+        """
+        audio_data, params = AudioFileHandler.map_file(file_path)
+        if key:
+            core_logger.info("User requested to decrypt %s with key %s", file_path, key)
+            header = AudioFileHandler.read_header(file_path)
+            with Application._output(out) as partial, AudioFileHandler.map_output(partial, params, len(audio_data)) as output:
+                api.decrypt_array(audio_data, params, key, header, fast, shuffle_mode, workers, output)
+            core_logger.info("%s was generated", out)
+        else:
+            core_logger.info("User requested to encrypt %s", file_path)
+            header = api.container_header(fast, shuffle_mode)
+            with Application._output(out) as partial, AudioFileHandler.map_output(partial, params, len(audio_data), header=header) as output:
+                key = api.encrypt_array(audio_data, params, fast, shuffle_mode, workers, output, header).key
+            core_logger.info("%s was generated with key %s", out, key)
+        return key
+
+    @staticmethod
+    def _stream(
+        file_path: Union[WindowsPath, PosixPath],
+        out: Union[WindowsPath, PosixPath],
+        fast: bool,
+        key: Optional[str],
+        shuffle_mode: str,
+        chunk_size: int,
+        workers: Optional[int],
+    ) -> str:
+        """
+        Processes the audio file chunk by chunk, holding only one chunk in memory at a time, and returns the key.
+        """
+        params = AudioFileHandler.read_params(file_path)
+        chunks = stage_iter("read", AudioFileHandler.iter_frames(file_path, chunk_size))
+        if key:
+            core_logger.info("User requested to decrypt %s with key %s in chunks of %s frames", file_path, key, chunk_size)
+            data = api.decrypt_chunks(chunks, key, AudioFileHandler.read_header(file_path), fast, shuffle_mode, workers)
+            with Application._output(out) as partial:
+                AudioFileHandler.write_stream(data, partial, params, key)
+            core_logger.info("%s was generated", out)
+        else:
+            core_logger.info("User requested to encrypt %s in chunks of %s frames", file_path, chunk_size)
+            data, key, header = api.encrypt_chunks(chunks, fast, shuffle_mode, workers)
+            with Application._output(out) as partial:
+                AudioFileHandler.write_stream(data, partial, params, key, header=header)
+            core_logger.info("%s was generated with key %s", out, key)
+        return key
+
+    @staticmethod
+    def _pipe(
+        file_path: Union[WindowsPath, PosixPath],
+        out: Union[WindowsPath, PosixPath],
+        fast: bool,
+        key: Optional[str],
+        shuffle_mode: str,
+        chunk_size: int,
+        workers: Optional[int],
+        raw: Optional[Tuple[int, int, int]],
+    ) -> str:
+        """
+        Processes audio read from standard input or written to standard output chunk by chunk, without
+        seeking and without temporary files, and returns the key.
+
+        Nothing can be appended to a pipe, so a ciphertext written to standard output carries its
+        header in front of the audio data and no chunk tags. Standard input is read as a WAV file of
+        known or unknown length, or as headerless PCM when ``raw`` is given, the header of a
+        ciphertext is only found there when it was written to a pipe.
+        """
+        if str(file_path) == PIPE:
+            params, header, chunks = AudioFileHandler.read_pipe(sys.stdin.buffer, chunk_size, raw)
+        else:
+            params = AudioFileHandler.read_params(file_path)
+            header = AudioFileHandler.read_header(file_path) if key else None
+            chunks = AudioFileHandler.iter_frames(file_path, chunk_size)
+        chunks = stage_iter("read", chunks)
         if key:
-            core_logger.info(f"User requested to decrypt {file_path} with key {key}")
-            data = audio_controller.decrypt(key, fast)
-            AudioFileHandler.write_file(data, out, params, key)
-            core_logger.info(f"{out} was generated")
+            core_logger.info("User requested to decrypt %s with key %s in chunks of %s frames", file_path, key, chunk_size)
+            data = api.decrypt_chunks(chunks, key, header, fast, shuffle_mode, workers)
+            header = None
+        else:
+            core_logger.info("User requested to encrypt %s in chunks of %s frames", file_path, chunk_size)
+            header = api.container_header(fast, shuffle_mode)
+            if str(out) == PIPE:
+                # The chunks stay independent so they can be decrypted as they arrive, but untagged.
+                del header["tags"]
+                workers = workers or 1
+            data, key, header = api.encrypt_chunks(chunks, fast, shuffle_mode, workers, header)
+        if str(out) == PIPE:
+            AudioFileHandler.write_pipe(data, sys.stdout.buffer, params, header)
+        else:
+            with Application._output(out) as partial:
+                AudioFileHandler.write_stream(data, partial, params, key, header=header)
+        if header is None:
+            core_logger.info("%s was generated", out)
         else:
-            core_logger.info(f"User requested to encrypt {file_path}")
-            data, key = audio_controller.encrypt(fast)
-            AudioFileHandler.write_file(data, out, params, key)
-            core_logger.info(f"{out} was generated with key {key}")
+            core_logger.info("%s was generated with key %s", out, key)
+        return key
+
+    @staticmethod
+    def _decrypt_range(
+        file_path: Union[WindowsPath, PosixPath],
+        out: Union[WindowsPath, PosixPath],
+        fast: bool,
+        key: str,
+        shuffle_mode: str,
+        workers: Optional[int],
+        start: Optional[float],
+        end: Optional[float],
+    ) -> str:
+        """
+        Decrypts the frames of a time range into a WAV file of its own and returns the key.
+        """
+        audio_data, params = AudioFileHandler.map_file(file_path)
+        first, last = AudioFileHandler.frame_range(params, start, end)
+        frame_size = params.nchannels * params.sampwidth
+        core_logger.info("User requested to decrypt frames %s to %s of %s with key %s", first, last, file_path, key)
+        header = AudioFileHandler.read_header(file_path)
+        data = api.decrypt_range(audio_data, key, first * frame_size, last * frame_size, header, fast, shuffle_mode, workers)
+        with Application._output(out) as partial:
+            AudioFileHandler.write_file(data, partial, params._replace(nframes=last - first), key)
+        core_logger.info("%s was generated", out)
+        return key
+
+    @staticmethod
+    @contextmanager
+    def _output(out: Union[WindowsPath, PosixPath]) -> Iterator[Path]:
+        """
+        Yields a file next to the output that replaces it once it is completely written. The input is
+        still read while the output is written, so it can be the output, and a failed run leaves the
+        output as it was.
+        """
+        target = Path(str(out) if str(out).endswith(".wav") else f"{out}.wav")
+        partial = target.with_name(f".{target.stem}.partial.wav")
+        try:
+            yield partial
+            os.replace(partial, target)
+        finally:
+            partial.unlink(missing_ok=True)
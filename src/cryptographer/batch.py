@@ -0,0 +1,181 @@
+"""
+This module encrypts and decrypts whole directory trees of audio files on a process pool.
+
+Functions
+---------
+batch_encrypt(source, destination, fast, shuffle_mode, chunk_size, workers, processes, manifest)
+    Encrypts every audio file below a directory and writes a manifest of their keys.
+batch_decrypt(source, destination, manifest, processes)
+    Decrypts every file listed in a manifest.
+"""
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable, Optional, Tuple
+
+from src.util import config, get_log_config
+from .application import Application
+from .helper import SHUFFLE_LEGACY
+
+core_logger = getLogger("core")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def batch_encrypt(
+        source: Path,
+        destination: Path,
+        fast: bool,
+        shuffle_mode: str = SHUFFLE_LEGACY,
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        processes: Optional[int] = None,
+        manifest: Optional[Path] = None,
+) -> dict:
+    """
+    Encrypts every audio file below the source directory into the same layout below the destination.
+
+    Parameters
+    ----------
+    source : Path
+        The directory searched recursively for audio files.
+    destination : Path
+        The directory the encrypted files are written to.
+    fast : bool
+        Perform the encryption faster with less security.
+    shuffle_mode : str, optional
+        The permutation variant used for shuffling (default is "legacy").
+    chunk_size : Optional[int], optional
+        Number of frames processed at a time in streaming mode (default is None).
+    workers : Optional[int], optional
+        Number of threads of the chunk-parallel cipher within every file (default is None).
+    processes : Optional[int], optional
+        Number of files encrypted concurrently (default is None, the number of CPUs).
+    manifest : Optional[Path], optional
+        Where to write the manifest (default is None, ``manifest.json`` in the destination).
+
+    Returns
+    -------
+    dict
+        The aggregate report: number of files, failures, bytes, wall time and throughput.
+    """
+    options = {"fast": fast, "shuffle_mode": shuffle_mode, "chunk_size": chunk_size, "workers": workers}
+    jobs = (
+        (path.relative_to(source).as_posix(), path, destination / path.relative_to(source), None)
+        for path in _audio_files(source)
+    )
+    entries, report = _run(jobs, options, processes)
+    manifest = manifest or destination / MANIFEST_NAME
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    manifest.write_text(json.dumps({"version": MANIFEST_VERSION, **options, "files": entries}, indent=2))
+    core_logger.info("Manifest of %s files was written to %s", len(entries), manifest)
+    return report
+
+
+def batch_decrypt(
+        source: Path,
+        destination: Path,
+        manifest: Optional[Path] = None,
+        processes: Optional[int] = None,
+) -> dict:
+    """
+    Decrypts every file listed in a manifest written by ``batch_encrypt``, with the options it records.
+
+    Parameters
+    ----------
+    source : Path
+        The directory holding the encrypted files.
+    destination : Path
+        The directory the decrypted files are written to.
+    manifest : Optional[Path], optional
+        The manifest to read (default is None, ``manifest.json`` in the source).
+    processes : Optional[int], optional
+        Number of files decrypted concurrently (default is None, the number of CPUs).
+
+    Returns
+    -------
+    dict
+        The aggregate report: number of files, failures, bytes, wall time and throughput.
+    """
+    recorded = json.loads((manifest or source / MANIFEST_NAME).read_text())
+    if recorded.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version: {recorded.get('version')}")
+    options = {name: recorded[name] for name in ("fast", "shuffle_mode", "chunk_size", "workers")}
+    jobs = (
+        (name, source / name, destination / name, entry["key"])
+        for name, entry in recorded["files"].items()
+    )
+    return _run(jobs, options, processes)[1]
+
+
+def _audio_files(source: Path) -> Iterable[Path]:
+    extension = config.get_value("settings.extension", "AUDIO") or ".wav"
+    return sorted(path for path in source.rglob(f"*{extension}") if path.is_file())
+
+
+def _run(jobs: Iterable[Tuple[str, Path, Path, Optional[str]]], options: dict, processes: Optional[int]) -> Tuple[dict, dict]:
+    """
+    Runs the jobs on a process pool, keeping at most two jobs per process in flight.
+    """
+    processes = processes or os.cpu_count() or 1
+    entries, failed, total_bytes = {}, [], 0
+    start = perf_counter()
+    initializer, initargs = get_log_config().worker_logging()
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs) as pool:
+        pending = {}
+        jobs = iter(jobs)
+        while True:
+            for name, file_path, out, key in jobs:
+                pending[pool.submit(_process, file_path, out, key, **options)] = name
+                if len(pending) >= 2 * processes:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = pending.pop(future)
+                try:
+                    key, seconds, size = future.result()
+                except (Exception, SystemExit) as error:
+                    core_logger.error("%s failed: %r", name, error)
+                    failed.append(name)
+                    continue
+                core_logger.info("%s took %.3fs (%.1f MB/s)", name, seconds, size / seconds / 1e6)
+                entries[name] = {"key": key, "seconds": round(seconds, 6), "bytes": size}
+                total_bytes += size
+    elapsed = perf_counter() - start
+    report = {
+        "files": len(entries),
+        "failed": sorted(failed),
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "throughput_mb_s": total_bytes / elapsed / 1e6 if elapsed else 0.0,
+    }
+    core_logger.info(
+        "%s files, %s failed, %.1f MB in %.2fs (%.1f MB/s)",
+        report['files'], len(failed), total_bytes / 1e6, elapsed, report['throughput_mb_s'],
+    )
+    return dict(sorted(entries.items())), report
+
+
+def _process(
+        file_path: Path,
+        out: Path,
+        key: Optional[str],
+        fast: bool,
+        shuffle_mode: str,
+        chunk_size: Optional[int],
+        workers: Optional[int],
+) -> Tuple[str, float, int]:
+    """
+    Encrypts the file when no key is given and decrypts it otherwise, in a pool process.
+    """
+    out.parent.mkdir(parents=True, exist_ok=True)
+    start = perf_counter()
+    application = Application(file_path, out, fast, key, shuffle_mode, chunk_size, workers)
+    return application.key, perf_counter() - start, file_path.stat().st_size
@@ -8,18 +8,31 @@ AudioController
 """
 
 from src.cryptographer.helper import (
-    generate_key,
     seeded_shuffle,
     seeded_unshuffle,
-    generate_chaotic_parameters,
-    encrypt_key,
-    decrypt_key,
-    generate_logistic_map_seq,
-    get_random_digits,
+    shuffle_stream,
+    unshuffle_stream,
     encrypt_data_gcm,
-    decrypt_data_gcm
+    decrypt_data_gcm,
+    create_gcm_encryptor,
+    create_gcm_decryptor,
+    encrypt_chunks_gcm,
+    decrypt_chunks_gcm,
+    encrypt_data_gcm_parallel,
+    decrypt_data_gcm_parallel,
+    decrypt_range_gcm,
+    unshuffle_window,
+    UnsupportedModeError,
+    SHUFFLE_LEGACY,
+    SHUFFLE_BLOCK,
+    WINDOW_SIZE,
+    KeySchedule,
+    schedule_cache,
 )
-from typing import Tuple, Union
+from src.util.profiling import stage, stage_iter
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
 
 class AudioController:
     """
@@ -29,20 +42,26 @@ class AudioController:
     -------
     __init__(self, audio_data: bytes) -> None
         Initializes the AudioController with audio data.
-    encrypt(self, fast: bool) -> Tuple[Union[bytes, list[int]], str]
+    encrypt(self, fast: bool, shuffle_mode: str, workers: Optional[int], kdf: Optional[dict], out: Optional[np.ndarray], tags: Optional[list], unit: int, schedule: Optional[KeySchedule]) -> Tuple[bytes, str]
         Encrypts the audio data and returns the encrypted data and encryption key.
-    decrypt(self, key: str, fast: bool) -> bytes
+    decrypt(self, key: Union[str, KeySchedule], fast: bool, shuffle_mode: str, workers: Optional[int], kdf: Optional[dict], out: Optional[np.ndarray], tags: Optional[list], unit: int) -> Union[bytes, np.ndarray]
         Decrypts the audio data using the provided key and returns the decrypted data.
+    encrypt_stream(self, chunks: Iterable[bytes], fast: bool, shuffle_mode: str, workers: Optional[int], kdf: Optional[dict], tags: Optional[list], schedule: Optional[KeySchedule]) -> Tuple[Iterator[bytes], str]
+        Encrypts audio data chunk by chunk and returns the encrypted chunks and encryption key.
+    decrypt_stream(self, chunks: Iterable[bytes], key: Union[str, KeySchedule], fast: bool, shuffle_mode: str, workers: Optional[int], kdf: Optional[dict], tags: Optional[list]) -> Iterator[bytes]
+        Decrypts audio data chunk by chunk using the provided key.
+    decrypt_range(self, key: Union[str, KeySchedule], fast: bool, start: int, stop: int, shuffle_mode: str, workers: Optional[int], kdf: Optional[dict], tags: Optional[list]) -> np.ndarray
+        Decrypts only a range of bytes of the audio data using the provided key.
     """
 
-    def __init__(self, audio_data: bytes) -> None:
+    def __init__(self, audio_data: Optional[Union[bytes, np.ndarray]] = None) -> None:
         """
         Initializes the AudioController with audio data.
 
         Parameters
         ----------
-        audio_data : bytes
-            The audio data to be processed.
+        audio_data : bytes or np.ndarray, optional
+            The audio data to be processed, not needed for the streaming methods (default is None).
 
         Returns
         -------
@@ -50,7 +69,17 @@ class AudioController:
         """
         self.audio_data = audio_data
 
-    def encrypt(self, fast: bool) -> Tuple[Union[bytes, list[int]], str]:
+    def encrypt(
+            self,
+            fast: bool,
+            shuffle_mode: str = SHUFFLE_LEGACY,
+            workers: Optional[int] = None,
+            kdf: Optional[dict] = None,
+            out: Optional[np.ndarray] = None,
+            tags: Optional[list] = None,
+            unit: int = 1,
+            schedule: Optional[KeySchedule] = None
+    ) -> Tuple[bytes, str]:
         """
         Encrypts the audio data and returns the encrypted data and encryption key.
 
@@ -58,55 +87,292 @@ class AudioController:
         ----------
         fast : bool
             Flag to indicate if the encryption should be faster with less security.
+        shuffle_mode : str, optional
+            The permutation variant used for shuffling (default is "legacy").
+        workers : Optional[int], optional
+            Encrypt chunks under their own nonces on this many threads, the ciphertext is the
+            same for any number of workers (default is None, a single GCM stream).
+        kdf : Optional[dict], optional
+            The key derivation parameters, to be stored with the ciphertext (default is None, the legacy PBKDF2 cost).
+        out : Optional[np.ndarray], optional
+            A writable uint8 array of the same length every stage writes into, such as a mapped
+            output file, the audio data is then only read (default is None).
+        tags : Optional[list], optional
+            A list collecting the authentication tag of every chunk, the data is then encrypted in
+            independently authenticated chunks even without workers (default is None).
+        unit : int, optional
+            The bytes of a frame or sample permuted as a whole by the frame and sample modes (default is 1).
+        schedule : Optional[KeySchedule], optional
+            The schedule of a new key made by ``KeySchedule.generate``, it encrypts a single time
+            (default is None, a new key is generated).
 
         Returns
         -------
-        Tuple[Union[bytes, list[int]], str]
+        Tuple[bytes, str]
             A tuple containing the encrypted audio data and the encryption key.
         """
-        key = generate_key()
-        r1, r2, x1, x2 = generate_chaotic_parameters(key)
+        schedule = schedule or KeySchedule.generate()
+        schedule.claim_for_encryption()
 
         if not fast:
-            chaotic_seq = generate_logistic_map_seq(r1, x1)
-            seed = get_random_digits(chaotic_seq, key)
-            self.audio_data = seeded_shuffle(self.audio_data, int(seed))
+            seed = schedule.shuffle_seed()
+            with stage("shuffle", len(self.audio_data)):
+                self.audio_data = seeded_shuffle(self.audio_data, seed, shuffle_mode, out, unit)
 
-        chaotic_seq = generate_logistic_map_seq(r2, x2)
-        gkey = get_random_digits(chaotic_seq, key)
-        password, nonce, salt = gkey[:32], bytes(gkey[32:44], encoding='ascii'), bytes(gkey[44:], encoding='ascii')
-        self.audio_data = encrypt_data_gcm(self.audio_data, password, nonce, salt)
+        cipher = (schedule.password, schedule.nonce, schedule.salt)
+        aes_key = schedule.aes_key(kdf)
+        with stage("aes encrypt", len(self.audio_data)):
+            if workers or tags is not None:
+                self.audio_data = encrypt_data_gcm_parallel(self.audio_data, *cipher, workers or 1, kdf, out, tags, aes_key)
+            else:
+                self.audio_data = encrypt_data_gcm(self.audio_data, *cipher, kdf, out, aes_key)
 
-        encrypted_key = encrypt_key(key)
-        return self.audio_data, encrypted_key
+        return self.audio_data, schedule.encrypted_key
 
-    def decrypt(self, key: str, fast: bool) -> bytes:
+    def decrypt(
+            self,
+            key: Union[str, KeySchedule],
+            fast: bool,
+            shuffle_mode: str = SHUFFLE_LEGACY,
+            workers: Optional[int] = None,
+            kdf: Optional[dict] = None,
+            out: Optional[np.ndarray] = None,
+            tags: Optional[list] = None,
+            unit: int = 1
+    ) -> Union[bytes, np.ndarray]:
         """
         Decrypts the audio data using the provided key and returns the decrypted data.
 
         Parameters
         ----------
-        key : str
-            The key used to decrypt the audio data.
+        key : str or KeySchedule
+            The encrypted key used to decrypt the audio data, or its schedule.
         fast : bool
             Flag to indicate if the decryption should be faster with less security.
+        shuffle_mode : str, optional
+            The permutation variant the data was shuffled with (default is "legacy").
+        workers : Optional[int], optional
+            Decrypt chunks under their own nonces on this many threads, required if the data was
+            encrypted with workers (default is None, a single GCM stream).
+        kdf : Optional[dict], optional
+            The key derivation parameters the data was encrypted with (default is None, the legacy PBKDF2 cost).
+        out : Optional[np.ndarray], optional
+            A writable uint8 array of the same length every stage writes into, such as a mapped
+            output file, the audio data is then only read (default is None).
+        tags : Optional[list], optional
+            The authentication tags of the chunks, every chunk is verified and a CorruptChunkError
+            is raised at the first bad one (default is None, the data is not verified).
+        unit : int, optional
+            The unit the frame and sample modes permuted (default is 1).
 
         Returns
         -------
-        bytes
+        bytes or np.ndarray
             The decrypted audio data.
         """
-        key = decrypt_key(key)
-        r1, r2, x1, x2 = generate_chaotic_parameters(key)
+        schedule = self._schedule(key)
 
-        chaotic_seq = generate_logistic_map_seq(r2, x2)
-        gkey = get_random_digits(chaotic_seq, key)
-        password, nonce, salt = gkey[:32], bytes(gkey[32:44], encoding='ascii'), bytes(gkey[44:], encoding='ascii')
-        self.audio_data = decrypt_data_gcm(self.audio_data, password, nonce, salt)
+        cipher = (schedule.password, schedule.nonce, schedule.salt)
+        aes_key = schedule.aes_key(kdf)
+        with stage("aes decrypt", len(self.audio_data)):
+            if workers or tags is not None:
+                self.audio_data = decrypt_data_gcm_parallel(self.audio_data, *cipher, workers or 1, kdf, out, tags, aes_key)
+            else:
+                self.audio_data = decrypt_data_gcm(self.audio_data, *cipher, kdf, out, aes_key)
 
         if not fast:
-            chaotic_seq = generate_logistic_map_seq(r1, x1)
-            seed = get_random_digits(chaotic_seq, key)
-            self.audio_data = seeded_unshuffle(self.audio_data, int(seed))
+            seed = schedule.shuffle_seed()
+            with stage("unshuffle", len(self.audio_data)):
+                self.audio_data = seeded_unshuffle(self.audio_data, seed, shuffle_mode, unit)
 
         return self.audio_data
+
+    def encrypt_stream(
+            self,
+            chunks: Iterable[bytes],
+            fast: bool,
+            shuffle_mode: str = SHUFFLE_BLOCK,
+            workers: Optional[int] = None,
+            kdf: Optional[dict] = None,
+            tags: Optional[list] = None,
+            schedule: Optional[KeySchedule] = None
+    ) -> Tuple[Iterator[bytes], str]:
+        """
+        Encrypts audio data chunk by chunk and returns the encrypted chunks and encryption key.
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            The audio data in chunks, consumed lazily while the result is iterated.
+        fast : bool
+            Flag to indicate if the encryption should be faster with less security.
+        shuffle_mode : str, optional
+            The permutation variant used for shuffling, only the block mode can be streamed (default is "block").
+        workers : Optional[int], optional
+            Encrypt chunks under their own nonces on this many threads, the ciphertext is the
+            same for any number of workers (default is None, a single GCM stream).
+        kdf : Optional[dict], optional
+            The key derivation parameters, to be stored with the ciphertext (default is None, the legacy PBKDF2 cost).
+        tags : Optional[list], optional
+            A list collecting the authentication tag of every chunk, the data is then encrypted in
+            independently authenticated chunks even without workers (default is None).
+        schedule : Optional[KeySchedule], optional
+            The schedule of a new key made by ``KeySchedule.generate``, it encrypts a single time
+            (default is None, a new key is generated).
+
+        Returns
+        -------
+        Tuple[Iterator[bytes], str]
+            A tuple containing the lazily encrypted chunks and the encryption key.
+        """
+        self._check_streamable(fast, shuffle_mode)
+        schedule = schedule or KeySchedule.generate()
+        schedule.claim_for_encryption()
+
+        if not fast:
+            chunks = stage_iter("shuffle", shuffle_stream(chunks, schedule.shuffle_seed()))
+
+        cipher = (schedule.password, schedule.nonce, schedule.salt)
+        aes_key = schedule.aes_key(kdf)
+        if workers or tags is not None:
+            chunks = encrypt_chunks_gcm(chunks, *cipher, workers or 1, kdf, tags, aes_key)
+        else:
+            encryptor = create_gcm_encryptor(*cipher, kdf, aes_key)
+            chunks = (encryptor.update(chunk) for chunk in chunks)
+        return stage_iter("aes encrypt", chunks), schedule.encrypted_key
+
+    def decrypt_stream(
+            self,
+            chunks: Iterable[bytes],
+            key: Union[str, KeySchedule],
+            fast: bool,
+            shuffle_mode: str = SHUFFLE_BLOCK,
+            workers: Optional[int] = None,
+            kdf: Optional[dict] = None,
+            tags: Optional[list] = None
+    ) -> Iterator[bytes]:
+        """
+        Decrypts audio data chunk by chunk using the provided key.
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            The encrypted audio data in chunks, consumed lazily while the result is iterated.
+        key : str or KeySchedule
+            The encrypted key used to decrypt the audio data, or its schedule.
+        fast : bool
+            Flag to indicate if the decryption should be faster with less security.
+        shuffle_mode : str, optional
+            The permutation variant the data was shuffled with, only the block mode can be streamed (default is "block").
+        workers : Optional[int], optional
+            Decrypt chunks under their own nonces on this many threads, required if the data was
+            encrypted with workers (default is None, a single GCM stream).
+        kdf : Optional[dict], optional
+            The key derivation parameters the data was encrypted with (default is None, the legacy PBKDF2 cost).
+        tags : Optional[list], optional
+            The authentication tags of the chunks, every chunk is verified and a CorruptChunkError
+            is raised at the first bad one (default is None, the data is not verified).
+
+        Returns
+        -------
+        Iterator[bytes]
+            The lazily decrypted chunks.
+        """
+        self._check_streamable(fast, shuffle_mode)
+        schedule = self._schedule(key)
+
+        cipher = (schedule.password, schedule.nonce, schedule.salt)
+        aes_key = schedule.aes_key(kdf)
+        if workers or tags is not None:
+            chunks = decrypt_chunks_gcm(chunks, *cipher, workers or 1, kdf, tags, aes_key)
+        else:
+            decryptor = create_gcm_decryptor(*cipher, kdf, aes_key)
+            chunks = (decryptor.update(chunk) for chunk in chunks)
+        chunks = stage_iter("aes decrypt", chunks)
+
+        if not fast:
+            chunks = stage_iter("unshuffle", unshuffle_stream(chunks, schedule.shuffle_seed()))
+
+        return chunks
+
+    def decrypt_range(
+            self,
+            key: Union[str, KeySchedule],
+            fast: bool,
+            start: int,
+            stop: int,
+            shuffle_mode: str = SHUFFLE_BLOCK,
+            workers: Optional[int] = None,
+            kdf: Optional[dict] = None,
+            tags: Optional[list] = None
+    ) -> np.ndarray:
+        """
+        Decrypts only the bytes from start to stop of the audio data using the provided key.
+
+        Only the shuffle windows covering the range are read and decrypted, so the cost depends
+        on the length of the range and not on the size of the audio data.
+
+        Parameters
+        ----------
+        key : str or KeySchedule
+            The encrypted key used to decrypt the audio data, or its schedule.
+        fast : bool
+            Flag to indicate if the decryption should be faster with less security.
+        start : int
+            The first byte of the range.
+        stop : int
+            The byte after the end of the range.
+        shuffle_mode : str, optional
+            The permutation variant the data was shuffled with, only the block mode allows
+            random access (default is "block").
+        workers : Optional[int], optional
+            Set if the data was encrypted with workers, the range is decrypted on a single thread (default is None).
+        kdf : Optional[dict], optional
+            The key derivation parameters the data was encrypted with (default is None, the legacy PBKDF2 cost).
+        tags : Optional[list], optional
+            The authentication tags of the chunks, every chunk is verified and a CorruptChunkError
+            is raised at the first bad one (default is None, the data is not verified).
+
+        Returns
+        -------
+        np.ndarray
+            The decrypted bytes of the range.
+        """
+        self._check_streamable(fast, shuffle_mode)
+        schedule = self._schedule(key)
+
+        # The block shuffle can only be undone window by window and tags only authenticate whole chunks,
+        # so the range is widened to whole windows, which are also the chunks of the cipher.
+        first, last = start, stop
+        if not fast or tags is not None:
+            first = start // WINDOW_SIZE * WINDOW_SIZE
+            last = min(len(self.audio_data), -(-stop // WINDOW_SIZE) * WINDOW_SIZE)
+        cipher = (schedule.password, schedule.nonce, schedule.salt)
+        aes_key = schedule.aes_key(kdf)
+        chunked = bool(workers) or tags is not None
+        with stage("aes decrypt", last - first):
+            data = decrypt_range_gcm(self.audio_data[first:last], *cipher, first, chunked, kdf, tags, aes_key)
+        data = np.frombuffer(data, dtype=np.uint8)
+
+        if not fast:
+            seed = schedule.shuffle_seed()
+            with stage("unshuffle", len(data)):
+                for position in range(0, len(data), WINDOW_SIZE):
+                    unshuffle_window(data[position:position + WINDOW_SIZE], seed, (first + position) // WINDOW_SIZE)
+
+        return data[start - first:stop - first]
+
+    @staticmethod
+    def _check_streamable(fast: bool, shuffle_mode: str) -> None:
+        """
+        Raises an UnsupportedModeError when the shuffle needs the whole file at once.
+        """
+        if not fast and shuffle_mode != SHUFFLE_BLOCK:
+            raise UnsupportedModeError(f"The {shuffle_mode} shuffle permutes the whole file at once, streaming requires fast or block mode")
+
+    @staticmethod
+    def _schedule(key: Union[str, KeySchedule]) -> KeySchedule:
+        """
+        Returns the schedule of a key, the schedules of encrypted keys are cached.
+        """
+        return key if isinstance(key, KeySchedule) else schedule_cache.get(key)
@@ -0,0 +1,183 @@
+"""
+This module provides a stateful encryptor and decryptor for live audio sent packet by packet.
+
+A capture device delivers audio in small packets, 20 ms are 3840 bytes of 48 kHz 16-bit stereo.
+The key schedule and the AES key are set up once when the stream starts, every packet is then
+sealed in a single AES-GCM call under the chunk nonce of its index and carries its own tag, so a
+packet can be decrypted on arrival, alone, and a lost packet does not affect the others.
+
+The packets are encrypted like ``--fast`` files: the shuffle modes permute whole windows of the
+audio and would hold packets back until a window is complete.
+
+Classes
+-------
+Packet
+    An encrypted packet and its index in the stream.
+PacketEncryptor
+    Encrypts the packets of a live stream under a new key.
+PacketDecryptor
+    Decrypts and verifies the packets of a live stream.
+"""
+
+import struct
+from typing import NamedTuple, Optional, Union
+
+from cryptography.exceptions import InvalidTag
+
+from src.cryptographer.helper import (
+    create_packet_cipher,
+    chunk_nonce,
+    CorruptChunkError,
+    KeySchedule,
+    schedule_cache,
+)
+from src.util.profiling import stage
+
+# The index in front of a serialized packet, big-endian.
+INDEX_FORMAT = '>Q'
+INDEX_SIZE = struct.calcsize(INDEX_FORMAT)
+
+
+class Packet(NamedTuple):
+    """
+    An encrypted packet, the ciphertext followed by its 16 byte tag, and its index in the stream.
+    """
+
+    index: int
+    payload: bytes
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the packet as its 8 byte index followed by the payload.
+        """
+        return struct.pack(INDEX_FORMAT, self.index) + self.payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Packet":
+        """
+        Reads a packet serialized by ``to_bytes``.
+        """
+        if len(data) < INDEX_SIZE:
+            raise ValueError(f"A packet holds at least its {INDEX_SIZE} byte index, got {len(data)} bytes")
+        return cls(struct.unpack_from(INDEX_FORMAT, data)[0], bytes(data[INDEX_SIZE:]))
+
+
+class PacketEncryptor:
+    """
+    Encrypts the packets of a live stream, one call per packet.
+
+    Attributes
+    ----------
+    key : str
+        The encrypted key the stream is encrypted with, given to the receiver.
+    index : int
+        The index of the next packet.
+
+    Methods
+    -------
+    __init__(self, kdf=None, schedule=None) -> None
+        Sets up the key of the stream.
+    encrypt(self, frames) -> Packet
+        Encrypts the next packet.
+    """
+
+    def __init__(self, kdf: Optional[dict] = None, schedule: Optional[KeySchedule] = None) -> None:
+        """
+        Sets up the key of the stream, the only step that pays for the key schedule and the key derivation.
+
+        Parameters
+        ----------
+        kdf : Optional[dict], optional
+            The key derivation parameters, the receiver has to use the same ones (default is None,
+            the legacy PBKDF2 cost).
+        schedule : Optional[KeySchedule], optional
+            The schedule of a new key made by ``KeySchedule.generate``, it encrypts a single stream
+            (default is None, a new key is generated).
+
+        Returns
+        -------
+        None
+        """
+        schedule = schedule or KeySchedule.generate()
+        schedule.claim_for_encryption()
+        with stage("packet setup"):
+            self._cipher = create_packet_cipher(schedule.aes_key(kdf))
+        self._nonce = schedule.nonce
+        self.key = schedule.encrypted_key
+        self.index = 0
+
+    def encrypt(self, frames: Union[bytes, bytearray, memoryview]) -> Packet:
+        """
+        Encrypts the next packet of the stream.
+
+        Parameters
+        ----------
+        frames : bytes, bytearray or memoryview
+            The audio of the packet, any contiguous buffer such as a numpy array of samples.
+
+        Returns
+        -------
+        Packet
+            The encrypted packet, 16 bytes longer than the audio.
+        """
+        if not isinstance(frames, bytes):
+            frames = memoryview(frames).cast('B')
+        index = self.index
+        self.index += 1
+        return Packet(index, self._cipher.encrypt(chunk_nonce(self._nonce, index), frames, None))
+
+
+class PacketDecryptor:
+    """
+    Decrypts and verifies the packets of a live stream, in any order and with gaps.
+
+    Methods
+    -------
+    __init__(self, key, kdf=None) -> None
+        Sets up the key of the stream.
+    decrypt(self, packet) -> bytes
+        Decrypts and verifies a packet.
+    """
+
+    def __init__(self, key: Union[str, KeySchedule], kdf: Optional[dict] = None) -> None:
+        """
+        Sets up the key of the stream.
+
+        Parameters
+        ----------
+        key : Union[str, KeySchedule]
+            The encrypted key of the stream or its schedule.
+        kdf : Optional[dict], optional
+            The key derivation parameters the stream was encrypted with (default is None, the
+            legacy PBKDF2 cost).
+
+        Returns
+        -------
+        None
+        """
+        schedule = key if isinstance(key, KeySchedule) else schedule_cache.get(key)
+        with stage("packet setup"):
+            self._cipher = create_packet_cipher(schedule.aes_key(kdf))
+        self._nonce = schedule.nonce
+
+    def decrypt(self, packet: Union[Packet, bytes]) -> bytes:
+        """
+        Decrypts a packet and checks its tag, a CorruptChunkError is raised for a damaged or
+        forged packet.
+
+        Parameters
+        ----------
+        packet : Union[Packet, bytes]
+            The packet, or its serialized form.
+
+        Returns
+        -------
+        bytes
+            The audio of the packet.
+        """
+        if not isinstance(packet, Packet):
+            packet = Packet.from_bytes(packet)
+        try:
+            return self._cipher.decrypt(chunk_nonce(self._nonce, packet.index), packet.payload, None)
+        except InvalidTag:
+            raise CorruptChunkError(packet.index, f"Packet {packet.index} failed authentication") from None
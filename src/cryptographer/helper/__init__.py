@@ -1,16 +1,62 @@
-from .shuffle import seeded_shuffle, seeded_unshuffle
+from .shuffle import (
+    seeded_shuffle,
+    seeded_unshuffle,
+    shuffle_stream,
+    unshuffle_stream,
+    unshuffle_window,
+    shuffle_unit,
+    SHUFFLE_LEGACY,
+    SHUFFLE_V1,
+    SHUFFLE_BLOCK,
+    SHUFFLE_FRAME,
+    SHUFFLE_SAMPLE,
+    SHUFFLE_MODES,
+    WINDOW_SIZE,
+)
 from .key import (
     generate_key, 
     encrypt_key,
     decrypt_key,
     generate_chaotic_parameters,
+    generate_chaotic_parameters_batch,
+)
+from .collatz import (
+    generate_collatz_sequence,
+    collatz_window,
+    collatz_windows,
 )
 from .clm import (
     generate_logistic_map_seq,
+    logistic_map_sequence,
+    logistic_map_orbit,
+    logistic_map_orbits,
+    LogisticMapDigits,
     get_random_digits
 )
 
 from .aes import (
     encrypt_data_gcm,
-    decrypt_data_gcm
+    decrypt_data_gcm,
+    create_gcm_encryptor,
+    create_gcm_decryptor,
+    encrypt_chunks_gcm,
+    decrypt_chunks_gcm,
+    encrypt_data_gcm_parallel,
+    decrypt_data_gcm_parallel,
+    decrypt_range_gcm,
+    create_packet_cipher,
+    chunk_nonce,
+    CorruptChunkError,
+    UnsupportedModeError,
+    CHUNK_SIZE,
+    derive_key,
+    configured_kdf,
+    calibrate_kdf,
+    KDF_PBKDF2,
+    KDF_SCRYPT,
+)
+from .schedule import (
+    KeySchedule,
+    KeyScheduleCache,
+    schedule_cache,
 )
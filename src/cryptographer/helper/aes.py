@@ -1,9 +1,205 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import CipherContext
+from cryptography.exceptions import InvalidTag
+
+from .chunking import rechunk
+from src.util import config
+from src.util.profiling import stage
+
+KDF_PBKDF2 = "pbkdf2"
+KDF_SCRYPT = "scrypt"
+# Files written before the cost became configurable carry no parameters and used this one.
+LEGACY_KDF = {"algorithm": KDF_PBKDF2, "iterations": 100000}
+MIN_PBKDF2_ITERATIONS = 10000
+MIN_SCRYPT_N = 1 << 12
+
+# Size in bytes of the independently encrypted chunks of the parallel cipher, fixed so the
+# ciphertext does not depend on the number of workers.
+CHUNK_SIZE = 1 << 20
+
+Buffer = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+class CorruptChunkError(ValueError):
+    """
+    Raised when a chunk of the ciphertext fails its authentication tag or chunks are missing.
+    """
+
+    def __init__(self, index: int, message: Optional[str] = None) -> None:
+        super().__init__(message or f"Chunk {index} of the ciphertext failed authentication")
+        self.index = index
+
+
+class UnsupportedModeError(ValueError):
+    """
+    Raised when a file cannot be decrypted as asked: in chunks or as a time range under a shuffle
+    of the whole file, with a chunk size this version does not use, or over a range without frames.
+    """
+
+
+def derive_key(password: str, salt: bytes, kdf: Optional[dict] = None) -> bytes:
+    """
+    Derives an AES key from a password using PBKDF2 or scrypt.
+
+    Parameters
+    ----------
+    password : str
+        The password to derive the key from.
+    salt : bytes
+        The salt to use for key derivation.
+    kdf : dict, optional
+        The key derivation parameters as returned by ``configured_kdf`` (default is None,
+        PBKDF2 with the 100,000 iterations used before the cost became configurable).
+
+    Returns
+    -------
+    bytes
+        The derived 32 byte key.
+    """
+    kdf = kdf or LEGACY_KDF
+    if kdf["algorithm"] == KDF_PBKDF2:
+        derivation = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=kdf["iterations"],
+            backend=default_backend()
+        )
+    elif kdf["algorithm"] == KDF_SCRYPT:
+        derivation = Scrypt(salt=salt, length=32, n=kdf["n"], r=kdf["r"], p=kdf["p"], backend=default_backend())
+    else:
+        raise ValueError(f"Unsupported key derivation function: {kdf['algorithm']}")
+    with stage("kdf"):
+        return derivation.derive(password.encode())
+
+def configured_kdf() -> dict:
+    """
+    Reads the key derivation parameters for new files from the settings.
+
+    Returns
+    -------
+    dict
+        The algorithm and its cost parameters.
+    """
+    settings = config.get_value('settings.kdf') or {}
+    algorithm = settings.get('ALGORITHM', KDF_PBKDF2)
+    if algorithm == KDF_SCRYPT:
+        return {"algorithm": KDF_SCRYPT, "n": settings.get('N', 1 << 14), "r": settings.get('R', 8), "p": settings.get('P', 1)}
+    return {"algorithm": KDF_PBKDF2, "iterations": settings.get('ITERATIONS', LEGACY_KDF["iterations"])}
+
+def calibrate_kdf(target_ms: float, algorithm: str = KDF_PBKDF2) -> dict:
+    """
+    Benchmarks the host and picks the highest cost whose derivation stays within the target latency.
 
-def encrypt_data_gcm(data: bytes, password: str, nonce: bytes, salt: bytes) -> bytes:
+    Parameters
+    ----------
+    target_ms : float
+        The target latency of one key derivation in milliseconds.
+    algorithm : str, optional
+        Either "pbkdf2" or "scrypt" (default is "pbkdf2").
+
+    Returns
+    -------
+    dict
+        The calibrated key derivation parameters, never cheaper than the minimum cost.
+    """
+    password, salt = "0" * 32, b"0" * 16
+    if algorithm == KDF_PBKDF2:
+        probe = {"algorithm": KDF_PBKDF2, "iterations": MIN_PBKDF2_ITERATIONS}
+        elapsed = _time_derivation(password, salt, probe)
+        iterations = int(MIN_PBKDF2_ITERATIONS * target_ms / 1000 / elapsed) // 1000 * 1000
+        return {"algorithm": KDF_PBKDF2, "iterations": max(MIN_PBKDF2_ITERATIONS, iterations)}
+    if algorithm == KDF_SCRYPT:
+        n = MIN_SCRYPT_N
+        while _time_derivation(password, salt, {"algorithm": KDF_SCRYPT, "n": n * 2, "r": 8, "p": 1}) * 1000 <= target_ms:
+            n *= 2
+        return {"algorithm": KDF_SCRYPT, "n": n, "r": 8, "p": 1}
+    raise ValueError(f"Unsupported key derivation function: {algorithm}")
+
+def _time_derivation(password: str, salt: bytes, kdf: dict, rounds: int = 3) -> float:
+    """
+    Returns the fastest of a few derivations in seconds.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        derive_key(password, salt, kdf)
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+def create_gcm_encryptor(password: str, nonce: bytes, salt: bytes, kdf: Optional[dict] = None, aes_key: Optional[bytes] = None) -> CipherContext:
+    """
+    Creates an incremental AES-GCM encryptor with a password-derived key.
+
+    Parameters
+    ----------
+    password : str
+        The password to derive the encryption key.
+    nonce : bytes
+        The nonce to use for the AES-GCM mode.
+    salt : bytes
+        The salt to use for key derivation.
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Returns
+    -------
+    CipherContext
+        An encryptor whose ``update`` can be fed the data chunk by chunk.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    return Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend()).encryptor()
+
+def create_gcm_decryptor(password: str, nonce: bytes, salt: bytes, kdf: Optional[dict] = None, aes_key: Optional[bytes] = None) -> CipherContext:
+    """
+    Creates an incremental AES-GCM decryptor with a password-derived key.
+
+    Parameters
+    ----------
+    password : str
+        The password to derive the decryption key.
+    nonce : bytes
+        The nonce used for the AES-GCM mode.
+    salt : bytes
+        The salt used for key derivation.
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Returns
+    -------
+    CipherContext
+        A decryptor whose ``update`` can be fed the data chunk by chunk.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    return Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend()).decryptor()
+
+def encrypt_data_gcm(
+        data: bytes,
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        kdf: Optional[dict] = None,
+        out: Optional[Buffer] = None,
+        aes_key: Optional[bytes] = None
+) -> bytes:
     """
     Encrypts data using AES-GCM with a password-derived key.
 
@@ -17,27 +213,36 @@ def encrypt_data_gcm(data: bytes, password: str, nonce: bytes, salt: bytes) -> b
         The nonce to use for the AES-GCM mode.
     salt : bytes
         The salt to use for key derivation.
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    out : Buffer, optional
+        A writable buffer of the same length the encrypted data is written to, it may be the
+        data itself (default is None, a new bytes object).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
 
     Returns
     -------
     bytes
-        The encrypted data.
-    """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-        backend=default_backend()
-    )
-    key = kdf.derive(password.encode())
-
-    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
-    encryptor = cipher.encryptor()
+        The encrypted data, the output buffer when given.
+    """
+    encryptor = create_gcm_encryptor(password, nonce, salt, kdf, aes_key)
+    if out is not None:
+        encryptor.update_into(data, out)
+        return out
     encrypted_data = encryptor.update(data)
     return encrypted_data
 
-def decrypt_data_gcm(data: bytes, password: str, nonce: bytes, salt: bytes) -> bytes:
+def decrypt_data_gcm(
+        data: bytes,
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        kdf: Optional[dict] = None,
+        out: Optional[Buffer] = None,
+        aes_key: Optional[bytes] = None
+) -> bytes:
     """
     Decrypts data using AES-GCM with a password-derived key.
 
@@ -51,23 +256,417 @@ def decrypt_data_gcm(data: bytes, password: str, nonce: bytes, salt: bytes) -> b
         The nonce used for the AES-GCM mode.
     salt : bytes
         The salt used for key derivation.
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    out : Buffer, optional
+        A writable buffer of the same length the decrypted data is written to, it may be the
+        data itself (default is None, a new bytes object).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
 
     Returns
     -------
     bytes
-        The decrypted data.
+        The decrypted data, the output buffer when given.
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-        backend=default_backend()
-    )
-    key = kdf.derive(password.encode())
-
-    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
-    decryptor = cipher.decryptor()
-
+    decryptor = create_gcm_decryptor(password, nonce, salt, kdf, aes_key)
+    if out is not None:
+        decryptor.update_into(data, out)
+        return out
     decrypted_data = decryptor.update(data)
     return decrypted_data
+
+def chunk_nonce(nonce: bytes, index: int) -> bytes:
+    """
+    Derives the nonce of a chunk by XORing its index into the base nonce, as TLS does for records.
+
+    Parameters
+    ----------
+    nonce : bytes
+        The base nonce derived from the key.
+    index : int
+        The index of the chunk.
+
+    Returns
+    -------
+    bytes
+        A nonce unique to the chunk.
+    """
+    return (int.from_bytes(nonce, 'big') ^ index).to_bytes(len(nonce), 'big')
+
+def create_packet_cipher(aes_key: bytes) -> AESGCM:
+    """
+    Creates the AES-GCM cipher of a packet stream. The key is set up once and the cipher seals
+    every packet in a single call, under the chunk nonce of its index.
+
+    Parameters
+    ----------
+    aes_key : bytes
+        The key derived by the key schedule.
+
+    Returns
+    -------
+    AESGCM
+        A cipher whose ``encrypt`` and ``decrypt`` append and check the 16 byte tag of a packet.
+    """
+    return AESGCM(aes_key)
+
+def encrypt_chunks_gcm(
+        chunks: Iterable[bytes],
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        workers: int = 1,
+        kdf: Optional[dict] = None,
+        tags: Optional[list] = None,
+        aes_key: Optional[bytes] = None
+) -> Iterator[bytes]:
+    """
+    Encrypts a stream of data with AES-GCM in chunks of ``CHUNK_SIZE`` bytes on a thread pool,
+    every chunk under its own nonce.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The data to be encrypted in chunks of any size.
+    password : str
+        The password to derive the encryption key.
+    nonce : bytes
+        The base nonce the chunk nonces are derived from.
+    salt : bytes
+        The salt to use for key derivation.
+    workers : int, optional
+        The number of threads encrypting chunks concurrently (default is 1).
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    tags : list, optional
+        A list the authentication tag of every chunk is appended to as the chunk is yielded
+        (default is None, the chunks are not finalized).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Yields
+    ------
+    bytes
+        The encrypted chunks in order, the output is the same for any number of workers.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    def encrypt(index: int, chunk: bytes) -> bytes:
+        encryptor = _chunk_cipher(key, nonce, index).encryptor()
+        encrypted = encryptor.update(chunk)
+        if tags is not None:
+            encryptor.finalize()
+            return encrypted, encryptor.tag
+        return encrypted
+    if tags is None:
+        return _map_ordered(encrypt, rechunk(chunks, CHUNK_SIZE), workers)
+    return _collect_tags(_map_ordered(encrypt, rechunk(chunks, CHUNK_SIZE), workers), tags)
+
+def decrypt_chunks_gcm(
+        chunks: Iterable[bytes],
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        workers: int = 1,
+        kdf: Optional[dict] = None,
+        tags: Optional[list] = None,
+        aes_key: Optional[bytes] = None
+) -> Iterator[bytes]:
+    """
+    Decrypts a stream of data encrypted by ``encrypt_chunks_gcm`` on a thread pool.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The encrypted data in chunks of any size.
+    password : str
+        The password to derive the decryption key.
+    nonce : bytes
+        The base nonce the chunk nonces are derived from.
+    salt : bytes
+        The salt used for key derivation.
+    workers : int, optional
+        The number of threads decrypting chunks concurrently (default is 1).
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    tags : list, optional
+        The authentication tags of the chunks, every chunk is verified before it is yielded and
+        a ``CorruptChunkError`` stops the stream at the first bad or missing chunk (default is None).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Yields
+    ------
+    bytes
+        The decrypted chunks in order.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    def decrypt(index: int, chunk: bytes) -> bytes:
+        if tags is None:
+            return _chunk_cipher(key, nonce, index).decryptor().update(chunk)
+        return _verified_update(key, nonce, index, tags, chunk)
+    if tags is None:
+        return _map_ordered(decrypt, rechunk(chunks, CHUNK_SIZE), workers)
+    return _check_count(_map_ordered(decrypt, rechunk(chunks, CHUNK_SIZE), workers), len(tags))
+
+def encrypt_data_gcm_parallel(
+        data: bytes,
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        workers: int = 1,
+        kdf: Optional[dict] = None,
+        out: Optional[Buffer] = None,
+        tags: Optional[list] = None,
+        aes_key: Optional[bytes] = None
+) -> bytearray:
+    """
+    Encrypts data like ``encrypt_chunks_gcm`` straight into one preallocated output buffer.
+
+    Parameters
+    ----------
+    data : bytes
+        The data to be encrypted.
+    password : str
+        The password to derive the encryption key.
+    nonce : bytes
+        The base nonce the chunk nonces are derived from.
+    salt : bytes
+        The salt to use for key derivation.
+    workers : int, optional
+        The number of threads encrypting chunks concurrently (default is 1).
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    out : Buffer, optional
+        A writable buffer of the same length to use as the output buffer, it may be the data
+        itself (default is None, a new bytearray).
+    tags : list, optional
+        A list filled with the authentication tag of every chunk (default is None, the chunks are not finalized).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Returns
+    -------
+    bytearray
+        The encrypted data, the output buffer when given.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    return _transform_into(lambda index: _chunk_cipher(key, nonce, index).encryptor(), data, workers, out, tags, verify=False)
+
+def decrypt_data_gcm_parallel(
+        data: bytes,
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        workers: int = 1,
+        kdf: Optional[dict] = None,
+        out: Optional[Buffer] = None,
+        tags: Optional[list] = None,
+        aes_key: Optional[bytes] = None
+) -> bytearray:
+    """
+    Decrypts data encrypted by ``encrypt_data_gcm_parallel`` straight into one preallocated output buffer.
+
+    Parameters
+    ----------
+    data : bytes
+        The encrypted data to be decrypted.
+    password : str
+        The password to derive the decryption key.
+    nonce : bytes
+        The base nonce the chunk nonces are derived from.
+    salt : bytes
+        The salt used for key derivation.
+    workers : int, optional
+        The number of threads decrypting chunks concurrently (default is 1).
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    out : Buffer, optional
+        A writable buffer of the same length to use as the output buffer, it may be the data
+        itself (default is None, a new bytearray).
+    tags : list, optional
+        The authentication tags of the chunks, all chunks are verified on the workers and a
+        ``CorruptChunkError`` is raised for the first bad one found, the remaining chunks are
+        then skipped (default is None).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Returns
+    -------
+    bytearray
+        The decrypted data, the output buffer when given.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    return _transform_into(lambda index: _chunk_cipher(key, nonce, index, tags and tags[index]).decryptor(), data, workers, out, tags, verify=True)
+
+def decrypt_range_gcm(
+        data: bytes,
+        password: str,
+        nonce: bytes,
+        salt: bytes,
+        offset: int,
+        chunked: bool = False,
+        kdf: Optional[dict] = None,
+        tags: Optional[list] = None,
+        aes_key: Optional[bytes] = None
+) -> bytearray:
+    """
+    Decrypts a slice of a ciphertext without decrypting anything in front of it.
+
+    GCM encrypts with a counter mode keystream, so a slice is decrypted with an AES-CTR keystream
+    started at the counter block of its first byte.
+
+    Parameters
+    ----------
+    data : bytes
+        The slice of the encrypted data.
+    password : str
+        The password to derive the decryption key.
+    nonce : bytes
+        The nonce, or the base nonce of the chunks when ``chunked``.
+    salt : bytes
+        The salt used for key derivation.
+    offset : int
+        The position of the slice in the encrypted data, in bytes.
+    chunked : bool, optional
+        Whether the data was encrypted by ``encrypt_data_gcm_parallel`` or ``encrypt_chunks_gcm``
+        (default is False, a single GCM stream).
+    kdf : dict, optional
+        The key derivation parameters (default is None, the legacy PBKDF2 cost).
+    tags : list, optional
+        The authentication tags of all chunks of a chunked ciphertext, the slice then has to
+        span whole chunks and every chunk is verified (default is None).
+    aes_key : bytes, optional
+        The key already derived from the password, salt and parameters, it is then not derived
+        again (default is None).
+
+    Returns
+    -------
+    bytearray
+        The decrypted slice.
+    """
+    key = aes_key if aes_key is not None else derive_key(password, salt, kdf)
+    source = memoryview(data).cast('B')
+    output = bytearray(len(source))
+    target = memoryview(output)
+    position = 0
+    while position < len(source):
+        if chunked and tags is not None:
+            index, inner = divmod(offset + position, CHUNK_SIZE)
+            if inner:
+                raise ValueError("Verified slices have to start at a chunk boundary")
+            stop = min(len(source), position + CHUNK_SIZE)
+            target[position:stop] = _verified_update(key, nonce, index, tags, source[position:stop])
+            position = stop
+            continue
+        if chunked:
+            index, inner = divmod(offset + position, CHUNK_SIZE)
+            stop = min(len(source), position + CHUNK_SIZE - inner)
+            context = _counter_cipher(key, chunk_nonce(nonce, index), inner)
+        else:
+            stop = len(source)
+            context = _counter_cipher(key, nonce, offset)
+        context.update_into(source[position:stop], target[position:stop])
+        position = stop
+    return output
+
+def _counter_cipher(key: bytes, nonce: bytes, offset: int) -> CipherContext:
+    """
+    Returns an AES-CTR context producing the GCM keystream of the nonce from the given byte on.
+    """
+    # GCM with a 96 bit nonce starts encrypting at counter 2 and increments the last 32 bits only.
+    counter = nonce + ((2 + offset // 16) % (1 << 32)).to_bytes(4, 'big')
+    context = Cipher(algorithms.AES(key), modes.CTR(counter), backend=default_backend()).decryptor()
+    context.update(bytes(offset % 16))
+    return context
+
+def _chunk_cipher(key: bytes, nonce: bytes, index: int, tag: Optional[bytes] = None) -> Cipher:
+    return Cipher(algorithms.AES(key), modes.GCM(chunk_nonce(nonce, index), tag), backend=default_backend())
+
+def _verified_update(key: bytes, nonce: bytes, index: int, tags: list, chunk: bytes) -> bytes:
+    """
+    Decrypts a whole chunk and checks it against its tag.
+    """
+    if index >= len(tags):
+        raise CorruptChunkError(index, f"Chunk {index} is not listed in the {len(tags)} chunk tags")
+    decryptor = _chunk_cipher(key, nonce, index, tags[index]).decryptor()
+    decrypted = decryptor.update(chunk)
+    try:
+        decryptor.finalize()
+    except InvalidTag:
+        raise CorruptChunkError(index) from None
+    return decrypted
+
+def _collect_tags(results: Iterator[tuple], tags: list) -> Iterator[bytes]:
+    for encrypted, tag in results:
+        tags.append(tag)
+        yield encrypted
+
+def _check_count(chunks: Iterator[bytes], expected: int) -> Iterator[bytes]:
+    count = 0
+    for chunk in chunks:
+        count += 1
+        yield chunk
+    if count != expected:
+        raise CorruptChunkError(count, f"The ciphertext holds {count} chunks, {expected} were written")
+
+def _transform_into(
+        context: Callable[[int], CipherContext],
+        data: bytes,
+        workers: int,
+        out: Optional[Buffer] = None,
+        tags: Optional[list] = None,
+        verify: bool = False
+) -> Buffer:
+    """
+    Runs the cipher context of every chunk over its slice of the data, writing into a shared output buffer.
+
+    With tags, every context is finalized: its tag is stored in the list when encrypting and
+    checked when verifying, the first failure stops the chunks that have not started yet.
+    """
+    source = memoryview(data).cast('B')
+    output = bytearray(len(source)) if out is None else out
+    target = memoryview(output).cast('B')
+    count = -(-len(source) // CHUNK_SIZE)
+    if tags is not None and not verify:
+        tags[:] = [b''] * count
+    elif tags is not None and len(tags) != count:
+        raise CorruptChunkError(min(count, len(tags)), f"The ciphertext holds {count} chunks, {len(tags)} were written")
+    failed = Event()
+    def transform(index: int) -> None:
+        if failed.is_set():
+            return
+        start = index * CHUNK_SIZE
+        cipher = context(index)
+        cipher.update_into(source[start:start + CHUNK_SIZE], target[start:start + CHUNK_SIZE])
+        if tags is None:
+            return
+        try:
+            cipher.finalize()
+        except InvalidTag:
+            failed.set()
+            raise CorruptChunkError(index) from None
+        if not verify:
+            tags[index] = cipher.tag
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(transform, range(count)))
+    return output
+
+def _map_ordered(function: Callable[[int, bytes], bytes], chunks: Iterable[bytes], workers: int) -> Iterator[bytes]:
+    """
+    Applies the function to the indexed chunks on a thread pool and yields the results in order,
+    keeping at most two chunks per worker in flight.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for index, chunk in enumerate(chunks):
+            pending.append(pool.submit(function, index, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,35 @@
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+def rechunk(chunks: Iterable[bytes], size: int) -> Iterator[np.ndarray]:
+    """
+    Regroups chunks of any size into writable uint8 arrays of a fixed size.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The data in chunks of any size.
+    size : int
+        The number of bytes per yielded chunk.
+
+    Yields
+    ------
+    np.ndarray
+        The regrouped chunks, only the last one may be shorter.
+    """
+    window = np.empty(size, dtype=np.uint8)
+    filled = 0
+    for chunk in chunks:
+        chunk = np.frombuffer(chunk, dtype=np.uint8)
+        while len(chunk):
+            taken = min(size - filled, len(chunk))
+            window[filled:filled + taken] = chunk[:taken]
+            filled += taken
+            chunk = chunk[taken:]
+            if filled == size:
+                yield window.copy()
+                filled = 0
+    if filled:
+        yield window[:filled].copy()
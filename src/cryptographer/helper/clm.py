@@ -1,5 +1,124 @@
 import random
-from typing import Optional
+from collections.abc import Sequence
+
+import numpy as np
+
+_FORMAT_CHUNK = 1 << 16
+
+
+def logistic_map_orbit(r1: float, x1: float, n: int = 10_000) -> np.ndarray:
+    """
+    Iterates the logistic map and returns every value it visits.
+
+    Parameters
+    ----------
+    r1 : float
+        The control parameter for the logistic map.
+    x1 : float
+        The initial value for the logistic map.
+    n : int, optional
+        The number of iterations to perform (default is 10,000).
+
+    Returns
+    -------
+    np.ndarray
+        The n values after the initial one as float64.
+    """
+    orbit = [0.0] * n
+    for i in range(n):
+        x1 = x1 * r1 * (1 - x1)
+        orbit[i] = x1
+    return np.array(orbit, dtype=np.float64)
+
+
+def logistic_map_orbits(r: np.ndarray, x: np.ndarray, n: int = 10_000) -> np.ndarray:
+    """
+    Iterates the logistic map for many parameter pairs at once, vectorized across the pairs.
+
+    Parameters
+    ----------
+    r : np.ndarray
+        The control parameters, one per orbit.
+    x : np.ndarray
+        The initial values, one per orbit.
+    n : int, optional
+        The number of iterations to perform (default is 10,000).
+
+    Returns
+    -------
+    np.ndarray
+        A (len(r), n) float64 array, row i equal to ``logistic_map_orbit(r[i], x[i], n)``.
+    """
+    r = np.asarray(r, dtype=np.float64)
+    x = np.array(x, dtype=np.float64)
+    orbits = np.empty((len(r), n), dtype=np.float64)
+    for i in range(n):
+        x = x * r * (1 - x)
+        orbits[:, i] = x
+    return orbits
+
+
+class LogisticMapDigits(Sequence):
+    """
+    The digit sequence of a logistic map orbit, the last character of ``str()`` of every value.
+
+    Formatting a float costs far more than the iteration producing it, so digits are only
+    formatted when they are accessed; ``get_random_digits`` reads 60 of them.
+    """
+
+    def __init__(self, orbit: np.ndarray) -> None:
+        self._orbit = orbit
+
+    def __len__(self) -> int:
+        return len(self._orbit)
+
+    def __getitem__(self, index: int | slice) -> str:
+        if isinstance(index, slice):
+            return _digits(self._orbit[index]).tobytes().decode('ascii')
+        return repr(float(self._orbit[index]))[-1]
+
+    def __str__(self) -> str:
+        return self.to_array().tobytes().decode('ascii')
+
+    def to_array(self) -> np.ndarray:
+        """
+        Returns all digits as a uint8 array of ASCII digits.
+        """
+        return np.concatenate([np.empty(0, dtype=np.uint8)] + [
+            _digits(self._orbit[start:start + _FORMAT_CHUNK])
+            for start in range(0, len(self._orbit), _FORMAT_CHUNK)
+        ])
+
+
+def _digits(values: np.ndarray) -> np.ndarray:
+    """
+    Formats all values in one ``%`` operation and picks the character in front of every separator,
+    which is the last character of ``str()`` of the value.
+    """
+    text = np.frombuffer((('%r,' * len(values)) % tuple(values.tolist())).encode('ascii'), dtype=np.uint8)
+    return text[np.flatnonzero(text == ord(',')) - 1]
+
+
+def logistic_map_sequence(r1: float, x1: float, n: int = 10_000) -> LogisticMapDigits:
+    """
+    Generates a lazily formatted sequence based on the logistic map, equal to ``generate_logistic_map_seq``.
+
+    Parameters
+    ----------
+    r1 : float
+        The control parameter for the logistic map.
+    x1 : float
+        The initial value for the logistic map.
+    n : int, optional
+        The number of iterations to perform, millions are fine (default is 10,000).
+
+    Returns
+    -------
+    LogisticMapDigits
+        The generated logistic map sequence.
+    """
+    return LogisticMapDigits(logistic_map_orbit(r1, x1, n))
+
 
 def generate_logistic_map_seq(r1: float, x1: float, n: int = 10_000) -> str:
     """
@@ -19,11 +138,7 @@ def generate_logistic_map_seq(r1: float, x1: float, n: int = 10_000) -> str:
     str
         The generated logistic map sequence.
     """
-    logistic_map_key = ''
-    for _ in range(n):
-        x1 = x1 * r1 * (1 - x1)
-        logistic_map_key += str(x1)[-1]
-    return logistic_map_key
+    return str(logistic_map_sequence(r1, x1, n))
 
 
 def map_to_chaotic_range(value: float, lower: float = 3.57, upper: float = 4.00) -> float:
@@ -47,13 +162,13 @@ def map_to_chaotic_range(value: float, lower: float = 3.57, upper: float = 4.00)
     return lower + (upper - lower) * value
 
 
-def get_random_digits(chaotic_seq: str, key: str) -> str:
+def get_random_digits(chaotic_seq: Sequence[str], key: str) -> str:
     """
     Generates a string of random digits based on a chaotic sequence and a key.
 
     Parameters
     ----------
-    chaotic_seq : str
+    chaotic_seq : str or LogisticMapDigits
         The chaotic sequence to select digits from.
     key : str
         The key to seed the random number generator.
@@ -1,3 +1,96 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+WINDOW_WIDTH = 15
+
+# Trajectories kept by the digit engine, the key schedule reads two windows of each of two seeds.
+_CACHE_SIZE = 1024
+# Largest term whose successor 3n + 1 still fits an int64.
+_INT64_SAFE = (np.iinfo(np.int64).max - 1) // 3
+_POWERS = 10 ** np.arange(19, dtype=np.int64)
+
+
+class _Trajectory:
+    """
+    The digits of a Collatz trajectory, extended only as far as they are read.
+    """
+
+    __slots__ = ("text", "term", "done")
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise ValueError(f"Collatz sequences start from a positive integer, got {n}")
+        self.text = ""
+        self.term = n
+        self.done = n == 1
+
+    def extend(self, stop: int | None) -> str:
+        """
+        Appends terms until the text holds ``stop`` characters or the trajectory reached 1.
+        """
+        n, length, parts = self.term, len(self.text), []
+        while not self.done and (stop is None or length < stop):
+            n = n // 2 if n % 2 == 0 else 3 * n + 1
+            part = str(n)
+            parts.append(part)
+            length += len(part)
+            self.done = n == 1
+        self.term = n
+        if parts:
+            self.text += "".join(parts)
+        return self.text
+
+
+_trajectories: "OrderedDict[int, _Trajectory]" = OrderedDict()
+# Key schedules are built on several threads, a trajectory is looked up and extended under this lock.
+_trajectories_lock = threading.Lock()
+
+
+def _trajectory(n: int) -> _Trajectory:
+    trajectory = _trajectories.get(n)
+    if trajectory is None:
+        trajectory = _trajectories[n] = _Trajectory(n)
+        if len(_trajectories) > _CACHE_SIZE:
+            _trajectories.popitem(last=False)
+    else:
+        _trajectories.move_to_end(n)
+    return trajectory
+
+
+def collatz_window(n: int, start_index: int, width: int = WINDOW_WIDTH) -> str:
+    """
+    Returns ``width`` characters of the concatenated Collatz terms after n, starting at start_index.
+
+    Only the terms up to the end of the window are generated, and trajectories are cached, so the
+    windows of the same seed share their work, also across threads. A start_index past the end of
+    the sequence is moved back to its last ``width`` characters, and negative indexes behave like
+    slicing a string.
+
+    Parameters
+    ----------
+    n : int
+        The starting number for the Collatz sequence.
+    start_index : int
+        The index from which to start extracting digits from the Collatz sequence.
+    width : int, optional
+        The number of characters to extract (default is 15).
+
+    Returns
+    -------
+    str
+        The extracted characters, shorter than ``width`` only for short sequences.
+    """
+    with _trajectories_lock:
+        trajectory = _trajectory(n)
+        text = trajectory.extend(start_index + width if start_index >= 0 else None)
+        done = trajectory.done
+    if done and start_index > len(text) - width:
+        start_index = max(0, len(text) - width)
+    return text[start_index:start_index + width]
+
+
 def generate_collatz_sequence(n: int, start_index: int) -> int:
     """
     Generates a sequence of digits from the Collatz sequence starting from a given index.
@@ -14,20 +107,72 @@ def generate_collatz_sequence(n: int, start_index: int) -> int:
     int
         A 15-digit integer extracted from the Collatz sequence starting from the given index.
     """
-    sequence = ""
-    while n != 1:
-        if n % 2 == 0:
-            n = n // 2
-        else:
-            n = 3 * n + 1
-        sequence += str(n)
+    return int(collatz_window(n, start_index))
+
+
+def collatz_windows(seeds: np.ndarray, start_indexes: np.ndarray) -> np.ndarray:
+    """
+    Computes ``generate_collatz_sequence`` for many seeds at once, vectorized across the seeds.
+
+    All trajectories advance together one term per step and every row drops out as soon as its
+    window is filled. The digits of the window are cut arithmetically from the terms as they are
+    produced, together with the last 15 digits for sequences ending before the window.
+
+    Parameters
+    ----------
+    seeds : np.ndarray
+        The starting numbers of the Collatz sequences.
+    start_indexes : np.ndarray
+        The index of the window of every sequence.
+
+    Returns
+    -------
+    np.ndarray
+        The 15-digit integers as int64, -1 where the window is empty and
+        ``generate_collatz_sequence`` would raise.
+    """
+    seeds = np.asarray(seeds, dtype=np.int64)
+    starts = np.array(start_indexes, dtype=np.int64)
+    if np.any(seeds < 1):
+        raise ValueError("Collatz sequences start from a positive integer")
+    result = np.full(len(seeds), -1, dtype=np.int64)
+    # Negative indexes need the full length and huge terms would overflow, both are left to Python.
+    vectorized = starts >= 0
+    alive = np.flatnonzero(vectorized & (seeds != 1))
+    n, start = seeds[alive], starts[alive]
+    length, window, tail = (np.zeros(len(alive), dtype=np.int64) for _ in range(3))
+    while len(alive):
+        overflow = n > _INT64_SAFE
+        if overflow.any():
+            vectorized[alive[overflow]] = False
+            keep = ~overflow
+            alive, n, start, length, window, tail = (a[keep] for a in (alive, n, start, length, window, tail))
+        n = np.where(n & 1, 3 * n + 1, n >> 1)
+        width = _digit_count(n)
+        # The part of the term inside the window, as offsets into its digits.
+        low = np.clip(start - length, 0, width)
+        high = np.clip(start + WINDOW_WIDTH - length, 0, width)
+        window = window * _POWERS[high - low] + n // _POWERS[np.minimum(width - high, 18)] % _POWERS[high - low]
+        # The last digits so far, for sequences ending before the window.
+        short = np.minimum(width, WINDOW_WIDTH)
+        tail = np.where(width >= WINDOW_WIDTH, n % _POWERS[WINDOW_WIDTH], tail % _POWERS[WINDOW_WIDTH - short] * _POWERS[short] + n)
+        length += width
+        filled = length >= start + WINDOW_WIDTH
+        reached = (n == 1) & ~filled
+        result[alive[filled]] = window[filled]
+        result[alive[reached]] = tail[reached]
+        keep = ~(filled | reached)
+        alive, n, start, length, window, tail = (a[keep] for a in (alive, n, start, length, window, tail))
+
+    for row in np.flatnonzero(~vectorized):
+        window = collatz_window(int(seeds[row]), int(start_indexes[row]))
+        result[row] = int(window) if window else -1
+    return result
+
 
-    # Ensure the start_index is within bounds
-    if start_index > len(sequence) - 15:
-        start_index = max(0, len(sequence) - 15)
+def _digit_count(values: np.ndarray) -> np.ndarray:
+    return np.searchsorted(_POWERS[1:], values, side='right') + 1
 
-    sequence = sequence[start_index:start_index + 15]
-    return int(sequence)
 
 def map_to_chaotic_range(value: float, lower: float = 3.57, upper: float = 4.00) -> float:
     """
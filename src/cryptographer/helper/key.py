@@ -1,12 +1,15 @@
 import os
 import sys
+from functools import lru_cache
 from logging import getLogger
 from secrets import SystemRandom
 from cryptography.fernet import Fernet
-from typing import Tuple
+from typing import Sequence, Tuple
 
-from .collatz import generate_collatz_sequence, map_to_chaotic_range
-from src.util import config, log_config
+import numpy as np
+
+from .collatz import generate_collatz_sequence, collatz_windows, map_to_chaotic_range
+from src.util import config
 
 logger = getLogger("core")
 
@@ -37,11 +40,7 @@ def encrypt_key(key: str) -> str:
     str
         The encrypted key as a string.
     """
-    fernet_key = os.environ.get('fkey', config.get_value('settings.encryption', 'fkey'))
-    if not fernet_key:
-        logger.info("Please set your encryption key in the setting or your environment as described in the README.md file")
-        sys.exit(1)
-    fernet = Fernet(fernet_key.encode())
+    fernet = _fernet(os.environ.get('fkey', config.get_value('settings.encryption', 'fkey')))
     encrypted_key = fernet.encrypt(key.encode()).decode()
     return encrypted_key
 
@@ -60,17 +59,25 @@ def decrypt_key(encrypted_key: str) -> str:
         The decrypted key as a string.
     """
     fernet_key = os.environ.get('fkey', config.get_value('settings.encryption', 'fkey'))
-    if not fernet_key:
-        logger.info("Please set your encryption key in the setting or your environment as described in the README.md file")
-        sys.exit(1)
-    fernet = Fernet(fernet_key.encode())
+    fernet = _fernet(fernet_key)
     try:
         key = fernet.decrypt(encrypted_key.encode()).decode()
     except Exception:
-        logger.info(f"Invalid key, {fernet_key}")
+        logger.info("Invalid key, %s", fernet_key)
         sys.exit(1)
     return key
 
+@lru_cache(maxsize=4)
+def _fernet(fernet_key: str) -> Fernet:
+    """
+    Returns the Fernet instance of a key, built once per process since a long-running server
+    encrypts and decrypts many keys with it.
+    """
+    if not fernet_key:
+        logger.info("Please set your encryption key in the setting or your environment as described in the README.md file")
+        sys.exit(1)
+    return Fernet(fernet_key.encode())
+
 def generate_chaotic_parameters(key: str) -> Tuple[float, float, float, float]:
     """
     Generates chaotic parameters based on a provided key for the encryption process.
@@ -96,3 +103,29 @@ def generate_chaotic_parameters(key: str) -> Tuple[float, float, float, float]:
     r2 = map_to_chaotic_range(r2)
 
     return r1, r2, x1, x2
+
+
+def generate_chaotic_parameters_batch(keys: Sequence[str]) -> np.ndarray:
+    """
+    Generates the chaotic parameters of many keys at once, vectorized across the keys.
+
+    Parameters
+    ----------
+    keys : Sequence[str]
+        The keys used to generate the seeds.
+
+    Returns
+    -------
+    np.ndarray
+        A (len(keys), 4) float64 array, row i equal to ``generate_chaotic_parameters(keys[i])``,
+        NaN for the keys that function rejects.
+    """
+    digits = np.array([[int(key[:7]), int(key[7:10]), int(key[10:13]), int(key[13:])] for key in keys], dtype=np.int64).reshape(-1, 4)
+    t, p, q, s = digits.T
+    windows = collatz_windows(
+        np.concatenate((t + q, t + p, t + q, t + p)),
+        np.concatenate((p, q, p - s, p + s)),
+    ).reshape(4, -1)
+    values = np.where((windows >= 0).all(axis=0), windows / 1e15, np.nan)
+    r2 = map_to_chaotic_range(values[1])
+    return np.stack((r2, r2, values[2], values[3]), axis=1)
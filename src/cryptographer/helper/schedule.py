@@ -0,0 +1,235 @@
+"""
+Everything derived from a key before the audio data is touched, computed once per key.
+
+Setting up a key decrypts it with Fernet, reads four Collatz windows, iterates two logistic maps,
+draws two sets of digits from them and runs the key derivation function. A ``KeySchedule`` keeps
+the results, so decrypting many segments or files under one key pays for the setup once, and a
+``KeyScheduleCache`` keeps the schedules of the most recent keys.
+
+Python cannot guarantee that a key is erased from memory, ``wipe`` drops every reference to the
+derived values so they are no longer reachable from the schedule or the cache.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from src.util.profiling import stage
+from .aes import LEGACY_KDF, derive_key
+from .clm import get_random_digits, logistic_map_sequence
+from .key import decrypt_key, encrypt_key, generate_chaotic_parameters, generate_key
+
+SCHEDULE_CACHE_SIZE = 16
+
+
+class KeySchedule:
+    """
+    The shuffle seed, AES password, nonce and salt of a key, and the AES keys derived from them.
+
+    A schedule made by ``generate`` encrypts a single file: a second encryption would reuse the
+    AES-GCM nonce and raises a ValueError. Schedules of existing keys decrypt any number of times.
+
+    Attributes
+    ----------
+    encrypted_key : str
+        The Fernet encrypted key given to the user.
+    password : str
+        The AES password.
+    nonce : bytes
+        The AES-GCM nonce, the base nonce of the chunks of the chunked cipher.
+    salt : bytes
+        The salt of the key derivation.
+
+    Methods
+    -------
+    generate() -> KeySchedule
+        Creates the schedule of a new random key.
+    from_encrypted(encrypted_key) -> KeySchedule
+        Creates the schedule of a key given to the user.
+    shuffle_seed() -> int
+        Returns the seed of the shuffle, computed on first use since the fast mode does not shuffle.
+    aes_key(kdf) -> bytes
+        Returns the AES key for the key derivation parameters, derived once for each of them.
+    claim_for_encryption() -> None
+        Marks the schedule as used by an encryption.
+    wipe() -> None
+        Drops the key and every value derived from it.
+    """
+
+    def __init__(self, key: str, encrypted_key: str, fresh: bool = False) -> None:
+        """
+        Computes the cipher parameters of a key.
+
+        Parameters
+        ----------
+        key : str
+            The plain 15-digit key.
+        encrypted_key : str
+            The same key encrypted with Fernet.
+        fresh : bool, optional
+            Whether the key was just generated and may encrypt once (default is False).
+
+        Returns
+        -------
+        None
+        """
+        with stage("key schedule"):
+            r1, r2, x1, x2 = generate_chaotic_parameters(key)
+        with stage("cipher parameters"):
+            gkey = get_random_digits(logistic_map_sequence(r2, x2), key)
+        self._key = key
+        self._chaotic = (r1, x1)
+        self._seed: Optional[int] = None
+        self._aes_keys: dict = {}
+        self._lock = threading.Lock()
+        self._encryptable = fresh
+        self.encrypted_key = encrypted_key
+        self.password = gkey[:32]
+        self.nonce = bytes(gkey[32:44], encoding='ascii')
+        self.salt = bytes(gkey[44:], encoding='ascii')
+
+    @classmethod
+    def generate(cls) -> "KeySchedule":
+        """
+        Creates the schedule of a new random key, for a single encryption.
+        """
+        with stage("key schedule"):
+            key = generate_key()
+        with stage("encrypt key"):
+            encrypted_key = encrypt_key(key)
+        return cls(key, encrypted_key, fresh=True)
+
+    @classmethod
+    def from_encrypted(cls, encrypted_key: str) -> "KeySchedule":
+        """
+        Creates the schedule of a key given to the user, exits when it cannot be decrypted.
+        """
+        with stage("decrypt key"):
+            key = decrypt_key(encrypted_key)
+        return cls(key, encrypted_key)
+
+    def shuffle_seed(self) -> int:
+        """
+        Returns the seed of the shuffle.
+        """
+        with self._lock:
+            if self._seed is None:
+                self._check_wiped()
+                with stage("shuffle seed"):
+                    r1, x1 = self._chaotic
+                    self._seed = int(get_random_digits(logistic_map_sequence(r1, x1), self._key))
+            return self._seed
+
+    def aes_key(self, kdf: Optional[dict] = None) -> bytes:
+        """
+        Returns the AES key for the key derivation parameters.
+
+        Parameters
+        ----------
+        kdf : Optional[dict], optional
+            The key derivation parameters (default is None, the legacy PBKDF2 cost).
+
+        Returns
+        -------
+        bytes
+            The derived 32 byte key.
+        """
+        parameters = json.dumps(kdf or LEGACY_KDF, sort_keys=True)
+        with self._lock:
+            self._check_wiped()
+            if parameters not in self._aes_keys:
+                self._aes_keys[parameters] = derive_key(self.password, self.salt, kdf)
+            return self._aes_keys[parameters]
+
+    def claim_for_encryption(self) -> None:
+        """
+        Marks the schedule as used by an encryption, raises a ValueError if it already was or if
+        it belongs to an existing key.
+        """
+        with self._lock:
+            if not self._encryptable:
+                raise ValueError("A key schedule encrypts a single file, encrypting again would reuse its nonce")
+            self._encryptable = False
+
+    def wipe(self) -> None:
+        """
+        Drops the key and every value derived from it, the schedule cannot be used afterwards.
+        """
+        with self._lock:
+            self._key = None
+            self._chaotic = None
+            self._seed = None
+            self._aes_keys.clear()
+            self._encryptable = False
+            self.password = self.nonce = self.salt = None
+
+    def _check_wiped(self) -> None:
+        if self._key is None:
+            raise ValueError("The key schedule was wiped")
+
+
+class KeyScheduleCache:
+    """
+    The schedules of the most recently used keys, at most ``maxsize`` of them, safe to share
+    between threads.
+
+    Methods
+    -------
+    get(encrypted_key) -> KeySchedule
+        Returns the schedule of a key, computed on first use.
+    wipe() -> None
+        Wipes and drops every schedule.
+    """
+
+    def __init__(self, maxsize: int = SCHEDULE_CACHE_SIZE) -> None:
+        if maxsize < 1:
+            raise ValueError(f"The cache has to hold at least one schedule, got {maxsize}")
+        self.maxsize = maxsize
+        self._schedules: "OrderedDict[str, KeySchedule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, encrypted_key: str) -> KeySchedule:
+        """
+        Returns the schedule of a key given to the user, the least recently used schedule is
+        dropped once more than ``maxsize`` keys are cached. Dropped schedules are not wiped, a
+        thread may still be decrypting with them.
+
+        Parameters
+        ----------
+        encrypted_key : str
+            The Fernet encrypted key.
+
+        Returns
+        -------
+        KeySchedule
+            The schedule, it only decrypts.
+        """
+        with self._lock:
+            schedule = self._schedules.get(encrypted_key)
+            if schedule is not None:
+                self._schedules.move_to_end(encrypted_key)
+                return schedule
+        # Computed outside the lock, a key seen by two threads at once is just computed twice.
+        schedule = KeySchedule.from_encrypted(encrypted_key)
+        with self._lock:
+            schedule = self._schedules.setdefault(encrypted_key, schedule)
+            self._schedules.move_to_end(encrypted_key)
+            while len(self._schedules) > self.maxsize:
+                self._schedules.popitem(last=False)
+        return schedule
+
+    def wipe(self) -> None:
+        """
+        Wipes and drops every schedule.
+        """
+        with self._lock:
+            for schedule in self._schedules.values():
+                schedule.wipe()
+            self._schedules.clear()
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+
+schedule_cache = KeyScheduleCache()
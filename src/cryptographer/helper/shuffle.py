@@ -1,47 +1,423 @@
 import random
+from math import isqrt
+from typing import Iterable, Iterator
 
-def seeded_shuffle(audio_data: list | bytes, seed: int) -> bytes:
+import numpy as np
+
+from .chunking import rechunk
+
+SHUFFLE_LEGACY = "legacy"
+SHUFFLE_V1 = "v1"
+SHUFFLE_BLOCK = "block"
+SHUFFLE_FRAME = "frame"
+SHUFFLE_SAMPLE = "sample"
+SHUFFLE_MODES = (SHUFFLE_LEGACY, SHUFFLE_V1, SHUFFLE_BLOCK, SHUFFLE_FRAME, SHUFFLE_SAMPLE)
+
+# The block mode permutes the blocks of each window and the bytes of each block, a block fits
+# the L1 cache and a window the L2 cache.
+BLOCK_SIZE = 4096
+WINDOW_SIZE = 256 * BLOCK_SIZE
+_BASE_PERMUTATIONS = 16
+
+# Below these sizes the bookkeeping of the vectorized paths costs more than a plain loop.
+_SMALL_BOUND = 1 << 12
+_SMALL_SWAPS = 1 << 16
+_WORD_BLOCK = 1 << 20
+
+
+def seeded_shuffle(
+        audio_data: bytes | bytearray | np.ndarray,
+        seed: int,
+        mode: str = SHUFFLE_LEGACY,
+        out: np.ndarray | None = None,
+        unit: int = 1
+) -> np.ndarray:
     """
     Shuffles audio data based on a provided seed.
 
     Parameters
     ----------
-    audio_data : list or bytes
-        The audio data to be shuffled.
+    audio_data : bytes, bytearray or np.ndarray
+        The audio data to be shuffled. Writable uint8 arrays are shuffled in place.
     seed : int
         The seed for the random number generator.
+    mode : str, optional
+        The permutation variant, ``"legacy"`` reproduces the permutation of the original
+        pure Python implementation, ``"v1"`` uses a faster NumPy permutation and ``"block"``
+        permutes every window of ``WINDOW_SIZE`` bytes on its own, ``"frame"`` and ``"sample"``
+        permute whole units of ``unit`` bytes and keep their bytes in order (default is "legacy").
+    out : np.ndarray, optional
+        A writable uint8 array of the same length receiving the shuffled data, the audio data
+        is then left untouched and never copied as a whole (default is None).
+    unit : int, optional
+        The bytes of a frame or of a sample for the frame and sample modes, see ``shuffle_unit``;
+        trailing bytes short of a unit stay in place (default is 1).
 
     Returns
     -------
-    list
-        The shuffled audio data.
+    np.ndarray
+        The shuffled audio data as a uint8 array.
     """
-    rng = random.Random(seed)
-    if not type(audio_data) == list: audio_data = list(audio_data)
-    for i in range(len(audio_data) - 1, -1, -1):
-        j = rng.randint(0, i)
-        audio_data[i], audio_data[j] = audio_data[j], audio_data[i]
-    return bytes(audio_data)
+    if out is not None and mode in (SHUFFLE_FRAME, SHUFFLE_SAMPLE):
+        source = _as_view(audio_data)
+        if len(source) != len(out):
+            raise ValueError(f"The output buffer holds {len(out)} bytes, the audio data {len(source)}")
+        units = _unit_view(out, unit)
+        units[:] = _unit_view(source, unit)[_unit_permutation(len(units), seed)]
+        out[len(units) * unit:] = source[len(units) * unit:]
+        return out
+    if out is not None and mode == SHUFFLE_BLOCK:
+        source = _as_view(audio_data)
+        if len(source) != len(out):
+            raise ValueError(f"The output buffer holds {len(out)} bytes, the audio data {len(source)}")
+        for index, start in enumerate(range(0, len(source), WINDOW_SIZE)):
+            window = source[start:start + WINDOW_SIZE]
+            out[start:start + len(window)] = window[_block_indices(len(window), seed, index)]
+        return out
+    buffer = _as_buffer(audio_data) if out is None else _copy_into(audio_data, out)
+    if mode == SHUFFLE_LEGACY:
+        indices = _legacy_indices(len(buffer), seed)
+        _apply_swaps(buffer, indices, descending=True)
+    elif mode == SHUFFLE_V1:
+        _v1_generator(seed).shuffle(buffer)
+    elif mode == SHUFFLE_BLOCK:
+        for index, start in enumerate(range(0, len(buffer), WINDOW_SIZE)):
+            window = buffer[start:start + WINDOW_SIZE]
+            window[:] = window[_block_indices(len(window), seed, index)]
+    elif mode in (SHUFFLE_FRAME, SHUFFLE_SAMPLE):
+        units = _unit_view(buffer, unit)
+        units[:] = units[_unit_permutation(len(units), seed)]
+    else:
+        raise ValueError(f"Unsupported shuffle mode: {mode}")
+    return buffer
 
-def seeded_unshuffle(audio_data: list | bytes, seed: int) -> bytes:
+
+def seeded_unshuffle(
+        audio_data: bytes | bytearray | np.ndarray,
+        seed: int,
+        mode: str = SHUFFLE_LEGACY,
+        unit: int = 1
+) -> np.ndarray:
     """
     Unshuffles audio data based on a provided seed.
 
     Parameters
     ----------
-    audio_data : list or bytes
-        The audio data to be unshuffled.
+    audio_data : bytes, bytearray or np.ndarray
+        The audio data to be unshuffled. Writable uint8 arrays are unshuffled in place.
     seed : int
         The seed for the random number generator.
+    mode : str, optional
+        The permutation variant the data was shuffled with (default is "legacy").
+    unit : int, optional
+        The unit the frame and sample modes permuted (default is 1).
+
+    Returns
+    -------
+    np.ndarray
+        The unshuffled audio data as a uint8 array.
+    """
+    buffer = _as_buffer(audio_data)
+    if mode == SHUFFLE_LEGACY:
+        indices = _legacy_indices(len(buffer), seed)[::-1]
+        _apply_swaps(buffer, indices, descending=False)
+    elif mode == SHUFFLE_V1:
+        permutation = np.arange(len(buffer), dtype=_index_dtype(len(buffer)))
+        _v1_generator(seed).shuffle(permutation)
+        buffer[permutation] = buffer.copy()
+    elif mode == SHUFFLE_BLOCK:
+        for index, start in enumerate(range(0, len(buffer), WINDOW_SIZE)):
+            window = buffer[start:start + WINDOW_SIZE]
+            window[_block_indices(len(window), seed, index)] = window.copy()
+    elif mode in (SHUFFLE_FRAME, SHUFFLE_SAMPLE):
+        units = _unit_view(buffer, unit)
+        units[_unit_permutation(len(units), seed)] = units.copy()
+    else:
+        raise ValueError(f"Unsupported shuffle mode: {mode}")
+    return buffer
+
+
+def shuffle_unit(mode: str, nchannels: int, sampwidth: int) -> int:
+    """
+    Returns the number of bytes the shuffle mode keeps together: a frame of every channel for the
+    frame mode, a single sample for the sample mode and a byte for the others.
+
+    Parameters
+    ----------
+    mode : str
+        The permutation variant.
+    nchannels : int
+        The number of channels of the audio.
+    sampwidth : int
+        The bytes of a sample.
 
     Returns
     -------
-    list
-        The unshuffled audio data.
-    """
-    rng = random.Random(seed)
-    if not type(audio_data) == list: audio_data = list(audio_data)
-    indices = [rng.randint(0, i) for i in range(len(audio_data) - 1, -1, -1)]
-    for i, j in enumerate(indices[::-1]):
-        audio_data[i], audio_data[j] = audio_data[j], audio_data[i]
-    return bytes(audio_data)
+    int
+        The ``unit`` of ``seeded_shuffle``.
+    """
+    if mode == SHUFFLE_FRAME:
+        return nchannels * sampwidth
+    if mode == SHUFFLE_SAMPLE:
+        return sampwidth
+    return 1
+
+
+def shuffle_stream(chunks: Iterable[bytes], seed: int) -> Iterator[np.ndarray]:
+    """
+    Shuffles a stream of audio data in block mode, holding a single window in memory.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The audio data in chunks of any size.
+    seed : int
+        The seed for the random number generator.
+
+    Yields
+    ------
+    np.ndarray
+        The shuffled windows, identical to ``seeded_shuffle(data, seed, "block")`` once joined.
+    """
+    for index, window in enumerate(rechunk(chunks, WINDOW_SIZE)):
+        yield window[_block_indices(len(window), seed, index)]
+
+
+def unshuffle_stream(chunks: Iterable[bytes], seed: int) -> Iterator[np.ndarray]:
+    """
+    Unshuffles a stream of audio data shuffled in block mode, holding a single window in memory.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The shuffled audio data in chunks of any size.
+    seed : int
+        The seed for the random number generator.
+
+    Yields
+    ------
+    np.ndarray
+        The unshuffled windows.
+    """
+    for index, window in enumerate(rechunk(chunks, WINDOW_SIZE)):
+        yield unshuffle_window(window, seed, index)
+
+
+def unshuffle_window(window: np.ndarray, seed: int, index: int) -> np.ndarray:
+    """
+    Unshuffles a single window of data shuffled in block mode in place, the windows of a file can
+    be unshuffled independently and in any order.
+
+    Parameters
+    ----------
+    window : np.ndarray
+        The writable uint8 window, ``WINDOW_SIZE`` bytes long unless it is the last one.
+    seed : int
+        The seed for the random number generator.
+    index : int
+        The position of the window in the data.
+
+    Returns
+    -------
+    np.ndarray
+        The unshuffled window.
+    """
+    window[_block_indices(len(window), seed, index)] = window.copy()
+    return window
+
+
+def _block_indices(length: int, seed: int, index: int) -> np.ndarray:
+    """
+    Computes the gather indices of a block mode window: the order of its ``BLOCK_SIZE`` blocks and
+    the order of the bytes inside every block, the remainder shorter than a block is permuted on its own.
+
+    Drawing a fresh permutation for every block dominates the cost, so each block instead XORs its
+    byte offsets with a random mask and maps them through one of a few random base permutations
+    of the window. Every window draws from its own child of the seed, so windows can be processed
+    independently.
+    """
+    rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(index,))))
+    blocks, tail = divmod(length, BLOCK_SIZE)
+    order = rng.permutation(blocks).astype(np.uint32)
+    bases = rng.permuted(np.tile(np.arange(BLOCK_SIZE, dtype=np.uint32), (_BASE_PERMUTATIONS, 1)), axis=1)
+    choices = rng.integers(0, _BASE_PERMUTATIONS, blocks)
+    masks = rng.integers(0, BLOCK_SIZE, blocks, dtype=np.uint32)
+    inner = bases[choices[:, None], np.arange(BLOCK_SIZE, dtype=np.uint32) ^ masks[:, None]]
+    inner += order[:, None] * np.uint32(BLOCK_SIZE)
+    remainder = rng.permutation(tail).astype(np.uint32) + np.uint32(blocks * BLOCK_SIZE)
+    return np.concatenate((inner.reshape(-1), remainder))
+
+
+def _unit_permutation(count: int, seed: int) -> np.ndarray:
+    permutation = np.arange(count, dtype=_index_dtype(count))
+    _v1_generator(seed).shuffle(permutation)
+    return permutation
+
+
+def _unit_view(buffer: np.ndarray, unit: int) -> np.ndarray:
+    """
+    Views the whole units of a uint8 buffer as single elements, so a permutation moves them in one
+    gather or scatter: units of 2, 4 and 8 bytes as unsigned integers, others as rows.
+    """
+    if unit < 1:
+        raise ValueError(f"The shuffle unit must be at least one byte, got {unit}")
+    head = buffer[:len(buffer) // unit * unit]
+    if unit in (1, 2, 4, 8):
+        return head.view(f'<u{unit}')
+    return head.reshape(-1, unit)
+
+
+def _as_view(audio_data: bytes | bytearray | np.ndarray) -> np.ndarray:
+    return np.frombuffer(audio_data, dtype=np.uint8) if not isinstance(audio_data, np.ndarray) else audio_data.view(np.uint8).reshape(-1)
+
+
+def _as_buffer(audio_data: bytes | bytearray | np.ndarray) -> np.ndarray:
+    """
+    Returns a writable uint8 view of the audio data, copying only when the input is read-only.
+    """
+    buffer = _as_view(audio_data)
+    if not buffer.flags.writeable:
+        buffer = buffer.copy()
+    return buffer
+
+
+def _copy_into(audio_data: bytes | bytearray | np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Copies the audio data into the output buffer unless they already share their memory.
+    """
+    source = _as_view(audio_data)
+    if len(source) != len(out):
+        raise ValueError(f"The output buffer holds {len(out)} bytes, the audio data {len(source)}")
+    if not np.shares_memory(source, out):
+        out[:] = source
+    return out
+
+
+def _index_dtype(length: int) -> type:
+    return np.uint32 if length <= np.iinfo(np.uint32).max else np.uint64
+
+
+def _v1_generator(seed: int) -> np.random.Generator:
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed)))
+
+
+class _WordStream:
+    """
+    Serves the raw 32-bit outputs of a Mersenne Twister in the same order as ``random.Random``.
+    """
+
+    def __init__(self, seed: int) -> None:
+        state = random.Random(seed).getstate()[1]
+        self._bitgen = np.random.MT19937()
+        self._bitgen.state = {
+            'bit_generator': 'MT19937',
+            'state': {'key': np.array(state[:-1], dtype=np.uint32), 'pos': state[-1]},
+        }
+        self._words = np.empty(0, dtype=np.uint32)
+        self._cursor = 0
+
+    def peek(self, count: int) -> np.ndarray:
+        available = len(self._words) - self._cursor
+        if available < count:
+            fresh = self._bitgen.random_raw(max(count - available, _WORD_BLOCK)).astype(np.uint32)
+            self._words = np.concatenate((self._words[self._cursor:], fresh))
+            self._cursor = 0
+        return self._words[self._cursor:self._cursor + count]
+
+    def advance(self, count: int) -> None:
+        self._cursor += count
+
+    def next(self) -> int:
+        word = int(self.peek(1)[0])
+        self._cursor += 1
+        return word
+
+
+def _legacy_indices(length: int, seed: int) -> np.ndarray:
+    """
+    Computes the swap targets of the legacy Fisher-Yates shuffle.
+
+    The n-th entry is ``random.Random(seed).randint(0, i)`` for ``i = length - 1 - n``, i.e. the
+    rejection sampling of ``_randbelow`` is replayed on the raw Mersenne Twister words. Windows of
+    positions are accepted against the bound of their first position, which is only wrong for the
+    rare words lying between the first and the actual bound; those are detected and the window is
+    restarted there.
+    """
+    if length >= 1 << 32:
+        raise ValueError("The legacy shuffle supports buffers smaller than 4 GiB")
+    indices = np.empty(length, dtype=_index_dtype(length))
+    words = _WordStream(seed)
+    position = 0
+    while position < length:
+        bound = length - position
+        if bound <= _SMALL_BOUND:
+            for bound in range(bound, 0, -1):
+                shift = 32 - bound.bit_length()
+                r = words.next() >> shift
+                while r >= bound:
+                    r = words.next() >> shift
+                indices[position] = r
+                position += 1
+            break
+
+        bits = bound.bit_length()
+        window = min(bound - (1 << (bits - 1)) + 1, max(64, isqrt(1 << bits)))
+        requested = 2 * window + 64
+        while True:
+            candidates = words.peek(requested) >> np.uint32(32 - bits)
+            accepted = np.flatnonzero(candidates < bound)
+            if len(accepted) >= window:
+                break
+            requested *= 2
+        accepted = accepted[:window]
+        values = candidates[accepted]
+        wrong = np.flatnonzero(values >= bound - np.arange(window))
+        committed = int(wrong[0]) if len(wrong) else window
+        indices[position:position + committed] = values[:committed]
+        words.advance(int(accepted[committed]) + 1 if committed < window else int(accepted[-1]) + 1)
+        position += committed
+    return indices
+
+
+def _apply_swaps(buffer: np.ndarray, targets: np.ndarray, descending: bool) -> None:
+    """
+    Swaps ``buffer[i]`` with ``buffer[targets[t]]`` in order of t, where ``i`` walks the buffer
+    downwards from its end when ``descending`` and upwards from its start otherwise.
+
+    Consecutive swaps touching pairwise distinct positions commute, so they are applied as one
+    fancy-indexed batch; a batch is cut right before the first swap that touches a position an
+    earlier swap of the same batch already moved.
+    """
+    total = len(targets)
+    start = 0
+    while start < total:
+        top = total - 1 - start if descending else start
+        if top < _SMALL_SWAPS:
+            stop = total if descending else min(total, _SMALL_SWAPS)
+            chunk = targets[start:stop].tolist()
+            positions = range(top, top - len(chunk), -1) if descending else range(top, top + len(chunk))
+            reach = max(positions[0], positions[-1], max(chunk)) + 1
+            data = buffer[:reach].tolist()
+            for i, j in zip(positions, chunk):
+                data[i], data[j] = data[j], data[i]
+            buffer[:reach] = data
+            start = stop
+            continue
+
+        size = min(total - start, isqrt(top))
+        j = targets[start:start + size].astype(np.int64)
+        steps = np.arange(size)
+        offsets = top - j if descending else j - top
+        clashes = (offsets >= 0) & (offsets < size) & (offsets != steps)
+        if clashes.any():
+            size = int(np.maximum(offsets, steps)[clashes].min())
+        order = np.argsort(j[:size], kind='stable')
+        repeated = j[:size][order][1:] == j[:size][order][:-1]
+        if repeated.any():
+            size = int(order[1:][repeated].min())
+        j = j[:size]
+        own = slice(top, top - size if top >= size else None, -1) if descending else slice(top, top + size)
+        moved = buffer[j]
+        buffer[j] = buffer[own]
+        buffer[own] = moved
+        start += size
@@ -5,24 +5,73 @@ Classes
 -------
 AudioFileHandler
     A class used to read and write audio files in .wav format.
+StreamFormatError
+    Raised when a stream read without seeking is not a readable WAV file.
 
 Methods
 -------
 read_file(file_path)
     Reads an audio file and returns the frames and parameters.
-write_file(audio_data, file_path, params, key, format=".wav")
+write_file(audio_data, file_path, params, key, format=".wav", header=None)
     Writes audio data to a file with specified parameters and key.
+iter_frames(file_path, chunk_size)
+    Reads an audio file lazily in chunks of frames.
+write_stream(chunks, file_path, params, key, format=".wav", header=None)
+    Writes chunks of audio data to a file as they are produced.
+read_header(file_path)
+    Reads the encryption header stored next to the audio data.
+map_file(file_path)
+    Maps the audio data of a file into memory without reading it.
+map_output(file_path, params, size, format=".wav", header=None)
+    Creates an audio file and maps its audio data for writing.
+frame_range(params, start, end)
+    Converts a time range into the range of frames covering it.
+read_pipe(stream, chunk_size, raw=None)
+    Reads a WAV or raw PCM stream lazily in chunks of frames.
+write_pipe(chunks, stream, params, header=None)
+    Writes chunks of audio data to a stream as a WAV file.
+parse_wav(data)
+    Reads a WAV file held in memory.
+build_wav(audio_data, params, header=None)
+    Writes audio data as a WAV file in memory.
 """
 
+from contextlib import contextmanager
 from pathlib import WindowsPath, PosixPath
 from logging import getLogger
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+import base64
+import json
+import math
+import os
+import struct
 
+import numpy as np
 import wave
+from wave import WAVE_FORMAT_PCM
 
-from src.util import log_config
+from src.cryptographer.helper import UnsupportedModeError
+from src.util.profiling import stage
 
 core_logger = getLogger('core')
 
+# The header is stored in its own RIFF chunk after the data chunk, where wave readers and players ignore it.
+# Version 1 only records the key derivation, version 2 describes the whole container: the mode, the shuffle
+# variant, the chunk size and the authentication tag of every chunk.
+HEADER_CHUNK_ID = b'acry'
+HEADER_VERSION = 2
+TAG_SIZE = 16
+# The RIFF and data sizes of a WAV stream of unknown length.
+UNKNOWN_SIZE = 0xFFFFFFFF
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class StreamFormatError(ValueError):
+    """
+    Raised when a stream read by ``read_pipe`` is not a readable WAV file.
+    """
+
+
 class AudioFileHandler:
     """
     A class to handle reading and writing of audio files.
@@ -33,8 +82,30 @@ class AudioFileHandler:
     -------
     read_file(file_path)
         Reads an audio file and returns the frames and parameters.
-    write_file(audio_data, file_path, params, key, format=".wav")
+    write_file(audio_data, file_path, params, key, format=".wav", header=None)
         Writes audio data to a file with specified parameters and key.
+    read_params(file_path)
+        Reads only the parameters of an audio file.
+    iter_frames(file_path, chunk_size)
+        Reads an audio file lazily in chunks of frames.
+    write_stream(chunks, file_path, params, key, format=".wav", header=None)
+        Writes chunks of audio data to a file as they are produced.
+    read_header(file_path)
+        Reads the encryption header stored next to the audio data.
+    map_file(file_path)
+        Maps the audio data of a file into memory without reading it.
+    map_output(file_path, params, size, format=".wav", header=None)
+        Creates an audio file and maps its audio data for writing.
+    frame_range(params, start, end)
+        Converts a time range into the range of frames covering it.
+    read_pipe(stream, chunk_size, raw=None)
+        Reads a WAV or raw PCM stream lazily in chunks of frames.
+    write_pipe(chunks, stream, params, header=None)
+        Writes chunks of audio data to a stream as a WAV file.
+    parse_wav(data)
+        Reads a WAV file held in memory.
+    build_wav(audio_data, params, header=None)
+        Writes audio data as a WAV file in memory.
     """
 
     @staticmethod
@@ -52,9 +123,11 @@ class AudioFileHandler:
         tuple
             A tuple containing the audio frames (bytes) and the audio parameters (wave._wave_params).
         """
-        with wave.open(str(file_path), 'rb') as audio:
+        with stage("read") as frame, wave.open(str(file_path), 'rb') as audio:
             frames = audio.readframes(audio.getnframes())
             params = audio.getparams()
+            if frame:
+                frame.nbytes = len(frames)
         return frames, params
 
     @staticmethod
@@ -63,7 +136,8 @@ class AudioFileHandler:
             file_path: WindowsPath | PosixPath,
             params: wave._wave_params,
             key: str,
-            format: str = ".wav"
+            format: str = ".wav",
+            header: Optional[dict] = None
     ) -> None:
         """
         Writes audio data to a file with specified parameters and key.
@@ -80,6 +154,8 @@ class AudioFileHandler:
             The encryption/decryption key.
         format : str, optional
             The format of the output audio file (default is ".wav").
+        header : Optional[dict], optional
+            The encryption header to store next to the audio data (default is None).
 
         Returns
         -------
@@ -88,12 +164,509 @@ class AudioFileHandler:
         file_path: str = str(file_path)
         if not file_path.endswith(".wav"):
             file_path = f"{str(file_path)}{format}"
-        with wave.open(file_path, 'wb') as decrypted_audio:
+        with stage("write", len(audio_data)), wave.open(file_path, 'wb') as decrypted_audio:
             decrypted_audio.setparams(params)
             decrypted_audio.writeframes(bytes(audio_data))
-        core_logger.info(f"file was generated at {file_path} with the key {key}")
+        if header:
+            AudioFileHandler._append_header(file_path, header)
+        core_logger.info("file was generated at %s with the key %s", file_path, key)
         return
 
+    @staticmethod
+    def read_params(file_path: WindowsPath | PosixPath) -> wave._wave_params:
+        """
+        Reads only the parameters of an audio file.
+
+        Parameters
+        ----------
+        file_path : WindowsPath or PosixPath
+            The path to the input audio file.
+
+        Returns
+        -------
+        wave._wave_params
+            The audio parameters.
+        """
+        with wave.open(str(file_path), 'rb') as audio:
+            return audio.getparams()
+
+    @staticmethod
+    def iter_frames(file_path: WindowsPath | PosixPath, chunk_size: int) -> Iterator[bytes]:
+        """
+        Reads an audio file lazily in chunks of frames.
+
+        Parameters
+        ----------
+        file_path : WindowsPath or PosixPath
+            The path to the input audio file.
+        chunk_size : int
+            The number of frames per chunk.
+
+        Yields
+        ------
+        bytes
+            The frames of the next chunk, the last chunk may be shorter.
+        """
+        with wave.open(str(file_path), 'rb') as audio:
+            while frames := audio.readframes(chunk_size):
+                yield frames
+
+    @staticmethod
+    def write_stream(
+            chunks: Iterable[bytes],
+            file_path: WindowsPath | PosixPath,
+            params: wave._wave_params,
+            key: str,
+            format: str = ".wav",
+            header: Optional[dict] = None
+    ) -> None:
+        """
+        Writes chunks of audio data to a file as they are produced, so only one chunk is held in memory.
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            The chunks of audio data to be written to the file.
+        file_path : WindowsPath or PosixPath
+            The path to save the output audio file.
+        params : wave._wave_params
+            The parameters of the audio file.
+        key : str
+            The encryption/decryption key.
+        format : str, optional
+            The format of the output audio file (default is ".wav").
+        header : Optional[dict], optional
+            The encryption header to store next to the audio data, serialized once all data is
+            written so the chunk tags can be collected while writing (default is None).
+
+        Returns
+        -------
+        None
+        """
+        file_path: str = str(file_path)
+        if not file_path.endswith(".wav"):
+            file_path = f"{str(file_path)}{format}"
+        with wave.open(file_path, 'wb') as audio:
+            audio.setparams(params)
+            for chunk in chunks:
+                with stage("write", len(chunk)):
+                    audio.writeframesraw(chunk)
+        if header:
+            AudioFileHandler._append_header(file_path, header)
+        core_logger.info("file was generated at %s with the key %s", file_path, key)
+        return
+
+    @staticmethod
+    def read_header(file_path: WindowsPath | PosixPath) -> Optional[dict]:
+        """
+        Reads the encryption header stored next to the audio data.
+
+        Parameters
+        ----------
+        file_path : WindowsPath or PosixPath
+            The path to the encrypted audio file.
+
+        Returns
+        -------
+        Optional[dict]
+            The header, or None for files written before headers were introduced. The chunk
+            tags of a version 2 header are returned as a list of bytes.
+        """
+        with stage("read header"), open(file_path, 'rb') as audio:
+            riff, _, wave_id = struct.unpack('<4sI4s', audio.read(12))
+            if riff != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError(f"{file_path} is not a RIFF/WAVE file")
+            while len(chunk := audio.read(8)) == 8:
+                chunk_id, size = struct.unpack('<4sI', chunk)
+                if chunk_id == HEADER_CHUNK_ID:
+                    return AudioFileHandler._parse_header(audio.read(size))
+                audio.seek(size + size % 2, 1)
+        return None
+
+    @staticmethod
+    def map_file(file_path: WindowsPath | PosixPath) -> tuple[np.ndarray, wave._wave_params]:
+        """
+        Maps the audio data of a file into memory without reading it, pages are loaded as they are accessed.
+
+        Parameters
+        ----------
+        file_path : WindowsPath or PosixPath
+            The path to the input audio file.
+
+        Returns
+        -------
+        tuple
+            A tuple containing a read-only uint8 view of the same frames ``read_file`` returns
+            and the audio parameters (wave._wave_params).
+        """
+        with stage("map input"):
+            params = AudioFileHandler.read_params(file_path)
+            size = params.nframes * params.nchannels * params.sampwidth
+            if not size:
+                return np.empty(0, dtype=np.uint8), params
+            offset, _ = AudioFileHandler._find_chunk(file_path, b'data')
+            return np.memmap(file_path, dtype=np.uint8, mode='r', offset=offset, shape=(size,)), params
+
+    @staticmethod
+    @contextmanager
+    def map_output(
+            file_path: WindowsPath | PosixPath,
+            params: wave._wave_params,
+            size: int,
+            format: str = ".wav",
+            header: Optional[dict] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Creates an audio file of the given data size and maps its audio data for writing, the file is
+        identical to the one ``write_file`` writes once the data is filled in, except for the pad byte
+        an odd data chunk always gets here.
+
+        Parameters
+        ----------
+        file_path : WindowsPath or PosixPath
+            The path to save the output audio file.
+        params : wave._wave_params
+            The parameters of the audio file.
+        size : int
+            The size of the audio data in bytes.
+        format : str, optional
+            The format of the output audio file (default is ".wav").
+        header : Optional[dict], optional
+            The encryption header to store next to the audio data, serialized once all data is
+            written so the chunk tags can be collected while writing (default is None).
+
+        Yields
+        ------
+        np.ndarray
+            A writable uint8 view of the audio data of the file, flushed when the context exits. The
+            file is removed when the body of the context raises.
+        """
+        file_path: str = str(file_path)
+        if not file_path.endswith(".wav"):
+            file_path = f"{str(file_path)}{format}"
+        with stage("create output"), open(file_path, 'wb') as audio:
+            audio.write(struct.pack(
+                '<4sL4s4sLHHLLHH4sL',
+                b'RIFF', 36 + size + size % 2, b'WAVE', b'fmt ', 16,
+                WAVE_FORMAT_PCM, params.nchannels, params.framerate,
+                params.nchannels * params.framerate * params.sampwidth,
+                params.nchannels * params.sampwidth,
+                params.sampwidth * 8, b'data', size,
+            ))
+            # An odd data chunk is followed by its pad byte, so the header appended after it is aligned.
+            audio.truncate(audio.tell() + size + size % 2)
+        data = np.memmap(file_path, dtype=np.uint8, mode='r+', offset=44, shape=(size,)) if size else np.empty(0, dtype=np.uint8)
+        try:
+            yield data
+            with stage("flush output", size):
+                if size:
+                    data.flush()
+        except BaseException:
+            # A half-written file would still carry a valid RIFF header.
+            os.remove(file_path)
+            raise
+        finally:
+            del data
+        if header:
+            AudioFileHandler._append_header(file_path, header)
+        core_logger.info("file was generated at %s", file_path)
+
+    @staticmethod
+    def frame_range(params: wave._wave_params, start: Optional[float], end: Optional[float]) -> tuple[int, int]:
+        """
+        Converts a time range into the range of frames covering it.
+
+        Parameters
+        ----------
+        params : wave._wave_params
+            The parameters of the audio file.
+        start : Optional[float]
+            The start of the range in seconds, None for the beginning of the file.
+        end : Optional[float]
+            The end of the range in seconds, None for the end of the file.
+
+        Returns
+        -------
+        tuple[int, int]
+            The first frame and the frame after the last one, clamped to the file.
+        """
+        first = min(params.nframes, int((start or 0) * params.framerate))
+        last = params.nframes if end is None else min(params.nframes, math.ceil(end * params.framerate))
+        if last <= first:
+            raise UnsupportedModeError(f"The range from {start}s to {end}s holds no frames of the file")
+        return first, last
+
+    @staticmethod
+    def read_pipe(
+            stream: BinaryIO,
+            chunk_size: int,
+            raw: Optional[Tuple[int, int, int]] = None
+    ) -> tuple[wave._wave_params, Optional[dict], Iterator[bytes]]:
+        """
+        Reads a WAV or headerless PCM stream, such as standard input, without seeking.
+
+        The chunks of a WAV stream are read up to its data chunk, an encryption header in front
+        of the data is returned. The data is read lazily, up to its size or to the end of the
+        stream for streams of unknown length. A StreamFormatError is raised for streams that are
+        not PCM WAV files.
+
+        Parameters
+        ----------
+        stream : BinaryIO
+            The binary stream.
+        chunk_size : int
+            The number of frames per chunk.
+        raw : Optional[Tuple[int, int, int]], optional
+            The frame rate, channels and sample width in bytes of headerless little-endian PCM
+            (default is None, the stream is a WAV file).
+
+        Returns
+        -------
+        tuple
+            The audio parameters, with 0 frames when the length is unknown, the encryption
+            header or None, and the lazily read chunks.
+        """
+        header, size = None, None
+        if raw is not None:
+            framerate, nchannels, sampwidth = raw
+        else:
+            try:
+                riff, _, wave_id = struct.unpack('<4sI4s', AudioFileHandler._read_exactly(stream, 12))
+                if riff != b'RIFF' or wave_id != b'WAVE':
+                    raise ValueError("The input stream is not a RIFF/WAVE file")
+                fmt = None
+                while True:
+                    chunk_id, chunk_length = struct.unpack('<4sI', AudioFileHandler._read_exactly(stream, 8))
+                    if chunk_id == b'data':
+                        size = None if chunk_length in (0, UNKNOWN_SIZE) else chunk_length
+                        break
+                    payload = AudioFileHandler._read_exactly(stream, chunk_length + chunk_length % 2)[:chunk_length]
+                    if chunk_id == b'fmt ':
+                        fmt = payload
+                    elif chunk_id == HEADER_CHUNK_ID:
+                        header = AudioFileHandler._parse_header(payload)
+                if fmt is None:
+                    raise ValueError("The input stream has no fmt chunk in front of its data")
+                framerate, nchannels, sampwidth = AudioFileHandler._pcm_format(fmt)
+            except ValueError as error:
+                # Everything before the data is the format of the stream, including a broken header chunk.
+                raise StreamFormatError(str(error)) from error
+        frame_size = nchannels * sampwidth
+        nframes = size // frame_size if size is not None else 0
+        params = wave._wave_params(nchannels, sampwidth, framerate, nframes, 'NONE', 'not compressed')
+
+        def chunks() -> Iterator[bytes]:
+            remaining = size
+            while remaining is None or remaining > 0:
+                wanted = chunk_size * frame_size if remaining is None else min(chunk_size * frame_size, remaining)
+                chunk = stream.read(wanted)
+                if not chunk:
+                    if remaining:
+                        core_logger.warning("The input stream ended %s bytes before the end of its data", remaining)
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+        return params, header, chunks()
+
+    @staticmethod
+    def write_pipe(
+            chunks: Iterable[bytes],
+            stream: BinaryIO,
+            params: wave._wave_params,
+            header: Optional[dict] = None
+    ) -> int:
+        """
+        Writes chunks of audio data to a stream, such as standard output, as a WAV file without seeking.
+
+        The encryption header is written in front of the data since nothing can be appended after
+        it, so it cannot hold chunk tags. Streams with 0 frames in their parameters are written with
+        the unknown RIFF and data sizes of streamed WAV files.
+
+        Parameters
+        ----------
+        chunks : Iterable[bytes]
+            The chunks of audio data.
+        stream : BinaryIO
+            The binary stream.
+        params : wave._wave_params
+            The parameters of the audio, its number of frames sets the data size.
+        header : Optional[dict], optional
+            The encryption header, without tags (default is None).
+
+        Returns
+        -------
+        int
+            The number of bytes of audio data written.
+        """
+        size = params.nframes * params.nchannels * params.sampwidth
+        header_chunk = AudioFileHandler._header_chunk(header) if header else b''
+        riff_size = 4 + 24 + len(header_chunk) + 8 + size + size % 2 if size else UNKNOWN_SIZE
+        stream.write(struct.pack(
+            '<4sL4s4sLHHLLHH',
+            b'RIFF', riff_size, b'WAVE', b'fmt ', 16,
+            WAVE_FORMAT_PCM, params.nchannels, params.framerate,
+            params.nchannels * params.framerate * params.sampwidth,
+            params.nchannels * params.sampwidth,
+            params.sampwidth * 8,
+        ) + header_chunk + struct.pack('<4sL', b'data', size or UNKNOWN_SIZE))
+        written = 0
+        for chunk in chunks:
+            with stage("write", len(chunk)):
+                stream.write(chunk)
+            written += len(chunk)
+        if size and written != size:
+            core_logger.warning("%s bytes of audio data were written, the WAV header announced %s", written, size)
+        if size % 2:
+            stream.write(b'\0')
+        stream.flush()
+        return written
+
+    @staticmethod
+    def parse_wav(data: bytes | bytearray | memoryview) -> tuple[np.ndarray, wave._wave_params, Optional[dict]]:
+        """
+        Reads a WAV file held in memory, without copying its audio data.
+
+        Parameters
+        ----------
+        data : bytes, bytearray or memoryview
+            The bytes of the whole file.
+
+        Returns
+        -------
+        tuple
+            A uint8 view of the audio data, the audio parameters and the encryption header or None.
+        """
+        view = memoryview(data).cast('B')
+        if len(view) < 12 or struct.unpack_from('<4sI4s', view)[::2] != (b'RIFF', b'WAVE'):
+            raise ValueError("The data is not a RIFF/WAVE file")
+        fmt, audio, header = None, None, None
+        position = 12
+        while position + 8 <= len(view):
+            chunk_id, size = struct.unpack_from('<4sI', view, position)
+            position += 8
+            if chunk_id == b'fmt ':
+                fmt = bytes(view[position:position + 16])
+            elif chunk_id == b'data':
+                audio = view[position:position + size]
+            elif chunk_id == HEADER_CHUNK_ID:
+                header = AudioFileHandler._parse_header(bytes(view[position:position + size]))
+            position += size + size % 2
+        if fmt is None or audio is None:
+            raise ValueError("The WAV data has no fmt or no data chunk")
+        framerate, nchannels, sampwidth = AudioFileHandler._pcm_format(fmt)
+        nframes = len(audio) // (nchannels * sampwidth)
+        audio = np.frombuffer(audio, dtype=np.uint8, count=nframes * nchannels * sampwidth)
+        return audio, wave._wave_params(nchannels, sampwidth, framerate, nframes, 'NONE', 'not compressed'), header
+
+    @staticmethod
+    def build_wav(audio_data: bytes | np.ndarray, params: wave._wave_params, header: Optional[dict] = None) -> bytes:
+        """
+        Writes audio data as a WAV file in memory, the encryption header follows the audio data
+        like in the files ``write_file`` writes.
+
+        Parameters
+        ----------
+        audio_data : bytes or np.ndarray
+            The audio data.
+        params : wave._wave_params
+            The parameters of the audio.
+        header : Optional[dict], optional
+            The encryption header (default is None).
+
+        Returns
+        -------
+        bytes
+            The bytes of the whole file.
+        """
+        audio_data = memoryview(audio_data).cast('B')
+        size = len(audio_data)
+        header_chunk = AudioFileHandler._header_chunk(header) if header else b''
+        return b''.join((
+            struct.pack(
+                '<4sL4s4sLHHLLHH4sL',
+                b'RIFF', 36 + size + size % 2 + len(header_chunk), b'WAVE', b'fmt ', 16,
+                WAVE_FORMAT_PCM, params.nchannels, params.framerate,
+                params.nchannels * params.framerate * params.sampwidth,
+                params.nchannels * params.sampwidth,
+                params.sampwidth * 8, b'data', size,
+            ),
+            audio_data,
+            b'\0' * (size % 2),
+            header_chunk,
+        ))
+
+    @staticmethod
+    def _pcm_format(fmt: bytes) -> tuple[int, int, int]:
+        """
+        Returns the frame rate, channels and sample width of a fmt chunk, raises a ValueError for
+        formats other than PCM.
+        """
+        format_tag, nchannels, framerate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+            raise ValueError(f"Unsupported WAV format {format_tag}, only PCM can be read")
+        return framerate, nchannels, (bits + 7) // 8
+
+    @staticmethod
+    def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("The input stream ended inside its WAV header")
+        return data
+
+    @staticmethod
+    def _find_chunk(file_path: WindowsPath | PosixPath, wanted: bytes) -> tuple[int, int]:
+        """
+        Returns the offset of the payload and the size of the first RIFF chunk with the given id.
+        """
+        with open(file_path, 'rb') as audio:
+            riff, _, wave_id = struct.unpack('<4sI4s', audio.read(12))
+            if riff != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError(f"{file_path} is not a RIFF/WAVE file")
+            while len(chunk := audio.read(8)) == 8:
+                chunk_id, size = struct.unpack('<4sI', chunk)
+                if chunk_id == wanted:
+                    return audio.tell(), size
+                audio.seek(size + size % 2, 1)
+        raise ValueError(f"{file_path} has no {wanted.decode()} chunk")
+
+    @staticmethod
+    def _append_header(file_path: str, header: dict) -> None:
+        """
+        Appends the header chunk after the data chunk and updates the RIFF size, the chunk tags
+        are stored as one base64 string. An odd data chunk that ``wave`` left unpadded gets its
+        pad byte first, otherwise readers skipping to the next chunk land inside the header.
+        """
+        _, data_size = AudioFileHandler._find_chunk(file_path, b'data')
+        with stage("write header"), open(file_path, 'r+b') as audio:
+            end = audio.seek(0, 2)
+            if data_size % 2 and end % 2:
+                audio.write(b'\0')
+            audio.write(AudioFileHandler._header_chunk(header))
+            size = audio.tell()
+            audio.seek(4)
+            audio.write(struct.pack('<I', size - 8))
+
+    @staticmethod
+    def _header_chunk(header: dict) -> bytes:
+        """
+        Serializes the header as a RIFF chunk, the chunk tags are stored as one base64 string.
+        """
+        header = {"version": HEADER_VERSION, **header}
+        if "tags" in header:
+            header["tags"] = base64.b64encode(b''.join(header["tags"])).decode('ascii')
+        payload = json.dumps(header, separators=(',', ':')).encode()
+        return struct.pack('<4sI', HEADER_CHUNK_ID, len(payload)) + payload + b'\0' * (len(payload) % 2)
+
+    @staticmethod
+    def _parse_header(payload: bytes) -> dict:
+        header = json.loads(payload)
+        if "tags" in header:
+            tags = base64.b64decode(header["tags"])
+            header["tags"] = [tags[i:i + TAG_SIZE] for i in range(0, len(tags), TAG_SIZE)]
+        return header
+
     @staticmethod
     def read_file_frate(file_path: WindowsPath | PosixPath) -> tuple[bytes, int, int]:
         """
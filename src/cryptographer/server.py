@@ -0,0 +1,338 @@
+"""
+This module runs a local encryption server, so that a service encrypting many files does not start an
+interpreter, import the libraries and read the settings for every one of them.
+
+The server listens on a Unix socket, or on a localhost TCP port, and speaks one JSON object per line.
+A request names the operation and the options of the ``encrypt`` and ``decrypt`` commands::
+
+    {"op": "encrypt", "file": "/data/in.wav", "out": "/data/out.wav", "fast": false, "shuffle_mode": "block"}
+    {"op": "decrypt", "file": "/data/out.wav", "out": "/data/back.wav", "key": "gAAAA..."}
+
+Without ``file`` and ``out`` the request carries ``size`` and is followed by the ``size`` bytes of a
+WAV file, processed in memory, and the reply, ``{"ok": true, "key": ..., "size": ...}``, is followed by
+the bytes of the result. ``{"op": "ping"}`` reports the number of jobs in flight. Failed jobs reply with
+``{"ok": false, "error": ...}``, and the server closes the connection when the job carried bytes.
+``size`` is a byte count of at most ``max_size``, and the bytes have to arrive within ``read_timeout``
+seconds. A connection that sends nothing for ``read_timeout`` seconds is closed.
+
+Jobs run on a pool of processes that stay alive between requests. At most ``queue_size`` jobs are
+accepted at a time, further requests wait before their connection is read any further. The read
+timeout keeps slow clients from holding on to those slots.
+
+The server trusts every client that can connect, there is no authentication. A job naming files reads
+and writes them with the permissions of the server, and every reply of an encryption holds its key.
+The Unix socket is therefore only accessible to the user running the server, who could read and write
+the same files anyway. The TCP port is open to every user of the host, so it only runs jobs naming
+files when the server has a ``root`` directory, and any server given a ``root`` rejects names that
+resolve outside of it. Jobs sending their bytes touch no files.
+
+Functions
+---------
+serve(socket_path, port, processes, queue_size, root, max_size, read_timeout)
+    Runs the server until it is interrupted.
+request(job, socket_path, port, data)
+    Sends a job to a running server and returns its reply.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import BinaryIO, Optional, Tuple
+
+from src.util import get_log_config
+from .api import decrypt_wav, encrypt_wav
+from .batch import _process
+from .helper import SHUFFLE_LEGACY, decrypt_key
+
+core_logger = getLogger("core")
+
+HOST = "127.0.0.1"
+MAX_SIZE = 1 << 30
+READ_TIMEOUT = 60.0
+
+
+class _Server:
+    """
+    The process pool and the bound on the jobs in flight, shared by the connections.
+    """
+
+    def __init__(
+            self,
+            processes: int,
+            queue_size: int,
+            root: Optional[Path],
+            paths: bool,
+            max_size: int,
+            read_timeout: float,
+    ) -> None:
+        self.root = Path(root).resolve() if root is not None else None
+        self.paths = paths
+        self.max_size = max_size
+        self.read_timeout = read_timeout
+        initializer, initargs = get_log_config().worker_logging()
+        self.pool = ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs)
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def run(self, job: dict, stream: BinaryIO) -> Tuple[dict, Optional[bytes]]:
+        """
+        Runs a job on the pool once a slot is free and returns the reply and the output bytes. The
+        bytes of a job are only read from the stream once it holds its slot.
+        """
+        if job.get("op") not in ("encrypt", "decrypt"):
+            raise ValueError(f"Unknown operation {job.get('op')!r}")
+        if job["op"] == "decrypt" and not job.get("key"):
+            raise ValueError("Decryption requires the key")
+        if "size" in job:
+            size = job["size"]
+            if type(size) is not int or not 0 <= size <= self.max_size:
+                raise ValueError(f"size has to be a number of bytes between 0 and {self.max_size}, got {size!r}")
+        else:
+            if not self.paths:
+                raise ValueError("Jobs naming files need a root directory on a TCP port, send the bytes instead")
+            job = {**job, "file": self._path(job["file"]), "out": self._path(job["out"])}
+        options = {
+            "fast": bool(job.get("fast", False)),
+            "shuffle_mode": job.get("shuffle_mode", SHUFFLE_LEGACY),
+            "chunk_size": job.get("chunk_size"),
+            "workers": job.get("workers"),
+        }
+        key = job.get("key") if job["op"] == "decrypt" else None
+        with self.slots:
+            with self.lock:
+                self.pending += 1
+            try:
+                data = self._read(stream, job["size"]) if "size" in job else None
+                if key is not None:
+                    self._check_key(key)
+                return self._submit(job, data, key, options)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+    def _read(self, stream: BinaryIO, size: int) -> bytes:
+        """
+        Reads the bytes of a job, which have to arrive within the read timeout as a whole. The timeout
+        of the socket only bounds every single read, a client sending a byte at a time would pass it.
+        """
+        deadline = monotonic() + self.read_timeout
+        data = bytearray()
+        while len(data) < size:
+            if monotonic() > deadline:
+                raise TimeoutError(f"Expected {size} bytes within {self.read_timeout}s, received {len(data)}")
+            chunk = stream.read1(size - len(data))
+            if not chunk:
+                raise ValueError(f"Expected {size} bytes, the connection closed after {len(data)}")
+            data += chunk
+        return bytes(data)
+
+    @staticmethod
+    def _check_key(key: str) -> None:
+        """
+        Raises a ValueError for a key the server cannot decrypt, since decrypt_key exits the process
+        instead, which tells the client nothing.
+        """
+        try:
+            decrypt_key(str(key))
+        except SystemExit:
+            raise ValueError("Invalid key, it was not encrypted with the Fernet key of the server") from None
+
+    def _path(self, name: str) -> Path:
+        """
+        Returns the path named by a job, relative names are resolved against the root directory.
+        """
+        if self.root is None:
+            return Path(name)
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"{name} is outside the root directory of the server")
+        return path
+
+    def _submit(self, job: dict, data: Optional[bytes], key: Optional[str], options: dict) -> Tuple[dict, Optional[bytes]]:
+        try:
+            if data is None:
+                future = self.pool.submit(_process, job["file"], job["out"], key, **options)
+                key, seconds, size = future.result()
+                return {"ok": True, "key": key, "seconds": seconds, "bytes": size}, None
+            key, seconds, output = self.pool.submit(_process_bytes, data, key, options).result()
+        except SystemExit:
+            # The application logs why it stopped, a corrupted file for instance, before it exits.
+            raise ValueError("The job stopped, the log of the server holds the reason") from None
+        return {"ok": True, "key": key, "seconds": seconds, "bytes": len(data), "size": len(output)}, output
+
+
+def _process_bytes(data: bytes, key: Optional[str], options: dict) -> Tuple[str, float, bytes]:
+    """
+    Encrypts or decrypts a WAV file given as bytes in memory, in a pool process. The whole file is
+    in memory already, so the chunk size does not apply.
+    """
+    start = perf_counter()
+    if key:
+        output = decrypt_wav(data, key, options["fast"], options["shuffle_mode"], options["workers"])
+    else:
+        output, key, _ = encrypt_wav(data, options["fast"], options["shuffle_mode"], options["workers"])
+    return key, perf_counter() - start, output
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests of one connection, one after the other.
+    """
+
+    def setup(self) -> None:
+        # Applied to every read and write of the connection by StreamRequestHandler.
+        self.timeout = self.server.jobs.read_timeout
+        super().setup()
+
+    def handle(self) -> None:
+        try:
+            self._answer()
+        except TimeoutError:
+            core_logger.info("Closed a connection that stalled for %ss", self.timeout)
+
+    def _answer(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            job = {}
+            try:
+                job = json.loads(line)
+                if job.get("op") == "ping":
+                    self._reply({"ok": True, "pending": self.server.jobs.pending})
+                    continue
+                reply, output = self.server.jobs.run(job, self.rfile)
+            except (Exception, SystemExit) as error:
+                core_logger.error("Job %r failed: %r", line.strip()[:200], error)
+                self._reply({"ok": False, "error": repr(error)})
+                if isinstance(job, dict) and "size" in job:
+                    # The bytes of the job may be left unread, the connection cannot be reused.
+                    break
+                continue
+            core_logger.info("%s took %.3fs", job['op'], reply['seconds'])
+            self._reply(reply, output)
+
+    def _reply(self, reply: dict, output: Optional[bytes] = None) -> None:
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+        if output is not None:
+            self.wfile.write(output)
+        self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(
+        socket_path: Optional[Path] = None,
+        port: Optional[int] = None,
+        processes: Optional[int] = None,
+        queue_size: int = 16,
+        root: Optional[Path] = None,
+        max_size: int = MAX_SIZE,
+        read_timeout: float = READ_TIMEOUT,
+) -> None:
+    """
+    Runs the encryption server until it is interrupted.
+
+    Parameters
+    ----------
+    socket_path : Optional[Path], optional
+        The Unix socket to listen on, replaced if it exists (default is None).
+    port : Optional[int], optional
+        The localhost TCP port to listen on instead of a socket (default is None).
+    processes : Optional[int], optional
+        Number of jobs run concurrently (default is None, the number of CPUs).
+    queue_size : int, optional
+        Number of jobs accepted at a time, running or waiting for a process (default is 16).
+    root : Optional[Path], optional
+        The directory holding every file named by a job, required for such jobs on a TCP port
+        (default is None, jobs on the Unix socket name any file).
+    max_size : int, optional
+        The largest file a job may send, in bytes (default is MAX_SIZE, 1 GiB).
+    read_timeout : float, optional
+        Seconds a connection may stay idle and a job may take to send its bytes (default is
+        READ_TIMEOUT, 60 seconds).
+
+    Returns
+    -------
+    None
+    """
+    if (socket_path is None) == (port is None):
+        raise ValueError("The server listens either on a socket or on a port")
+    if socket_path is not None:
+        Path(socket_path).unlink(missing_ok=True)
+        server = _UnixServer(str(socket_path), _Handler, bind_and_activate=False)
+        server.server_bind()
+        # Only the user of the server may connect, before the socket starts listening.
+        os.chmod(socket_path, 0o600)
+        server.server_activate()
+        address = socket_path
+    else:
+        server = _TCPServer((HOST, port), _Handler)
+        address = f"{HOST}:{server.server_address[1]}"
+    processes = processes or os.cpu_count() or 1
+    paths = socket_path is not None or root is not None
+    server.jobs = _Server(processes, queue_size, root, paths, max_size, read_timeout)
+    core_logger.info("Serving on %s with %s processes and %s slots", address, processes, queue_size)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        core_logger.info("Server stopped")
+    finally:
+        server.server_close()
+        server.jobs.pool.shutdown(cancel_futures=True)
+        if socket_path is not None:
+            Path(socket_path).unlink(missing_ok=True)
+
+
+def request(
+        job: dict,
+        socket_path: Optional[Path] = None,
+        port: Optional[int] = None,
+        data: Optional[bytes] = None,
+) -> Tuple[dict, Optional[bytes]]:
+    """
+    Sends a job to a running server and waits for its reply.
+
+    Parameters
+    ----------
+    job : dict
+        The operation and its options, see the module documentation.
+    socket_path : Optional[Path], optional
+        The Unix socket of the server (default is None).
+    port : Optional[int], optional
+        The localhost TCP port of the server (default is None).
+    data : Optional[bytes], optional
+        The WAV file to process, the result is returned with the reply (default is None).
+
+    Returns
+    -------
+    Tuple[dict, Optional[bytes]]
+        The reply and the processed WAV file when data was sent.
+    """
+    if data is not None:
+        job = {**job, "size": len(data)}
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(str(socket_path))
+    else:
+        connection = socket.create_connection((HOST, port))
+    with connection, connection.makefile("rb") as reader:
+        connection.sendall(json.dumps(job).encode() + b"\n")
+        if data is not None:
+            connection.sendall(data)
+        reply = json.loads(reader.readline())
+        output = reader.read(reply["size"]) if reply.get("size") is not None else None
+    return reply, output
@@ -1,4 +1,18 @@
-from .plot import visualize_audio
-from .prepare_binary_nist import generate_random_sequence
-from .tests import encryption_test
+from importlib import import_module
 
+# The helpers are imported on first use, plotting and the statistics pull in matplotlib and scipy.
+_EXPORTS = {
+    "visualize_audio": ".plot",
+    "generate_random_sequence": ".prepare_binary_nist",
+    "encryption_test": ".tests",
+    "encryption_test_batch": ".tests",
+    "run_battery": ".randomness",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
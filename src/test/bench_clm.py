@@ -0,0 +1,86 @@
+"""
+Benchmarks of the logistic map generator, run with ``python -m src.test.bench_clm``.
+
+The reference is the original string-growing loop, kept here to check that the current generator
+still produces the same digits.
+"""
+
+from time import perf_counter
+
+import numpy as np
+
+from src.cryptographer.helper.clm import (
+    generate_logistic_map_seq,
+    get_random_digits,
+    logistic_map_orbits,
+    LogisticMapDigits,
+    logistic_map_sequence,
+)
+
+R, X, KEY = 3.987654321, 0.123456789, "123456789012345"
+
+
+def reference_logistic_map_seq(r1: float, x1: float, n: int = 10_000) -> str:
+    logistic_map_key = ''
+    for _ in range(n):
+        x1 = x1 * r1 * (1 - x1)
+        logistic_map_key += str(x1)[-1]
+    return logistic_map_key
+
+
+def _best(function, rounds: int = 5) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_clm(long_length: int = 1_000_000, batch: int = 200) -> list[dict]:
+    """
+    Times the reference and the current generator for the key schedule, long sequences and batches.
+
+    Returns
+    -------
+    list[dict]
+        One row per case with the reference and current time in seconds.
+    """
+    assert generate_logistic_map_seq(R, X) == reference_logistic_map_seq(R, X)
+    rs = np.random.default_rng(0).uniform(3.57, 4.0, batch)
+    xs = np.random.default_rng(1).uniform(0.0, 1.0, batch)
+    return [
+        {
+            "case": "10k digits as str",
+            "reference": _best(lambda: reference_logistic_map_seq(R, X)),
+            "current": _best(lambda: generate_logistic_map_seq(R, X)),
+        },
+        {
+            "case": "get_random_digits on 10k",
+            "reference": _best(lambda: get_random_digits(reference_logistic_map_seq(R, X), KEY)),
+            "current": _best(lambda: get_random_digits(logistic_map_sequence(R, X), KEY)),
+        },
+        {
+            "case": f"{long_length:,} digits",
+            "reference": _best(lambda: reference_logistic_map_seq(R, X, long_length), 1),
+            "current": _best(lambda: logistic_map_sequence(R, X, long_length).to_array(), 1),
+        },
+        {
+            "case": f"{batch:,} keys, 60 digits each",
+            "reference": _best(lambda: [get_random_digits(reference_logistic_map_seq(r, x), KEY) for r, x in zip(rs, xs)], 1),
+            "current": _best(lambda: [get_random_digits(LogisticMapDigits(orbit), KEY) for orbit in logistic_map_orbits(rs, xs)], 1),
+        },
+    ]
+
+
+def print_clm_benchmark() -> None:
+    print(f"{'case':<28}{'reference (ms)':>16}{'current (ms)':>14}{'speedup':>9}")
+    for row in benchmark_clm():
+        print(
+            f"{row['case']:<28}{row['reference'] * 1000:>16.2f}{row['current'] * 1000:>14.2f}"
+            f"{row['reference'] / row['current']:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    print_clm_benchmark()
@@ -0,0 +1,108 @@
+"""
+Per-packet latency of the live packet cipher, run with ``python -m src.test.bench_packets``.
+
+The packets come from synthetic generators at 48 kHz 16-bit stereo, so no capture device or audio
+file is needed: a sine tone, white noise and silence. Every packet is encrypted, serialized,
+decrypted and compared with the original, and the time of every encryption and decryption is
+recorded on its own. The key setup is timed apart, it is paid once per stream and not per packet.
+"""
+
+from time import perf_counter, perf_counter_ns
+from typing import Callable, Iterator
+
+import numpy as np
+
+from src.cryptographer.controller.packet_controller import Packet, PacketDecryptor, PacketEncryptor
+
+FRAME_RATE = 48000
+CHANNELS = 2
+PACKET_MS = 20
+# One minute of audio.
+PACKETS = 3000
+
+
+def sine_packets(count: int, packet_ms: int = PACKET_MS, frequency: float = 440.0) -> Iterator[np.ndarray]:
+    """
+    Yields ``count`` packets of a sine tone at half scale, the same on both channels.
+    """
+    frames = FRAME_RATE * packet_ms // 1000
+    for index in range(count):
+        time = (np.arange(frames) + index * frames) / FRAME_RATE
+        samples = (np.sin(2 * np.pi * frequency * time) * 16384).astype('<i2')
+        yield np.repeat(samples, CHANNELS)
+
+
+def noise_packets(count: int, packet_ms: int = PACKET_MS, seed: int = 0) -> Iterator[np.ndarray]:
+    """
+    Yields ``count`` packets of white noise over the whole 16-bit range.
+    """
+    frames = FRAME_RATE * packet_ms // 1000
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        yield rng.integers(-32768, 32768, frames * CHANNELS, dtype=np.int16)
+
+
+def silence_packets(count: int, packet_ms: int = PACKET_MS) -> Iterator[np.ndarray]:
+    """
+    Yields ``count`` packets of digital silence.
+    """
+    frames = FRAME_RATE * packet_ms // 1000
+    for _ in range(count):
+        yield np.zeros(frames * CHANNELS, dtype='<i2')
+
+
+GENERATORS: dict[str, Callable[..., Iterator[np.ndarray]]] = {
+    "sine": sine_packets,
+    "noise": noise_packets,
+    "silence": silence_packets,
+}
+
+
+def benchmark_packets(count: int = PACKETS, packet_ms: int = PACKET_MS) -> list[dict]:
+    """
+    Streams ``count`` packets of every generator through a new encryptor and decryptor.
+
+    Returns
+    -------
+    list[dict]
+        One row per generator with the setup time in ms and the p50, p99 and maximum latency of a
+        packet in µs, for encryption and decryption.
+    """
+    rows = []
+    for name, generator in GENERATORS.items():
+        start = perf_counter()
+        encryptor = PacketEncryptor()
+        decryptor = PacketDecryptor(encryptor.key)
+        setup = perf_counter() - start
+        encrypt_ns, decrypt_ns = [], []
+        for frames in generator(count, packet_ms):
+            start = perf_counter_ns()
+            packet = encryptor.encrypt(frames)
+            encrypt_ns.append(perf_counter_ns() - start)
+            wire = packet.to_bytes()
+            start = perf_counter_ns()
+            decrypted = decryptor.decrypt(Packet.from_bytes(wire))
+            decrypt_ns.append(perf_counter_ns() - start)
+            assert decrypted == frames.tobytes()
+        row = {"generator": name, "packets": count, "setup_ms": setup * 1e3}
+        for operation, timings in (("encrypt", encrypt_ns), ("decrypt", decrypt_ns)):
+            p50, p99 = np.percentile(timings, [50, 99]) / 1e3
+            row.update({f"{operation}_p50_us": p50, f"{operation}_p99_us": p99, f"{operation}_max_us": max(timings) / 1e3})
+        rows.append(row)
+    return rows
+
+
+def print_packet_benchmark(count: int = PACKETS, packet_ms: int = PACKET_MS) -> None:
+    size = FRAME_RATE * packet_ms // 1000 * CHANNELS * 2
+    print(f"{count} packets of {packet_ms} ms, {size} bytes of {FRAME_RATE} Hz 16-bit stereo")
+    print(f"{'generator':<10}{'setup ms':>10}{'enc p50 µs':>12}{'enc p99 µs':>12}{'dec p50 µs':>12}{'dec p99 µs':>12}{'max µs':>10}")
+    for row in benchmark_packets(count, packet_ms):
+        print(
+            f"{row['generator']:<10}{row['setup_ms']:>10.1f}{row['encrypt_p50_us']:>12.1f}{row['encrypt_p99_us']:>12.1f}"
+            f"{row['decrypt_p50_us']:>12.1f}{row['decrypt_p99_us']:>12.1f}"
+            f"{max(row['encrypt_max_us'], row['decrypt_max_us']):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    print_packet_benchmark()
@@ -0,0 +1,90 @@
+"""
+Benchmarks of the shuffle variants, run with ``python -m src.test.bench_shuffle``.
+
+Throughput is measured over buffer sizes that straddle the usual L2/L3 cache sizes: a global
+permutation slows down as soon as the buffer no longer fits the cache because almost every swap
+misses it, while the block mode only ever touches one window and keeps its throughput. The mean
+jump is the average distance in bytes between the two positions of a move, a direct measure of
+the access locality.
+"""
+
+from time import perf_counter
+
+import numpy as np
+
+from src.cryptographer.helper.shuffle import (
+    seeded_shuffle,
+    seeded_unshuffle,
+    SHUFFLE_LEGACY,
+    SHUFFLE_V1,
+    SHUFFLE_BLOCK,
+    WINDOW_SIZE,
+    _legacy_indices,
+    _block_indices,
+    _v1_generator,
+)
+
+SEED = 123456789012345678901234567890123456789012345678901234567890
+SIZES = (256 * 1024, 4 * 1024 * 1024, 32 * 1024 * 1024)
+MODES = (SHUFFLE_LEGACY, SHUFFLE_V1, SHUFFLE_BLOCK)
+
+
+def mean_jump(size: int, mode: str) -> float:
+    """
+    Returns the mean distance in bytes between the source and destination of a byte move.
+    """
+    if mode == SHUFFLE_LEGACY:
+        targets = _legacy_indices(size, SEED).astype(np.int64)
+        return float(np.mean(np.arange(size - 1, -1, -1) - targets))
+    if mode == SHUFFLE_V1:
+        permutation = np.arange(size, dtype=np.int64)
+        _v1_generator(SEED).shuffle(permutation)
+    else:
+        permutation = np.concatenate([
+            _block_indices(min(WINDOW_SIZE, size - start), SEED, index).astype(np.int64) + start
+            for index, start in enumerate(range(0, size, WINDOW_SIZE))
+        ])
+    return float(np.mean(np.abs(permutation - np.arange(size))))
+
+
+def benchmark_shuffle(sizes: tuple[int, ...] = SIZES, modes: tuple[str, ...] = MODES) -> list[dict]:
+    """
+    Times shuffle and unshuffle of every mode over every buffer size.
+
+    Returns
+    -------
+    list[dict]
+        One row per mode and size with the throughput in MB/s and the mean jump in bytes.
+    """
+    rows = []
+    for mode in modes:
+        for size in sizes:
+            data = np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8)
+            start = perf_counter()
+            shuffled = seeded_shuffle(data.copy(), SEED, mode)
+            shuffle_time = perf_counter() - start
+            start = perf_counter()
+            restored = seeded_unshuffle(shuffled, SEED, mode)
+            unshuffle_time = perf_counter() - start
+            assert np.array_equal(restored, data)
+            rows.append({
+                "mode": mode,
+                "size": size,
+                "shuffle_mb_s": size / shuffle_time / 1e6,
+                "unshuffle_mb_s": size / unshuffle_time / 1e6,
+                "mean_jump": mean_jump(size, mode),
+            })
+    return rows
+
+
+def print_shuffle_benchmark(sizes: tuple[int, ...] = SIZES, modes: tuple[str, ...] = MODES) -> None:
+    print(f"{'mode':<8}{'size (MiB)':>12}{'shuffle MB/s':>15}{'unshuffle MB/s':>17}{'mean jump (B)':>16}")
+    for row in benchmark_shuffle(sizes, modes):
+        print(
+            f"{row['mode']:<8}{row['size'] / 2 ** 20:>12.2f}{row['shuffle_mb_s']:>15.1f}"
+            f"{row['unshuffle_mb_s']:>17.1f}{row['mean_jump']:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    print_shuffle_benchmark()
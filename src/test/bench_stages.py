@@ -0,0 +1,222 @@
+"""
+Benchmarks of every stage of the pipeline on its own, run with ``python main.py bench`` or
+``python -m src.test.bench_stages``.
+
+Stages that work on the audio data are timed over a range of buffer sizes, the key schedule stages
+do not depend on the size of the file and are timed once. The results are written as JSON and can
+be compared with a stored baseline, a stage slower than the baseline by more than a threshold is
+reported as a regression. Timings only compare on the same host.
+"""
+
+import json
+import platform
+import tempfile
+from logging import getLogger, WARNING
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.cryptographer.helper import (
+    CHUNK_SIZE,
+    decrypt_data_gcm,
+    derive_key,
+    encrypt_data_gcm,
+    encrypt_data_gcm_parallel,
+    generate_chaotic_parameters,
+    get_random_digits,
+    logistic_map_sequence,
+    seeded_shuffle,
+    seeded_unshuffle,
+    shuffle_unit,
+    SHUFFLE_MODES,
+)
+from src.cryptographer.helper.aes import LEGACY_KDF
+from src.cryptographer.model.audio_model import AudioFileHandler
+from .bench_startup import _import_time
+
+RESULTS_VERSION = 1
+SIZES = (64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+SEED = 123456789012345678901234567890123456789012345678901234567890
+KEY = "123456789012345"
+R, X = 3.987654321, 0.123456789
+# A single PBKDF2 iteration, so the AES stages time the cipher and not the key derivation.
+CHEAP_KDF = {"algorithm": "pbkdf2", "iterations": 1}
+PASSWORD, NONCE, SALT = "0" * 32, b"0" * 12, b"0" * 16
+# Keys of the Collatz stage, new ones every round so the trajectory cache does not hide the work.
+COLLATZ_KEYS = 200
+
+
+def _best(function: Callable[[], object], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def _collatz(rounds: int) -> float:
+    keys = np.random.default_rng(0).integers(10 ** 14, 10 ** 15, (rounds, COLLATZ_KEYS))
+    timings = []
+    for batch in keys.astype(str).tolist():
+        start = perf_counter()
+        for key in batch:
+            try:
+                generate_chaotic_parameters(key)
+            except ValueError:
+                pass
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def _key_stages(rounds: int) -> dict[str, Callable[[], float]]:
+    digits = logistic_map_sequence(R, X)
+    return {
+        "collatz parameters": lambda: _collatz(rounds) / COLLATZ_KEYS,
+        "logistic map": lambda: _best(lambda: str(logistic_map_sequence(R, X)), rounds),
+        "get_random_digits": lambda: _best(lambda: get_random_digits(digits, KEY), rounds),
+        "pbkdf2": lambda: _best(lambda: derive_key(PASSWORD, SALT, LEGACY_KDF), rounds),
+        "cli startup": lambda: min(_import_time("main")[1] for _ in range(rounds)),
+    }
+
+
+def _data_stages(size: int, rounds: int, directory: Path) -> dict[str, Callable[[], float]]:
+    data = np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8)
+    encrypted = encrypt_data_gcm(data, PASSWORD, NONCE, SALT, CHEAP_KDF)
+    params = (2, 2, 44100, size // 4, "NONE", "not compressed")
+    wav = directory / f"{size}.wav"
+    AudioFileHandler.write_file(data, wav, params, "")
+    stages = {}
+    for mode in SHUFFLE_MODES:
+        unit = shuffle_unit(mode, params[0], params[1])
+        shuffled = seeded_shuffle(data.copy(), SEED, mode, unit=unit)
+        stages[f"shuffle {mode}"] = lambda mode=mode, unit=unit: _best(
+            lambda: seeded_shuffle(data.copy(), SEED, mode, unit=unit), rounds)
+        stages[f"unshuffle {mode}"] = lambda mode=mode, unit=unit, shuffled=shuffled: _best(
+            lambda: seeded_unshuffle(shuffled.copy(), SEED, mode, unit), rounds)
+    stages.update({
+        "aes encrypt": lambda: _best(lambda: encrypt_data_gcm(data, PASSWORD, NONCE, SALT, CHEAP_KDF), rounds),
+        "aes decrypt": lambda: _best(lambda: decrypt_data_gcm(encrypted, PASSWORD, NONCE, SALT, CHEAP_KDF), rounds),
+        "aes chunked": lambda: _best(
+            lambda: encrypt_data_gcm_parallel(data, PASSWORD, NONCE, SALT, 1, CHEAP_KDF, tags=[]), rounds),
+        "wav write": lambda: _best(lambda: AudioFileHandler.write_file(data, wav, params, ""), rounds),
+        "wav read": lambda: _best(lambda: AudioFileHandler.read_file(wav), rounds),
+        "wav map": lambda: _best(lambda: np.array(AudioFileHandler.map_file(wav)[0]), rounds),
+    })
+    return stages
+
+
+def benchmark_stages(
+        sizes: tuple[int, ...] = SIZES,
+        rounds: int = 3,
+        stages: Optional[tuple[str, ...]] = None,
+) -> list[dict]:
+    """
+    Times every stage, the ones working on the audio data over every buffer size.
+
+    Parameters
+    ----------
+    sizes : tuple[int, ...], optional
+        The buffer sizes in bytes (default is 64 KiB, 1 MiB and 16 MiB).
+    rounds : int, optional
+        Number of runs of every case, the fastest one is kept (default is 3).
+    stages : Optional[tuple[str, ...]], optional
+        Only time the stages whose name starts with one of these (default is None, all of them).
+
+    Returns
+    -------
+    list[dict]
+        One row per stage and size with the time in seconds and the throughput in MB/s, the size
+        and throughput are None for the key schedule stages.
+    """
+    def selected(name: str) -> bool:
+        return not stages or name.startswith(tuple(stages))
+
+    rows = []
+    for name, run in _key_stages(rounds).items():
+        if selected(name):
+            rows.append({"stage": name, "size": None, "seconds": run(), "mb_s": None})
+    logger = getLogger("core")
+    level = logger.level
+    # write_file logs every file it writes.
+    logger.setLevel(WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for size in sizes:
+                for name, run in _data_stages(size, rounds, Path(directory)).items():
+                    if selected(name):
+                        seconds = run()
+                        rows.append({"stage": name, "size": size, "seconds": seconds, "mb_s": size / seconds / 1e6})
+    finally:
+        logger.setLevel(level)
+    return rows
+
+
+def write_results(rows: list[dict], file_path: Path) -> None:
+    """
+    Writes the rows of a run as JSON, together with the host they were measured on.
+    """
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "chunk_size": CHUNK_SIZE,
+        "rows": rows,
+    }
+    Path(file_path).write_text(json.dumps(results, indent=2))
+
+
+def read_results(file_path: Path) -> list[dict]:
+    """
+    Reads the rows of a run written by ``write_results``.
+    """
+    results = json.loads(Path(file_path).read_text())
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version: {results.get('version')}")
+    return results["rows"]
+
+
+def compare_with_baseline(rows: list[dict], baseline: list[dict], threshold: float = 0.2) -> list[dict]:
+    """
+    Compares a run with a baseline and returns the cases that got slower.
+
+    Parameters
+    ----------
+    rows : list[dict]
+        The rows of the current run.
+    baseline : list[dict]
+        The rows of the baseline run, cases missing from either run are skipped.
+    threshold : float, optional
+        The tolerated slowdown as a fraction of the baseline time (default is 0.2, 20 percent).
+
+    Returns
+    -------
+    list[dict]
+        The current rows slower than the baseline beyond the threshold, with the baseline time and
+        the relative change.
+    """
+    reference = {(row["stage"], row["size"]): row["seconds"] for row in baseline}
+    regressions = []
+    for row in rows:
+        before = reference.get((row["stage"], row["size"]))
+        if before and row["seconds"] > before * (1 + threshold):
+            regressions.append({**row, "baseline": before, "change": row["seconds"] / before - 1})
+    return regressions
+
+
+def print_stage_benchmark(rows: list[dict], baseline: Optional[list[dict]] = None) -> None:
+    reference = {(row["stage"], row["size"]): row["seconds"] for row in baseline or []}
+    print(f"{'stage':<20}{'size (MiB)':>12}{'time (ms)':>12}{'MB/s':>10}{'change':>9}")
+    for row in rows:
+        size = f"{row['size'] / 2 ** 20:.2f}" if row["size"] else "-"
+        throughput = f"{row['mb_s']:.1f}" if row["mb_s"] else "-"
+        before = reference.get((row["stage"], row["size"]))
+        change = f"{(row['seconds'] / before - 1) * 100:+.0f}%" if before else "-"
+        print(f"{row['stage']:<20}{size:>12}{row['seconds'] * 1000:>12.3f}{throughput:>10}{change:>9}")
+
+
+if __name__ == "__main__":
+    print_stage_benchmark(benchmark_stages())
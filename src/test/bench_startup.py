@@ -0,0 +1,90 @@
+"""
+Benchmarks of the CLI start-up, run with ``python -m src.test.bench_startup``.
+
+Every case imports a module in a fresh interpreter, which is what a user pays before a command
+runs. Importing ``main`` must not pull in the plotting and statistics libraries, the script exits
+with status 1 when one of them is loaded or a case is slower than its budget.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parents[2]
+# Modules only the plot, test and nist commands need.
+HEAVY_MODULES = ("matplotlib", "scipy")
+# Module imported per case and the largest acceptable start-up time in milliseconds.
+CASES = {
+    "interpreter": ("", 150.0),
+    "main": ("main", 400.0),
+    "encrypt path": ("src.cryptographer.application", 400.0),
+}
+
+_PROBE = """
+import sys
+from time import perf_counter
+start = perf_counter()
+{statement}
+elapsed = perf_counter() - start
+print(elapsed, ",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def _import_time(module: str) -> tuple[float, float, list[str]]:
+    """
+    Returns the wall time of the interpreter, the time of the import and the heavy modules loaded.
+    """
+    statement = f"import {module}" if module else "pass"
+    start = perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    wall = perf_counter() - start
+    return wall, float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def benchmark_startup(rounds: int = 5) -> list[dict]:
+    """
+    Times the import of every case in fresh interpreters.
+
+    Parameters
+    ----------
+    rounds : int, optional
+        Number of interpreters started per case, the best one is kept (default is 5).
+
+    Returns
+    -------
+    list[dict]
+        One row per case with the wall and import time in milliseconds, its budget and the
+        heavy modules it loaded.
+    """
+    rows = []
+    for case, (module, budget) in CASES.items():
+        timings = [_import_time(module) for _ in range(rounds)]
+        wall, imported, heavy = min(timings)
+        rows.append({
+            "case": case,
+            "wall_ms": wall * 1000,
+            "import_ms": imported * 1000,
+            "budget_ms": budget,
+            "heavy": heavy,
+        })
+    return rows
+
+
+def print_startup_benchmark(rounds: int = 5) -> bool:
+    print(f"{'case':<14}{'wall (ms)':>11}{'import (ms)':>13}{'budget (ms)':>13}  heavy modules")
+    passed = True
+    for row in benchmark_startup(rounds):
+        print(
+            f"{row['case']:<14}{row['wall_ms']:>11.1f}{row['import_ms']:>13.1f}{row['budget_ms']:>13.0f}"
+            f"  {', '.join(row['heavy']) or '-'}"
+        )
+        passed &= row["wall_ms"] <= row["budget_ms"] and not row["heavy"]
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if print_startup_benchmark() else 1)
@@ -0,0 +1,72 @@
+"""
+Round trips of odd-sized files through the file paths, run with ``python -m src.test.check_roundtrip``.
+
+Mono 8-bit and 24-bit audio with an odd number of frames has an odd data chunk, which needs a pad
+byte in front of the encryption header. Without it the header is not found and the file is decrypted
+as a headerless ciphertext, into noise. Every file is encrypted and decrypted whole through the
+mapped files, chunk by chunk, and as a time range, and compared with the original frames. The
+process exits with status 1 when a round trip does not give the original back.
+"""
+
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from src.cryptographer.application import Application
+from src.cryptographer.model.audio_model import AudioFileHandler
+
+FRAME_RATE = 8000
+# Odd frame counts of mono audio, with sample widths giving odd data chunks, over more than one cipher chunk.
+CASES = ((1, 1_100_001), (3, 400_001))
+CHUNK_FRAMES = 4096
+RANGE = (0.5, 1.0)
+
+
+def _write_wav(path: Path, sampwidth: int, nframes: int) -> bytes:
+    frames = np.random.default_rng(nframes).integers(0, 256, nframes * sampwidth, dtype=np.uint8).tobytes()
+    with wave.open(str(path), 'wb') as audio:
+        audio.setparams((1, sampwidth, FRAME_RATE, nframes, 'NONE', 'not compressed'))
+        audio.writeframes(frames)
+    return frames
+
+
+def _read_frames(path: Path) -> bytes:
+    with wave.open(str(path), 'rb') as audio:
+        return audio.readframes(audio.getnframes())
+
+
+def check_roundtrips() -> list[str]:
+    """
+    Runs every round trip and returns the ones that failed.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        for sampwidth, nframes in CASES:
+            source = directory / f"in_{sampwidth}.wav"
+            frames = _write_wav(source, sampwidth, nframes)
+            first, last = (int(second * FRAME_RATE) for second in RANGE)
+            for name, chunk_size in (("map", None), ("stream", CHUNK_FRAMES)):
+                encrypted, decrypted = directory / f"enc_{name}.wav", directory / f"dec_{name}.wav"
+                key = Application(source, encrypted, False, shuffle_mode="block", chunk_size=chunk_size).key
+                if AudioFileHandler.read_header(encrypted) is None:
+                    failures.append(f"{name} {sampwidth * 8}-bit: the header of the encrypted file was not found")
+                Application(encrypted, decrypted, False, key=key, shuffle_mode="block", chunk_size=chunk_size)
+                if _read_frames(decrypted) != frames:
+                    failures.append(f"{name} {sampwidth * 8}-bit: the decrypted frames differ")
+                ranged = directory / f"range_{name}.wav"
+                Application(encrypted, ranged, False, key=key, shuffle_mode="block", start=RANGE[0], end=RANGE[1])
+                if _read_frames(ranged) != frames[first * sampwidth:last * sampwidth]:
+                    failures.append(f"range {name} {sampwidth * 8}-bit: the decrypted frames differ")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_roundtrips()
+    for failure in failures:
+        print(failure)
+    print("all round trips passed" if not failures else f"{len(failures)} round trips failed")
+    sys.exit(1 if failures else 0)
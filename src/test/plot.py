@@ -1,10 +1,16 @@
-import matplotlib.pyplot as plt
+from pathlib import Path
+from typing import Optional
+
 import numpy as np
-import struct
 from scipy.signal import butter, filtfilt
 
 from src.cryptographer.model.audio_model import AudioFileHandler
 
+# Size of the plot in inches and its resolution, the plot is 1500 pixels wide.
+FIGURE_SIZE = (15, 5)
+DPI = 100
+FILTER_ORDER = 5
+
 def butter_lowpass(cutoff, fs, order=5):
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
@@ -17,51 +23,88 @@ def lowpass_filter(data, cutoff, fs, order=5):
     return y
 
 def unpack_audio_data(data, n_frames, n_channels, sampwidth):
+    """
+    Decodes little-endian PCM samples into an int32 array, 8-bit samples are unsigned and centered on zero.
+    """
+    n_samples = n_frames * n_channels
+    if sampwidth == 1:
+        return np.frombuffer(data, dtype=np.uint8, count=n_samples).astype(np.int32) - 128
+    if sampwidth == 2:
+        return np.frombuffer(data, dtype='<i2', count=n_samples).astype(np.int32)
     if sampwidth == 3:
-        fmt = '<i'
-        def unpack_fn(bytes_):
-            return struct.unpack(fmt, bytes_ + (b'\x00' if bytes_[2] < 0x80 else b'\xff'))[0]
-    elif sampwidth == 2:
-        fmt = '<h'
-        def unpack_fn(bytes_):
-            return struct.unpack(fmt, bytes_)[0]
-    elif sampwidth == 4:
-        fmt = '<i'
-        def unpack_fn(bytes_):
-            return struct.unpack(fmt, bytes_)[0]
-    else:
-        raise ValueError(f"Unsupported sample width: {sampwidth}")
+        raw = np.frombuffer(data, dtype=np.uint8, count=n_samples * 3).reshape(-1, 3)
+        # The top byte is read as signed, which extends the sign of the sample.
+        return raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8 | raw[:, 2].view(np.int8).astype(np.int32) << 16
+    if sampwidth == 4:
+        return np.frombuffer(data, dtype='<i4', count=n_samples).astype(np.int32)
+    raise ValueError(f"Unsupported sample width: {sampwidth}")
 
-    signal = np.zeros((n_frames * n_channels,), dtype=np.int32)
-    byte_per_sample = sampwidth
-    for i in range(n_frames * n_channels):
-        bytes_ = data[i*byte_per_sample:(i+1)*byte_per_sample]
-        signal[i] = unpack_fn(bytes_)
-    return signal
+def decimate_minmax(signal: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduces a signal to the minimum and maximum of each of ``width`` buckets, in the order they
+    occur, which draws the same envelope as every sample at that many pixels.
 
-def visualize_audio(file_name: str) -> None:
-    data, frame_rate, n_frames, n_channels, sampwidth = AudioFileHandler.read_file_frate(file_name)
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The sample indexes and values of the kept points, the signal itself when it is short enough.
+    """
+    if len(signal) <= 2 * width:
+        return np.arange(len(signal)), signal
+    bucket = len(signal) // width
+    buckets = signal[:bucket * width].reshape(width, bucket)
+    low, high = buckets.argmin(axis=1), buckets.argmax(axis=1)
+    first, second = np.minimum(low, high), np.maximum(low, high)
+    indexes = (np.arange(width) * bucket)[:, None] + np.stack([first, second], axis=1)
+    indexes = np.concatenate([indexes.ravel(), np.arange(bucket * width, len(signal))])
+    return indexes, signal[indexes]
 
-    signal = unpack_audio_data(data, n_frames, n_channels, sampwidth)
+def visualize_audio(file_name: str, output: Optional[Path] = None) -> None:
+    """
+    Plots the low-pass filtered left channel of an audio file over time.
 
-    if n_channels == 2:
-        l_channel = signal[0::2]
-        r_channel = signal[1::2]
-    else:
-        l_channel = signal
+    Parameters
+    ----------
+    file_name : str
+        The audio file to plot.
+    output : Optional[Path], optional
+        Render the plot to this PNG file instead of showing it, no display is needed (default is None).
+    """
+    data, params = AudioFileHandler.map_file(file_name)
+    frame_rate, n_frames, n_channels = params.framerate, params.nframes, params.nchannels
 
-    l_channel_normalized = l_channel / np.max(np.abs(l_channel))
+    # Only the samples of the left channel are decoded.
+    frame_size = n_channels * params.sampwidth
+    left = np.asarray(data)[:n_frames * frame_size].reshape(n_frames, frame_size)[:, :params.sampwidth]
+    l_channel = unpack_audio_data(np.ascontiguousarray(left), n_frames, 1, params.sampwidth)
 
-    cutoff_frequency = 5000
-    l_channel_filtered = lowpass_filter(l_channel_normalized, cutoff_frequency, frame_rate)
+    peak = np.max(np.abs(l_channel)) if len(l_channel) else 0
+    l_channel_normalized = l_channel / peak if peak else l_channel.astype(np.float64)
 
-    times = np.linspace(0, n_frames / frame_rate, num=n_frames)
+    # Below 10 kHz the cutoff is moved under the Nyquist frequency, and filtfilt needs more samples than its padding.
+    cutoff_frequency = min(5000, 0.45 * frame_rate)
+    if len(l_channel_normalized) > 3 * (FILTER_ORDER + 1):
+        l_channel_filtered = lowpass_filter(l_channel_normalized, cutoff_frequency, frame_rate, FILTER_ORDER)
+    else:
+        l_channel_filtered = l_channel_normalized
+
+    indexes, values = decimate_minmax(l_channel_filtered, FIGURE_SIZE[0] * DPI)
+    times = indexes / frame_rate
 
-    plt.figure(figsize=(15, 5))
-    plt.title('Wav file signal (Filtered)')
-    plt.xlabel("Time [s]")
-    plt.ylabel("Normalized Amplitude")
-    plt.plot(times, l_channel_filtered, alpha=0.7)
-    plt.xlim(0, n_frames / frame_rate)
-    plt.ylim(-1.1, 1.1)
-    plt.show()
+    if output is None:
+        import matplotlib.pyplot as plt
+        figure = plt.figure(figsize=FIGURE_SIZE, dpi=DPI)
+    else:
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    axes = figure.add_subplot()
+    axes.set_title('Wav file signal (Filtered)')
+    axes.set_xlabel("Time [s]")
+    axes.set_ylabel("Normalized Amplitude")
+    axes.plot(times, values, alpha=0.7)
+    axes.set_xlim(0, n_frames / frame_rate)
+    axes.set_ylim(-1.1, 1.1)
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output, format="png")
@@ -1,20 +1,118 @@
-from secrets import SystemRandom
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
 
 from src.util import BASE_DIR
 
-def generate_random_sequence() -> int:
-    sys_random = SystemRandom()
-    for i in range(10):
-        key = str(sys_random.randrange(1_000_000_000_000_00, 1_000_000_000_000_000))
-        n = int(key[:7])
-        file_name = str(BASE_DIR.parent / f"binary_sequence{i}.txt")
-        sequence = ""
-        while n != 1:
-            if n % 2 == 0:
-                n = n // 2
-            else:
-                n = 3 * n + 1
-            sequence += str(n)[-1]
-        binary_sequence = ''.join(format(int(digit), '04b') for digit in sequence)
-        with open(file_name, 'w') as file:
-            file.write(binary_sequence)
+# The trajectories start from 7-digit numbers, whose terms stay far below the int64 limit.
+SEED_RANGE = (1_000_000, 10_000_000)
+# Trajectories advanced together, a batch gives about a quarter of a megabit.
+BATCH_SIZE = 4096
+FORMATS = ("txt", "bin")
+
+
+def collatz_last_digits(seeds: np.ndarray) -> np.ndarray:
+    """
+    Returns the last digit of every term of the Collatz trajectories of the seeds, vectorized across
+    the seeds. The digits of every trajectory follow the ones of the previous seed, the seed itself
+    is left out and the final 1 is kept.
+
+    Parameters
+    ----------
+    seeds : np.ndarray
+        The starting numbers, from ``SEED_RANGE``.
+
+    Returns
+    -------
+    np.ndarray
+        The digits as uint8.
+    """
+    n = np.asarray(seeds, dtype=np.int64)
+    steps, active = [], []
+    alive = n != 1
+    while alive.any():
+        n = np.where(alive, np.where(n & 1, 3 * n + 1, n >> 1), n)
+        steps.append((n % 10).astype(np.uint8))
+        active.append(alive)
+        alive = alive & (n != 1)
+    if not steps:
+        return np.zeros(0, dtype=np.uint8)
+    # One row per seed, read row by row to keep every trajectory in order.
+    return np.stack(steps, axis=1)[np.stack(active, axis=1)]
+
+
+def digits_to_bits(digits: np.ndarray) -> np.ndarray:
+    """
+    Writes every digit as its 4 bits, the most significant first.
+
+    Returns
+    -------
+    np.ndarray
+        The bits as uint8 zeros and ones.
+    """
+    return np.unpackbits(np.asarray(digits, dtype=np.uint8)[:, None], axis=1)[:, 4:].ravel()
+
+
+def collatz_bits(length: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Generates ``length`` bits from the trajectories of random seeds, in batches of ``BATCH_SIZE``.
+    """
+    parts, total = [], 0
+    while total < length:
+        bits = digits_to_bits(collatz_last_digits(rng.integers(*SEED_RANGE, BATCH_SIZE)))
+        parts.append(bits)
+        total += len(bits)
+    return np.concatenate(parts)[:length]
+
+
+def _write_sequence(index: int, length: int, directory: Path, formats: tuple[str, ...], seed: np.random.SeedSequence) -> None:
+    bits = collatz_bits(length, np.random.default_rng(seed))
+    if "txt" in formats:
+        (directory / f"binary_sequence{index}.txt").write_bytes((bits + ord("0")).tobytes())
+    if "bin" in formats:
+        # Packed eight bits per byte, the last byte is padded with zeros.
+        (directory / f"binary_sequence{index}.bin").write_bytes(np.packbits(bits).tobytes())
+
+
+def generate_random_sequence(
+        count: int = 10,
+        length: int = 1_000_000,
+        directory: Optional[Path] = None,
+        formats: tuple[str, ...] = FORMATS,
+        processes: Optional[int] = None,
+) -> int:
+    """
+    Writes bit sequences for the NIST statistical test suite, the last digits of the Collatz
+    trajectories of random 7-digit numbers written as 4 bits each.
+
+    Parameters
+    ----------
+    count : int, optional
+        Number of sequences (default is 10).
+    length : int, optional
+        Number of bits of every sequence (default is 1,000,000).
+    directory : Optional[Path], optional
+        Where the files are written (default is None, the parent of the program directory).
+    formats : tuple[str, ...], optional
+        ``txt`` writes the bits as ASCII zeros and ones, ``bin`` packs them eight to a byte
+        (default is both).
+    processes : Optional[int], optional
+        Number of sequences generated concurrently (default is None, the number of CPUs).
+
+    Returns
+    -------
+    int
+        The number of sequences written.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown formats {sorted(unknown)}, choose from {FORMATS}")
+    directory = Path(directory) if directory is not None else BASE_DIR.parent
+    directory.mkdir(parents=True, exist_ok=True)
+    # Every sequence draws its seeds from its own stream of the system entropy.
+    seeds = np.random.SeedSequence().spawn(count)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        list(pool.map(_write_sequence, range(count), [length] * count, [directory] * count, [tuple(formats)] * count, seeds))
+    return count
@@ -0,0 +1,344 @@
+"""
+A core subset of the NIST SP 800-22 statistical tests, computed over a stream of bits.
+
+The frequency, block frequency, runs, longest run of ones, serial and approximate entropy tests
+only need counts, so every chunk of bits updates a few accumulators and is dropped: inputs of any
+size are tested in bounded memory. The bits of a byte are read from the most significant one, like
+the binary files of the NIST suite. The total number of bits is needed up front, it selects the
+block length of the longest run test and the pattern lengths of the serial and approximate entropy
+tests.
+
+Functions
+---------
+run_battery(chunks, n)
+    Runs the tests over chunks of bits and returns their p-values.
+wav_bits(file_path)
+    The bits of the audio data of a WAV file.
+logistic_bits(r, x, n)
+    The bits of the digits of a logistic map orbit.
+collatz_stream_bits(n, seed)
+    The bits of the last digits of Collatz trajectories, like the NIST sequences.
+"""
+
+from math import erfc, floor, log, log2, sqrt
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from scipy.special import gammaincc
+
+from src.cryptographer.helper import logistic_map_orbit
+from src.cryptographer.helper.chunking import rechunk
+from src.cryptographer.helper.clm import LogisticMapDigits
+from src.cryptographer.model.audio_model import AudioFileHandler
+from .prepare_binary_nist import collatz_bits, digits_to_bits
+
+# Bytes read at a time, eight million bits.
+CHUNK_SIZE = 1024 * 1024
+# A sequence passes a test when its p-value is at least the significance level.
+SIGNIFICANCE = 0.01
+BLOCK_FREQUENCY_M = 128
+SERIAL_M = 16
+APPROXIMATE_ENTROPY_M = 10
+# The block length of the longest run test for the smallest sequence length it is defined for,
+# the upper bounds of the classes of the longest runs and their probabilities, from SP 800-22 2.4.
+LONGEST_RUN_TABLES = (
+    (750_000, 10_000, (10, 11, 12, 13, 14, 15), (0.0882, 0.2092, 0.2483, 0.1933, 0.1208, 0.0675, 0.0727)),
+    (6_272, 128, (4, 5, 6, 7, 8), (0.1174, 0.2430, 0.2493, 0.1752, 0.1027, 0.1124)),
+    (128, 8, (1, 2, 3), (0.2148, 0.3672, 0.2305, 0.1875)),
+)
+
+
+def _igamc(a: float, x: float) -> float:
+    return float(gammaincc(a, x))
+
+
+class _Blocks:
+    """
+    Cuts a stream of bits into blocks of a fixed length, the bits of an unfinished block are kept
+    for the next chunk and the ones after the last whole block are dropped.
+    """
+
+    def __init__(self, length: int) -> None:
+        self.length = length
+        self.rest = np.zeros(0, dtype=np.uint8)
+
+    def split(self, bits: np.ndarray) -> np.ndarray:
+        bits = np.concatenate([self.rest, bits]) if len(self.rest) else bits
+        count = len(bits) // self.length
+        self.rest = bits[count * self.length:].copy()
+        return bits[:count * self.length].reshape(count, self.length)
+
+
+class _Patterns:
+    """
+    Counts the overlapping patterns of ``width`` bits of a sequence read as a circle, its first
+    ``width - 1`` bits are appended to its end. Patterns of fewer bits are counted by summing
+    over the bits they leave out.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self.counts = np.zeros(1 << width, dtype=np.int64)
+        self.head = np.zeros(0, dtype=np.uint8)
+        self.tail = np.zeros(0, dtype=np.uint8)
+
+    def update(self, bits: np.ndarray) -> None:
+        if len(self.head) < self.width - 1:
+            self.head = np.concatenate([self.head, bits[:self.width - 1 - len(self.head)]])
+        self._count(np.concatenate([self.tail, bits]))
+
+    def finish(self) -> None:
+        # The head may be shorter than the width for sequences shorter than it.
+        self._count(np.concatenate([self.tail, self.head]))
+        self.tail = np.zeros(0, dtype=np.uint8)
+
+    def _count(self, bits: np.ndarray) -> None:
+        if len(bits) >= self.width:
+            self.counts += np.bincount(_windows(bits, self.width), minlength=len(self.counts))
+        self.tail = bits[max(0, len(bits) - self.width + 1):].copy()
+
+    def of_width(self, width: int) -> np.ndarray:
+        if width == 0:
+            return np.array([self.counts.sum()])
+        return self.counts.reshape(1 << width, -1).sum(axis=1)
+
+
+class RandomnessBattery:
+    """
+    The accumulators of the tests, fed with chunks of bits of a sequence of ``n`` bits.
+    """
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise ValueError("The sequence must hold at least one bit")
+        self.n = n
+        self.seen = 0
+        self.ones = 0
+        self.transitions = 0
+        self.last: Optional[int] = None
+        self.block_frequency = _Blocks(BLOCK_FREQUENCY_M)
+        self.block_deviation = 0.0
+        self.block_count = 0
+
+        self.longest_run = next((table for table in LONGEST_RUN_TABLES if n >= table[0]), None)
+        if self.longest_run is not None:
+            self.longest_blocks = _Blocks(self.longest_run[1])
+            self.longest_classes = np.zeros(len(self.longest_run[3]), dtype=np.int64)
+
+        # The pattern lengths the tests are defined for, SP 800-22 2.11 and 2.12.
+        self.serial_m = min(SERIAL_M, floor(log2(n)) - 3)
+        self.entropy_m = min(APPROXIMATE_ENTROPY_M, floor(log2(n)) - 6)
+        width = max(self.serial_m, self.entropy_m + 1)
+        self.patterns = _Patterns(width) if width >= 2 else None
+
+    def update(self, bits: np.ndarray) -> None:
+        """
+        Adds the next chunk of bits, a uint8 array of zeros and ones.
+        """
+        bits = bits[:self.n - self.seen]
+        if not len(bits):
+            return
+        self.seen += len(bits)
+        self.ones += int(np.count_nonzero(bits))
+        self.transitions += int(np.count_nonzero(bits[1:] != bits[:-1]))
+        if self.last is not None:
+            self.transitions += int(bits[0] != self.last)
+        self.last = int(bits[-1])
+
+        blocks = self.block_frequency.split(bits)
+        self.block_deviation += float(((blocks.sum(axis=1) / BLOCK_FREQUENCY_M - 0.5) ** 2).sum())
+        self.block_count += len(blocks)
+
+        if self.longest_run is not None:
+            blocks = self.longest_blocks.split(bits)
+            bounds = np.array(self.longest_run[2])
+            classes = np.searchsorted(bounds, _longest_runs(blocks))
+            self.longest_classes += np.bincount(classes, minlength=len(self.longest_classes))
+
+        if self.patterns is not None:
+            self.patterns.update(bits)
+
+    def results(self) -> list[dict]:
+        """
+        Returns the p-value of every test, None for the tests the sequence is too short for.
+
+        Returns
+        -------
+        list[dict]
+            One row per p-value with the test, the p-value and whether it passed.
+        """
+        if self.seen != self.n:
+            raise ValueError(f"Expected {self.n} bits, got {self.seen}")
+        n = self.n
+        p_values = {"frequency": erfc(abs(2 * self.ones - n) / sqrt(n) / sqrt(2))}
+
+        if self.block_count:
+            chi_squared = 4 * BLOCK_FREQUENCY_M * self.block_deviation
+            p_values["block frequency"] = _igamc(self.block_count / 2, chi_squared / 2)
+        else:
+            p_values["block frequency"] = None
+
+        pi = self.ones / n
+        if abs(pi - 0.5) >= 2 / sqrt(n):
+            # The runs test is only run on sequences passing the frequency prerequisite.
+            p_values["runs"] = 0.0
+        else:
+            runs = self.transitions + 1
+            p_values["runs"] = erfc(abs(runs - 2 * n * pi * (1 - pi)) / (2 * sqrt(2 * n) * pi * (1 - pi)))
+
+        if self.longest_run is not None:
+            probabilities = np.array(self.longest_run[3])
+            expected = self.longest_classes.sum() * probabilities
+            chi_squared = float(((self.longest_classes - expected) ** 2 / expected).sum())
+            p_values["longest run"] = _igamc((len(probabilities) - 1) / 2, chi_squared / 2)
+        else:
+            p_values["longest run"] = None
+
+        if self.patterns is not None:
+            self.patterns.finish()
+        p_values["serial 1"], p_values["serial 2"] = self._serial()
+        p_values["approximate entropy"] = self._approximate_entropy()
+        return [
+            {"test": test, "p_value": p_value, "passed": None if p_value is None else p_value >= SIGNIFICANCE}
+            for test, p_value in p_values.items()
+        ]
+
+    def _serial(self) -> tuple[Optional[float], Optional[float]]:
+        m = self.serial_m
+        if self.patterns is None or m < 3:
+            return None, None
+        n = self.n
+
+        def psi_squared(width: int) -> float:
+            if width == 0:
+                return 0.0
+            counts = self.patterns.of_width(width)
+            return float((1 << width) / n * int((counts ** 2).sum()) - n)
+
+        psi = [psi_squared(m), psi_squared(m - 1), psi_squared(m - 2)]
+        first = psi[0] - psi[1]
+        second = psi[0] - 2 * psi[1] + psi[2]
+        return _igamc(2 ** (m - 2), first / 2), _igamc(2 ** (m - 3), second / 2)
+
+    def _approximate_entropy(self) -> Optional[float]:
+        m = self.entropy_m
+        if self.patterns is None or m < 1:
+            return None
+        n = self.n
+
+        def phi(width: int) -> float:
+            counts = self.patterns.of_width(width)
+            counts = counts[counts > 0] / n
+            return float((counts * np.log(counts)).sum())
+
+        entropy = phi(m) - phi(m + 1)
+        chi_squared = 2 * n * (log(2) - entropy)
+        return _igamc(2 ** (m - 1), chi_squared / 2)
+
+
+def _windows(bits: np.ndarray, width: int) -> np.ndarray:
+    """
+    Returns the value of the ``width`` bits starting at every position, the first bit the most
+    significant one. The windows of 2k bits are built from two windows of k bits, so the number of
+    passes over the bits grows with the logarithm of the width.
+    """
+    count = len(bits) - width + 1
+    doubled = {1: bits.astype(np.uint16 if width <= 16 else np.uint32)}
+    size = 1
+    while size * 2 <= width:
+        values = doubled[size]
+        doubled[size * 2] = values[:len(values) - size] << size | values[size:]
+        size *= 2
+    result, offset = None, 0
+    for size in sorted(doubled, reverse=True):
+        if width & size:
+            part = doubled[size][offset:offset + count]
+            result = part if result is None else result << size | part
+            offset += size
+    return result
+
+
+def _longest_runs(blocks: np.ndarray) -> np.ndarray:
+    """
+    Returns the longest run of ones of every row.
+    """
+    longest = np.zeros(len(blocks), dtype=np.int64)
+    if not blocks.size:
+        return longest
+    # Every row is followed by a zero, so no run crosses the end of a row.
+    padded = np.zeros((blocks.shape[0], blocks.shape[1] + 1), dtype=np.int8)
+    padded[:, :-1] = blocks
+    edges = np.diff(padded.ravel(), prepend=np.int8(0))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    np.maximum.at(longest, starts // padded.shape[1], ends - starts)
+    return longest
+
+
+def run_battery(chunks: Iterable[np.ndarray], n: int) -> list[dict]:
+    """
+    Runs the tests over a sequence of bits.
+
+    Parameters
+    ----------
+    chunks : Iterable[np.ndarray]
+        The bits as uint8 arrays of zeros and ones.
+    n : int
+        The number of bits tested, later bits are ignored.
+
+    Returns
+    -------
+    list[dict]
+        One row per p-value, see ``RandomnessBattery.results``.
+    """
+    battery = RandomnessBattery(n)
+    for bits in chunks:
+        battery.update(bits)
+        if battery.seen >= n:
+            break
+    return battery.results()
+
+
+def wav_bits(file_path: Path, chunk_size: int = CHUNK_SIZE) -> tuple[Iterator[np.ndarray], int]:
+    """
+    Returns the bits of the audio data of a WAV file, read in chunks, and their number.
+    """
+    params = AudioFileHandler.read_params(file_path)
+    frame_size = params.nchannels * params.sampwidth
+    chunks = rechunk(AudioFileHandler.iter_frames(file_path, max(1, chunk_size // frame_size)), chunk_size)
+    return (np.unpackbits(chunk) for chunk in chunks), params.nframes * frame_size * 8
+
+
+def logistic_bits(r: float, x: float, n: int, chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yields the digits of the logistic map orbit of ``generate_logistic_map_seq`` as 4 bits each,
+    until ``n`` bits were yielded.
+    """
+    remaining = n
+    while remaining > 0:
+        orbit = logistic_map_orbit(r, x, min(chunk_size, -(-remaining // 4)))
+        x = float(orbit[-1])
+        bits = digits_to_bits(LogisticMapDigits(orbit).to_array() - ord("0"))
+        remaining -= len(bits)
+        yield bits
+
+
+def collatz_stream_bits(n: int, seed: Optional[int] = None, chunk_size: int = CHUNK_SIZE * 8) -> Iterator[np.ndarray]:
+    """
+    Yields the bits of the NIST sequences of ``generate_random_sequence`` until ``n`` bits were yielded.
+    """
+    rng = np.random.default_rng(seed)
+    remaining = n
+    while remaining > 0:
+        bits = collatz_bits(min(chunk_size, remaining), rng)
+        remaining -= len(bits)
+        yield bits
+
+
+def print_battery(rows: list[dict]) -> None:
+    print(f"{'test':<22}{'p-value':>12}  result")
+    for row in rows:
+        if row["p_value"] is None:
+            print(f"{row['test']:<22}{'-':>12}  sequence too short")
+        else:
+            print(f"{row['test']:<22}{row['p_value']:>12.6f}  {'pass' if row['passed'] else 'FAIL'}")
@@ -1,68 +1,215 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path, WindowsPath, PosixPath
+from typing import Iterator, Optional
+
 import numpy as np
-from pathlib import WindowsPath, PosixPath
 
 from scipy.stats import entropy as scipy_entropy
 
+from src.cryptographer.helper.chunking import rechunk
 from src.cryptographer.model.audio_model import AudioFileHandler
 
+# Bytes of every file processed at a time, an even number so the chunks hold whole int16 samples.
+CHUNK_SIZE = 1024 * 1024
+METRICS = (
+    "entropy_original",
+    "entropy_encrypted",
+    "entropy_decrypted",
+    "snr_encrypted",
+    "snr_decrypted",
+    "correlation_encrypted",
+    "correlation_decrypted",
+)
+
 
 def encryption_test(
         original: WindowsPath | PosixPath,
         encrypted: WindowsPath | PosixPath,
         decrypted: WindowsPath | PosixPath
 ) -> None:
-    original_data, _ = AudioFileHandler.read_file(original)
-    encrypted_data, _ = AudioFileHandler.read_file(encrypted)
-    decrypted_data, _ = AudioFileHandler.read_file(decrypted)
-
-    print("Entropy of original data:", calculate_entropy(original_data))
-    print("Entropy of encrypted data:", calculate_entropy(encrypted_data))
-    print("Entropy of decrypted data:", calculate_entropy(decrypted_data))
-
-
-    original_data = np.frombuffer(original_data, dtype=np.int16)
-    encrypted_data = np.frombuffer(encrypted_data, dtype=np.int16)
-    decrypted_data = np.frombuffer(decrypted_data, dtype=np.int16)
-
-    min_len = min(len(original_data), len(encrypted_data), len(decrypted_data))
-    original_data = original_data[:min_len]
-    encrypted_data = encrypted_data[:min_len]
-    decrypted_data = decrypted_data[:min_len]
+    metrics = measure_quality(original, encrypted, decrypted)
 
-    noise_encrypted = encrypted_data - original_data
-    noise_decrypted = decrypted_data - original_data
+    print("Entropy of original data:", metrics["entropy_original"])
+    print("Entropy of encrypted data:", metrics["entropy_encrypted"])
+    print("Entropy of decrypted data:", metrics["entropy_decrypted"])
 
-    snr_encrypted = calculate_snr(original_data, noise_encrypted)
-    snr_decrypted = calculate_snr(original_data, noise_decrypted)
+    print(f"SNR (Original vs Encrypted): {metrics['snr_encrypted']} dB")
+    print(f"SNR (Original vs Decrypted): {metrics['snr_decrypted']} dB")
 
-    print(f"SNR (Original vs Encrypted): {snr_encrypted} dB")
-    print(f"SNR (Original vs Decrypted): {snr_decrypted} dB")
+    print(f"Correlation (Original vs Encrypted): {metrics['correlation_encrypted']}")
+    print(f"Correlation (Original vs Decrypted): {metrics['correlation_decrypted']}")
 
 
-    original_data = np.frombuffer(original_data, dtype=np.int8)
-    encrypted_data = np.frombuffer(encrypted_data, dtype=np.int8)
-    decrypted_data = np.frombuffer(decrypted_data, dtype=np.int8)
-
-
-    correlation_original_encrypted = calculate_correlation(original_data, encrypted_data)
-    correlation_original_decrypted = calculate_correlation(original_data, decrypted_data)
-
-    print(f"Correlation (Original vs Encrypted): {correlation_original_encrypted}")
-    print(f"Correlation (Original vs Decrypted): {correlation_original_decrypted}")
+def measure_quality(
+        original: WindowsPath | PosixPath,
+        encrypted: WindowsPath | PosixPath,
+        decrypted: WindowsPath | PosixPath,
+        chunk_size: int = CHUNK_SIZE
+) -> dict:
+    """
+    Streams the three files chunk by chunk and measures the entropy of each of them, and the SNR and
+    correlation of the encrypted and decrypted data against the original.
+
+    The files are read in lockstep on three threads, one chunk of each at a time. The entropy is
+    measured over the whole data of every file and the pairwise metrics over the length of the
+    shortest one.
+
+    Returns
+    -------
+    dict
+        The metrics named in ``METRICS``.
+    """
+    streams = [_read_chunks(path, chunk_size) for path in (original, encrypted, decrypted)]
+    histograms = [ByteHistogram() for _ in streams]
+    snr = [SnrAccumulator(), SnrAccumulator()]
+    correlation = [CorrelationAccumulator(), CorrelationAccumulator()]
+
+    def read(index: int) -> Optional[np.ndarray]:
+        chunk = next(streams[index], None)
+        if chunk is not None:
+            histograms[index].update(chunk)
+        return chunk
+
+    def compare(index: int, reference: np.ndarray, chunk: np.ndarray) -> None:
+        length = min(len(reference), len(chunk)) // 2 * 2
+        reference, chunk = reference[:length], chunk[:length]
+        snr[index].update(reference.view('<i2'), chunk.view('<i2'))
+        correlation[index].update(reference.view(np.int8), chunk.view(np.int8))
+
+    with ThreadPoolExecutor(max_workers=len(streams)) as pool:
+        while True:
+            reference, *chunks = pool.map(read, range(len(streams)))
+            if reference is None and all(chunk is None for chunk in chunks):
+                break
+            # The pairwise metrics stop at the end of the shortest file, like the in-memory ones did.
+            if reference is not None and all(chunk is not None for chunk in chunks):
+                list(pool.map(compare, range(len(chunks)), [reference] * len(chunks), chunks))
+
+    return dict(zip(METRICS, map(float, (
+        *(histogram.entropy() for histogram in histograms),
+        *(accumulator.snr() for accumulator in snr),
+        *(accumulator.correlation() for accumulator in correlation),
+    ))))
+
+
+def _read_chunks(file_path: WindowsPath | PosixPath, chunk_size: int) -> Iterator[np.ndarray]:
+    params = AudioFileHandler.read_params(file_path)
+    frames = max(1, chunk_size // (params.nchannels * params.sampwidth))
+    return rechunk(AudioFileHandler.iter_frames(file_path, frames), chunk_size)
+
+
+def encryption_test_batch(
+        original: Path,
+        encrypted: Path,
+        decrypted: Path,
+        csv_path: Path,
+        processes: Optional[int] = None
+) -> int:
+    """
+    Measures every file below the original directory against the files with the same relative path
+    below the encrypted and decrypted directories and writes one CSV row per file.
+
+    Returns
+    -------
+    int
+        The number of files measured, files missing from either directory are skipped.
+    """
+    triples = []
+    for path in sorted(original.rglob("*.wav")):
+        relative = path.relative_to(original)
+        if (encrypted / relative).is_file() and (decrypted / relative).is_file():
+            triples.append((relative, path, encrypted / relative, decrypted / relative))
+        else:
+            print(f"Skipped {relative}, it is missing from the encrypted or decrypted directory")
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = pool.map(measure_quality, *zip(*(paths for _, *paths in triples))) if triples else []
+        with open(csv_path, 'w', newline='') as summary:
+            writer = csv.DictWriter(summary, fieldnames=("file", *METRICS))
+            writer.writeheader()
+            for (relative, *_), metrics in zip(triples, results):
+                writer.writerow({"file": relative.as_posix(), **metrics})
+    return len(triples)
+
+
+class ByteHistogram:
+    """Counts the bytes of a stream for its entropy."""
+
+    def __init__(self) -> None:
+        self.counts = np.zeros(256, dtype=np.int64)
+
+    def update(self, data) -> None:
+        self.counts += np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+
+    def entropy(self) -> float:
+        return calculate_entropy_counts(self.counts)
+
+
+class SnrAccumulator:
+    """Sums the power of a signal and of its difference to another one."""
+
+    def __init__(self) -> None:
+        self.signal_power = 0
+        self.noise_power = 0
+        self.count = 0
+
+    def update(self, signal: np.ndarray, other: np.ndarray) -> None:
+        # The products of int16 samples summed over a chunk stay below 2 ** 53, the float sums are exact.
+        signal = signal.astype(np.float64)
+        noise = other - signal
+        self.signal_power += int(np.dot(signal, signal))
+        self.noise_power += int(np.dot(noise, noise))
+        self.count += len(signal)
+
+    def snr(self) -> float:
+        if not self.count:
+            return 0
+        return calculate_snr_power(self.signal_power / self.count, self.noise_power / self.count)
+
+
+class CorrelationAccumulator:
+    """Counts the pairs of bytes of two streams, their sums give the Pearson correlation coefficient exactly."""
+
+    _VALUES = np.arange(256, dtype=np.uint8).view(np.int8).astype(np.int64)
+
+    def __init__(self) -> None:
+        self.pairs = np.zeros(256 * 256, dtype=np.int64)
+
+    def update(self, x: np.ndarray, y: np.ndarray) -> None:
+        pairs = x.view(np.uint8).astype(np.uint16) << 8 | y.view(np.uint8)
+        self.pairs += np.bincount(pairs, minlength=256 * 256)
+
+    def correlation(self) -> float:
+        pairs = self.pairs.reshape(256, 256)
+        count_x, count_y, values = pairs.sum(axis=1), pairs.sum(axis=0), self._VALUES
+        n = int(pairs.sum())
+        sum_x, sum_y = int(count_x @ values), int(count_y @ values)
+        sum_xx, sum_yy = int(count_x @ values ** 2), int(count_y @ values ** 2)
+        sum_xy = int(values @ pairs @ values)
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+        return covariance / variance ** 0.5 if variance else float('nan')
 
 
 def calculate_entropy(data):
     """Calculate the entropy of a byte array."""
     data_array = np.frombuffer(data, dtype=np.uint8)
     byte_counts = np.bincount(data_array, minlength=256)
-    byte_probs = byte_counts / len(data_array)
+    return calculate_entropy_counts(byte_counts)
+
+def calculate_entropy_counts(byte_counts):
+    """Calculate the entropy from the counts of the 256 byte values."""
+    byte_probs = byte_counts / byte_counts.sum()
     return scipy_entropy(byte_probs, base=2)
 
 def calculate_snr(signal, noise):
     """Calculate the Signal-to-Noise Ratio (SNR) in dB."""
     signal_power = np.mean(signal ** 2)
     noise_power = np.mean(noise ** 2)
+    return calculate_snr_power(signal_power, noise_power)
 
+def calculate_snr_power(signal_power, noise_power):
+    """Calculate the Signal-to-Noise Ratio (SNR) in dB from the mean power of the signal and the noise."""
     if noise_power == 0:
         return float('inf') if signal_power > 0 else 0
 
@@ -3,6 +3,11 @@ from .log_config_parser import get_log_config
 from .path_reslover import BASE_DIR
 
 
-__ALL__ = ['config', 'log_config', 'BASE_DIR']
+__ALL__ = ['config', 'log_config', 'get_log_config', 'BASE_DIR']
 
-log_config = get_log_config()
+
+def __getattr__(name: str):
+    # Logging is configured on first use, importing the package leaves the log files alone.
+    if name == "log_config":
+        return get_log_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,105 @@
+"""
+Configures logging from the file named by ``LOG_CONFIG`` and moves the handlers of the core logger off
+the threads that log.
+
+The handlers of the file are run by a ``QueueListener`` thread: the core logger only puts its records
+on a queue, so the encryption never waits for the log file or the console. A record is formatted on
+the listener thread, and only once it passed the level of the logger. The level of the core logger is
+picked for the ``ENV_MODE`` from ``[settings.log.levels]``.
+
+Process pools whose workers log pass ``worker_logging()`` as their initializer, the workers then send
+their records to the listener of the main process and never write the log file themselves.
+
+Nothing is configured on import: the command line and the pools call ``get_log_config()``, which sets
+up logging once per process, and a library user keeps the logging of the application embedding it.
+"""
+
+import atexit
+import multiprocessing
+import queue
+from functools import lru_cache
+from logging import Logger, LogRecord, getLogger
 from logging.config import fileConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional, Tuple
 
 from .path_reslover import BASE_DIR
 from .config_parser import config
 from .funcs import create_directories
 
+CORE_LOGGER = "core"
+
+
+class _RecordHandler(QueueHandler):
+    """
+    Puts the records on a queue of the same process as they are, the listener formats them.
+    """
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        return record
+
+
+class QueueLogging:
+    """
+    The listener running the handlers of a logger and the queues feeding it.
+
+    Methods
+    -------
+    worker_logging() -> Tuple[Callable, tuple]
+        Returns the initializer and its arguments of a process pool whose workers log to this process.
+    stop() -> None
+        Handles the records still queued and stops the listeners.
+    """
+
+    def __init__(self, logger: Logger) -> None:
+        self.logger = logger
+        self.handlers = tuple(logger.handlers)
+        self.listener = QueueListener(queue.SimpleQueue(), *self.handlers, respect_handler_level=True)
+        self.logger.handlers = [_RecordHandler(self.listener.queue)]
+        self.listener.start()
+        self._process_listener: Optional[QueueListener] = None
+        atexit.register(self.stop)
+
+    def worker_logging(self) -> Tuple[Callable, tuple]:
+        """
+        Returns the initializer and its arguments of a process pool whose workers send their records to
+        the handlers of this process. The queue between the processes is created on first use.
+        """
+        if self._process_listener is None:
+            self._process_listener = QueueListener(multiprocessing.Queue(), *self.handlers, respect_handler_level=True)
+            self._process_listener.start()
+        return _log_to_queue, (self.logger.name, self.logger.level, self._process_listener.queue)
+
+    def stop(self) -> None:
+        """
+        Handles the records still queued and stops the listeners, called at exit.
+        """
+        for listener in (self.listener, self._process_listener):
+            if listener is not None and listener._thread is not None:
+                listener.stop()
+
+
+def _log_to_queue(name: str, level: int, records: multiprocessing.Queue) -> None:
+    """
+    Sends the records of a logger to a queue read by another process, the records are formatted
+    before they are pickled.
+    """
+    logger = getLogger(name)
+    logger.setLevel(level)
+    logger.handlers = [QueueHandler(records)]
+
 
-def get_log_config():
+@lru_cache(maxsize=None)
+def get_log_config() -> QueueLogging:
+    """
+    Creates the log directory, configures logging from its file and starts the listener, on the
+    first call only.
+    """
     create_directories(BASE_DIR, ("logs",))
-    return fileConfig(BASE_DIR / config.get_value("settings.log", "LOG_CONFIG"))
+    fileConfig(BASE_DIR / config.get_value("settings.log", "LOG_CONFIG"))
+    logger = getLogger(CORE_LOGGER)
+    levels = config.get_value("settings.log", "levels") or {}
+    level = levels.get(config.get_value("settings.mode", "ENV_MODE"))
+    if level:
+        logger.setLevel(level)
+    return QueueLogging(logger)
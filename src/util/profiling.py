@@ -0,0 +1,163 @@
+"""
+Optional timing of the stages of a run, written as JSON lines.
+
+While ``profile_run`` is active every ``stage`` records its wall time, CPU time and the bytes it
+processed, and every chunk pulled through ``stage_iter`` adds to the totals of its stage. Stages
+nest: the self time of a stage leaves out the stages running inside it, so the self times of a
+run add up to its wall time. Without an active run ``stage`` returns a shared no-op context and
+``stage_iter`` returns the chunks unchanged.
+
+The CPU time is the one of the whole process, so stages running on several threads report more
+CPU than wall time. Input files are mapped into memory, reading them shows up in the stage that
+first touches the pages.
+"""
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter, process_time, time
+from typing import Iterable, Iterator, Optional
+
+__ALL__ = ['stage', 'stage_iter', 'profile_run']
+
+_DISABLED = nullcontext()
+
+
+class _Frame:
+    __slots__ = ("nbytes", "child_wall", "child_cpu")
+
+    def __init__(self, nbytes: int) -> None:
+        self.nbytes = nbytes
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+
+
+class _Recorder:
+    """
+    The totals of every stage of a run, in the order the stages were first left.
+    """
+
+    def __init__(self) -> None:
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int) -> Iterator[_Frame]:
+        stack = self.local.__dict__.setdefault("stack", [])
+        frame = _Frame(nbytes)
+        stack.append(frame)
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield frame
+        finally:
+            wall, cpu = perf_counter() - wall, process_time() - cpu
+            stack.pop()
+            if stack:
+                stack[-1].child_wall += wall
+                stack[-1].child_cpu += cpu
+            with self.lock:
+                total = self.totals.setdefault(name, {"calls": 0, "wall_s": 0.0, "self_s": 0.0, "cpu_s": 0.0, "bytes": 0})
+                total["calls"] += 1
+                total["wall_s"] += wall
+                total["self_s"] += wall - frame.child_wall
+                total["cpu_s"] += cpu - frame.child_cpu
+                total["bytes"] += frame.nbytes
+
+    def iterate(self, name: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        chunks = iter(chunks)
+        while True:
+            with self.stage(name, 0) as frame:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                frame.nbytes = len(chunk)
+            yield chunk
+
+
+_recorder: Optional[_Recorder] = None
+
+
+def stage(name: str, nbytes: int = 0):
+    """
+    Returns a context timing a stage of the active run, or a no-op context without one.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage, the calls of a stage are summed up.
+    nbytes : int, optional
+        The number of bytes the stage processes (default is 0).
+
+    Returns
+    -------
+    ContextManager
+        The context, it yields the frame of the stage whose ``nbytes`` can still be set.
+    """
+    if _recorder is None:
+        return _DISABLED
+    return _recorder.stage(name, nbytes)
+
+
+def stage_iter(name: str, chunks: Iterable[bytes]) -> Iterable[bytes]:
+    """
+    Times producing every chunk of a lazy pipeline as a call of the stage.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    chunks : Iterable[bytes]
+        The chunks, their lengths are counted as the bytes of the stage.
+
+    Returns
+    -------
+    Iterable[bytes]
+        The same chunks, unchanged without an active run.
+    """
+    if _recorder is None:
+        return chunks
+    return _recorder.iterate(name, chunks)
+
+
+@contextmanager
+def profile_run(file_path: Optional[Path], **context) -> Iterator[None]:
+    """
+    Records the stages run inside the context and appends them to a JSON lines file.
+
+    Every stage is written as one line with its calls, wall, self and CPU time in seconds, bytes
+    and throughput, followed by a ``total`` line, all carrying the run id and the context.
+
+    Parameters
+    ----------
+    file_path : Optional[Path]
+        The report file, nothing is recorded when it is None.
+    **context
+        Values added to every line, such as the operation and the input file.
+
+    Yields
+    ------
+    None
+    """
+    global _recorder
+    if file_path is None or _recorder is not None:
+        yield
+        return
+    _recorder = recorder = _Recorder()
+    started = time()
+    try:
+        with recorder.stage("total", 0):
+            yield
+    finally:
+        _recorder = None
+        run = {"run": uuid.uuid4().hex, "started": started, "pid": os.getpid(), **context}
+        lines = []
+        for name, total in recorder.totals.items():
+            throughput = total["bytes"] / total["self_s"] / 1e6 if total["bytes"] and total["self_s"] else None
+            lines.append(json.dumps({**run, "stage": name, **total, "mb_s": throughput}, default=str))
+        with open(file_path, 'a') as report:
+            report.write("\n".join(lines) + "\n")